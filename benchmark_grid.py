@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""图片网格性能基准测试工具
+
+python benchmark_grid.py decode
+python benchmark_grid.py decode -d su_miao_video --samples 40
+python benchmark_grid.py compose
+python benchmark_grid.py static
+python benchmark_grid.py split-memory
+
+decode: 对比完整解码与JPEG缩放解码（draft模式）在不同网格规格下每个单元格的解码耗时，
+        网格规格与 su_miao_video_output 中的 2x4 到 9x18 保持一致
+compose: 对比PIL粘贴与NumPy画布两种合成后端在 100、400、2000 个单元格时的合成耗时（不含解码）
+static: 对比转场视频滤镜图中 -loop 1 输入与静态输入（单帧解码缩放后tpad克隆）在 5x5 与 9x18 网格下的编码帧率
+split-memory: 对比图片分割工具整张解码与按切割行流式解码一张1亿像素长截图（PNG）时的峰值内存
+"""
+
+import os
+import sys
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import List
+
+from image_grid_creator import ImageGridCreator, PIL_AVAILABLE, NUMPY_AVAILABLE, _load_cell_image
+
+# su_miao_video_output 使用的网格规格：行数=级别，列数=级别*2
+SU_MIAO_GRID_LEVELS = [(level, level * 2) for level in range(2, 10)]
+
+# 合成后端基准测试使用的单元格数量
+COMPOSE_CELL_COUNTS = [100, 400, 2000]
+
+# 静态输入基准测试使用的网格规格
+STATIC_INPUT_GRIDS = [(5, 5), (9, 18)]
+
+# 分割内存基准测试使用的长截图尺寸（1亿像素）
+SPLIT_MEMORY_IMAGE_SIZE = (2500, 40000)
+
+# 子进程中执行分割并输出峰值内存（ru_maxrss，Linux单位为KB）
+_SPLIT_CHILD_CODE = '''
+import resource, sys, time
+from image_spliter_and_video_creator import ImageSpliterAndVideoCreator
+tool = ImageSpliterAndVideoCreator(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), stream=sys.argv[4] == '1')
+start = time.perf_counter()
+tool.split_image()
+elapsed = time.perf_counter() - start
+tool.clean_up()
+print('RESULT', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed)
+'''
+
+
+def create_sample_images(dir_path: str, count: int, width: int = 1920, height: int = 1080) -> List[str]:
+    """生成1080p测试JPEG（带渐变与噪点，接近真实截图的解码负载）"""
+    from PIL import Image
+    image_files = []
+    base = Image.radial_gradient('L').resize((width, height))
+    for i in range(count):
+        noise = Image.effect_noise((width, height), 8 + i % 8)
+        img = Image.merge('RGB', (base, noise, base.rotate(180)))
+        img_path = os.path.join(dir_path, f'output_{i + 1:03d}.jpg')
+        img.save(img_path, quality=90)
+        image_files.append(img_path)
+    return image_files
+
+
+def grid_cell_size(rows: int, cols: int, max_width: int, max_height: int):
+    """与create_grid_image相同的单元格尺寸计算（偶数对齐）"""
+    return max_width // cols // 2 * 2, max_height // rows // 2 * 2
+
+
+def benchmark_decode(image_files: List[str], max_width: int, max_height: int):
+    """统计每种网格规格下完整解码与draft解码的单元格平均耗时"""
+    print(f"样本图片: {len(image_files)} 张, 画布: {max_width}x{max_height}")
+    print(f"{'网格':>6} {'单元格':>9} {'完整解码(ms/格)':>16} {'draft解码(ms/格)':>16} {'加速比':>7}")
+    for rows, cols in SU_MIAO_GRID_LEVELS:
+        cell_width, cell_height = grid_cell_size(rows, cols, max_width, max_height)
+        timings = {}
+        for draft in (False, True):
+            start = time.perf_counter()
+            for img_path in image_files:
+                _load_cell_image(img_path, cell_width, cell_height, draft)
+            timings[draft] = (time.perf_counter() - start) * 1000 / len(image_files)
+        print(f"{rows:>2}x{cols:<3} {cell_width:>4}x{cell_height:<4} "
+              f"{timings[False]:>16.2f} {timings[True]:>16.2f} {timings[False] / timings[True]:>6.1f}x")
+
+
+def benchmark_compose(max_width: int, max_height: int, repeat: int = 3):
+    """统计PIL与NumPy两种合成后端的耗时（单元格图片预先缩放好，只测量合成与转为图片的时间）"""
+    from PIL import Image
+    if not NUMPY_AVAILABLE:
+        print("错误：合成后端基准测试需要NumPy（pip install numpy）")
+        return
+    creator = ImageGridCreator(output_file='', max_width=max_width, max_height=max_height)
+    print(f"画布: {max_width}x{max_height}, 每项取 {repeat} 次中的最快值")
+    print(f"{'单元格数':>8} {'网格':>7} {'PIL(ms)':>9} {'NumPy(ms)':>10} {'加速比':>7}")
+    for count in COMPOSE_CELL_COUNTS:
+        rows, cols = creator.calculate_grid_size(count)
+        cell_width, cell_height = grid_cell_size(rows, cols, max_width, max_height)
+        # 模拟16:9的单元格内容，等比缩放后留出黑边
+        img_height = max(1, min(cell_height, cell_width * 9 // 16))
+        cells = [(i, Image.new('RGB', (cell_width, img_height), ((i * 37) % 256, (i * 73) % 256, 90)))
+                 for i in range(count)]
+        rects = creator._grid_rects(count, cols, cell_width, cell_height)
+        timings = {}
+        for backend in ('pil', 'numpy'):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                if backend == 'pil':
+                    creator._compose_pil(cells, rects)
+                else:
+                    Image.fromarray(creator._compose_numpy(cells, rects))
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[backend] = best
+        print(f"{count:>8} {rows:>3}x{cols:<3} {timings['pil']:>9.2f} {timings['numpy']:>10.2f} "
+              f"{timings['pil'] / timings['numpy']:>6.1f}x")
+
+
+def benchmark_static_input(image_files: List[str], max_width: int, max_height: int,
+                           duration: float = 3.0, fps: float = 30.0):
+    """统计滤镜图渲染在 -loop 1 输入与静态输入两种方式下的编码帧率（使用PATH中的ffmpeg）"""
+    print(f"画布: {max_width}x{max_height}, 时长: {duration}秒, 帧率: {fps}fps")
+    print(f"{'网格':>6} {'图片数':>6} {'loop输入(fps)':>14} {'静态输入(fps)':>14} {'加速比':>7}")
+    output_dir = tempfile.mkdtemp(prefix='benchmark_static_')
+    try:
+        for rows, cols in STATIC_INPUT_GRIDS:
+            count = rows * cols
+            grid_files = [image_files[i % len(image_files)] for i in range(count)]
+            cell_width, cell_height = grid_cell_size(rows, cols, max_width, max_height)
+            frames = round(duration * fps)
+            timings = {}
+            for static_input in (False, True):
+                creator = ImageGridCreator(output_file='', max_width=max_width, max_height=max_height,
+                                           create_video=True, video_duration=duration, fps=fps,
+                                           renderer='ffmpeg', static_input=static_input)
+                output_path = os.path.join(output_dir, f'{rows}x{cols}_{int(static_input)}.mp4')
+                cmd = creator._transition_video_command(grid_files, output_path, rows, cols, cell_width, cell_height)
+                cmd[0] = 'ffmpeg'
+                start = time.perf_counter()
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                timings[static_input] = frames / (time.perf_counter() - start)
+            print(f"{rows:>2}x{cols:<3} {count:>6} {timings[False]:>14.1f} {timings[True]:>14.1f} "
+                  f"{timings[True] / timings[False]:>6.1f}x")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def create_long_png(path: str, width: int, height: int, strip_rows: int = 256):
+    """用流式写出器生成一张带噪点的超长PNG（生成过程本身不占用整张图片的内存）"""
+    from PIL import Image
+    from strip_writer import open_strip_writer
+    writer = open_strip_writer(path, width, height)
+    try:
+        for top in range(0, height, strip_rows):
+            rows = min(strip_rows, height - top)
+            noise = Image.effect_noise((width, rows), 16 + top % 48)
+            strip = Image.merge('RGB', (noise, noise.transpose(Image.FLIP_LEFT_RIGHT), noise))
+            writer.write_strip(strip.tobytes(), rows)
+    finally:
+        writer.close()
+
+
+def benchmark_split_memory(crop_width: int = 800, crop_height: int = 600):
+    """统计图片分割工具整张解码与流式解码的峰值内存（每种方式在独立子进程中运行）"""
+    width, height = SPLIT_MEMORY_IMAGE_SIZE
+    work_dir = tempfile.mkdtemp(prefix='benchmark_split_')
+    try:
+        image_path = os.path.join(work_dir, 'long_screenshot.png')
+        create_long_png(image_path, width, height)
+        print(f"长截图: {width}x{height} ({width * height / 1e6:.0f} 百万像素), 切割尺寸: {crop_width}x{crop_height}")
+        print(f"{'方式':>8} {'峰值内存(MB)':>12} {'切割耗时(s)':>11}")
+        repo_dir = os.path.dirname(os.path.abspath(__file__))
+        for stream in (False, True):
+            result = subprocess.run([sys.executable, '-c', _SPLIT_CHILD_CODE, image_path, str(crop_width),
+                                     str(crop_height), '1' if stream else '0'],
+                                    cwd=repo_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            line = next((line for line in result.stdout.splitlines() if line.startswith('RESULT')), None)
+            if line is None:
+                print(f"{'流式' if stream else '整张':>8} 运行失败: {result.stderr.strip()[-200:]}")
+                continue
+            _, max_rss_kb, elapsed = line.split()
+            print(f"{'流式' if stream else '整张':>8} {int(max_rss_kb) / 1024:>12.1f} {float(elapsed):>11.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='图片网格性能基准测试工具')
+    parser.add_argument('benchmark', choices=['decode', 'compose', 'static', 'split-memory'],
+                        help='要运行的基准测试')
+    parser.add_argument('-d', '--directory', help='样本图片目录（默认生成1080p测试图片）')
+    parser.add_argument('--samples', type=int, default=20, help='参与测试的图片数量（默认：20）')
+    parser.add_argument('-w', '--width', type=int, default=1920, help='画布宽度（默认：1920）')
+    parser.add_argument('-hh', '--height', type=int, default=1080, help='画布高度（默认：1080）')
+    args = parser.parse_args()
+
+    if not PIL_AVAILABLE:
+        print("错误：基准测试需要PIL库（pip install pillow）")
+        return 1
+
+    if args.benchmark == 'compose':
+        benchmark_compose(args.width, args.height)
+        return 0
+    if args.benchmark == 'split-memory':
+        benchmark_split_memory()
+        return 0
+
+    # 未指定目录时生成的样本图片在测试结束后删除
+    sample_dir = None if args.directory else tempfile.mkdtemp(prefix='benchmark_grid_')
+    try:
+        if args.directory:
+            image_files = ImageGridCreator(output_file='').get_image_files_from_dir(args.directory)[:args.samples]
+        else:
+            image_files = create_sample_images(sample_dir, args.samples)
+        if not image_files:
+            print("错误：没有可用的样本图片！")
+            return 1
+
+        if args.benchmark == 'decode':
+            benchmark_decode(image_files, args.width, args.height)
+        elif args.benchmark == 'static':
+            benchmark_static_input(image_files, args.width, args.height)
+        return 0
+    finally:
+        if sample_dir:
+            shutil.rmtree(sample_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""分块并行编码
+
+把输出时间线按GOP边界切分为若干块，每块由独立的ffmpeg进程编码（每块都从IDR帧开始，
+x264默认使用封闭GOP），多个块并行编码后通过 -f concat -c copy 拼接，不再重新编码。
+
+每块的命令只渲染自己的帧范围：命令构建函数在滤镜图中尽早插入 window_trim
+（位于克隆的静态输入之后、逐帧计算的滤镜之前），块之前的帧不经过逐帧滤镜，
+所有块的滤镜总工作量与整条时间线单进程编码相同。
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from frame_renderer import concat_segments
+
+# 分块编码的GOP时长（秒），块边界总是落在GOP边界上
+CHUNK_GOP_SECONDS = 2.0
+
+
+def gop_frames(fps: float) -> int:
+    """返回分块编码使用的GOP帧数"""
+    return max(1, round(CHUNK_GOP_SECONDS * fps))
+
+
+def chunk_ranges(start: int, end: int, chunks: int, gop: int) -> List[Tuple[int, int]]:
+    """把 [start, end) 帧范围切分为最多chunks块，块边界（相对start）是gop的整数倍
+
+    Args:
+        start: 开始帧
+        end: 结束帧（不包含）
+        chunks: 期望的块数
+        gop: GOP帧数
+
+    Returns:
+        List[Tuple[int, int]]: 每块的 (开始帧, 结束帧)
+    """
+    gops = max(1, -(-(end - start) // gop))
+    chunks = max(1, min(chunks, gops))
+    bounds = [start + min(end - start, (gops * i // chunks) * gop) for i in range(chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunks) if bounds[i] < bounds[i + 1]]
+
+
+def gop_args(fps: float, threads: Optional[int] = None) -> List[str]:
+    """分块编码的输出参数：固定GOP长度并关闭场景切换插入关键帧，每块首帧为IDR帧
+
+    Args:
+        fps: 帧率
+        threads: 每个编码进程的线程数（None表示由编码器决定）
+    """
+    gop = gop_frames(fps)
+    args = ['-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0']
+    if threads:
+        args.extend(['-threads', str(threads)])
+    return args
+
+
+def window_trim(start_frame: int, end_frame: int) -> str:
+    """只保留第 [start_frame, end_frame) 帧的trim滤镜
+
+    按进入trim的帧计数裁剪（输入必须是从第0帧开始、帧率与输出一致的恒定帧率流），
+    不受时间戳换算到流时间基时取整的影响。保留原时间戳，依赖时间 t 的滤镜
+    （fade、crop表达式等）放在它之后结果不变；链的末端需要再用 setpts=PTS-STARTPTS
+    让块的时间戳从0开始。
+    """
+    return f'trim=start_frame={start_frame}:end_frame={end_frame}'
+
+
+def chunk_command(cmd: List[str], fps: float, chunk_path: str, threads: Optional[int] = None) -> List[str]:
+    """把只渲染一个块的ffmpeg命令的输出改为块文件，并固定GOP参数
+
+    命令的最后一个参数必须是输出路径。
+    """
+    return cmd[:-1] + gop_args(fps, threads) + [chunk_path]
+
+
+def container_args(cmd: List[str]) -> List[str]:
+    """返回命令中需要在拼接时保留的封装参数（如 -movflags +faststart）"""
+    args = []
+    for index, arg in enumerate(cmd[:-1]):
+        if arg == '-movflags':
+            args.extend([arg, cmd[index + 1]])
+    return args
+
+
+def chunk_threads(workers: int) -> int:
+    """并行编码时每个ffmpeg进程分到的线程数"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def run_command(cmd: List[str]) -> Tuple[int, str]:
+    """执行ffmpeg命令，返回 (返回码, 错误输出)"""
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return result.returncode, result.stderr.decode('utf-8', errors='replace')
+
+
+def encode_command_chunked(build_command: Callable[[int, int], List[str]], frame_count: int, fps: float,
+                           output_path: str, chunks: int, temp_dir: Optional[str] = None) -> Tuple[int, str]:
+    """按GOP边界分块，每块用只渲染该帧范围的ffmpeg命令并行编码，再流复制拼接
+
+    Args:
+        build_command: 分块命令构建函数 (开始帧, 结束帧) -> ffmpeg命令，命令只输出该范围的帧、
+                       时间戳从0开始，最后一个参数为输出路径
+        frame_count: 输出总帧数
+        fps: 输出帧率
+        output_path: 最终输出文件路径
+        chunks: 块数（同时也是并行编码的进程数）
+        temp_dir: 块文件的父目录
+
+    Returns:
+        Tuple[int, str]: (返回码, 错误输出)
+    """
+    ranges = chunk_ranges(0, frame_count, chunks, gop_frames(fps))
+    threads = chunk_threads(len(ranges))
+    print(f"分块编码: {len(ranges)} 块并行，每块 {threads} 个编码线程")
+    return encode_chunked(lambda start, end, path: run_command(chunk_command(build_command(start, end), fps, path,
+                                                                            threads)),
+                          ranges, output_path, len(ranges), temp_dir, os.path.splitext(output_path)[1] or '.mp4',
+                          container_args(build_command(*ranges[0])))
+
+
+def encode_chunked(encode_chunk: Callable[[int, int, str], Tuple[int, str]], ranges: List[Tuple[int, int]],
+                   output_path: str, workers: int, temp_dir: Optional[str] = None,
+                   suffix: str = '.mp4', output_args: Optional[List[str]] = None) -> Tuple[int, str]:
+    """并行编码所有块并流复制拼接
+
+    Args:
+        encode_chunk: 编码单个块的函数 (开始帧, 结束帧, 输出路径) -> (返回码, 错误输出)
+        ranges: 每块的 (开始帧, 结束帧)，按时间顺序排列
+        output_path: 最终输出文件路径
+        workers: 并行编码的进程数
+        temp_dir: 块文件的父目录（None表示系统临时目录）
+        suffix: 块文件扩展名
+        output_args: 拼接时的输出参数（如 -movflags +faststart）
+
+    Returns:
+        Tuple[int, str]: (返回码, 错误输出)，任一块失败时返回该块的结果
+    """
+    chunk_dir = tempfile.mkdtemp(prefix='chunks_', dir=temp_dir)
+    try:
+        chunk_paths = [os.path.join(chunk_dir, f'chunk_{i:05d}{suffix}') for i in range(len(ranges))]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(lambda job: encode_chunk(job[0][0], job[0][1], job[1]),
+                                        zip(ranges, chunk_paths)))
+        for returncode, stderr in results:
+            if returncode != 0:
+                return returncode, stderr
+        return concat_segments(chunk_paths, output_path, os.path.join(chunk_dir, 'chunks.txt'),
+                               output_args=output_args)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""编码参数自动调优
+
+在时间线中间的一小段采样窗口上试编码几组 preset/crf/tune=stillimage 组合，用ffmpeg的ssim/psnr滤镜
+对比无损参考片段，在时间预算内选出满足目标画质且编码最快的组合。
+决策按内容特征（工具、分辨率、帧率、目标画质等）缓存，相同特征的内容不再重复试编码。
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 调优缓存文件
+DEFAULT_TUNE_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'p-video-ffmpeg-capture', 'encoder_tuning.json')
+
+# 采样窗口时长（秒）
+TUNE_SAMPLE_SECONDS = 2.0
+
+# 候选编码参数，大致按编码速度从快到慢排列
+TUNE_CANDIDATES = [
+    {'preset': 'ultrafast', 'crf': 28},
+    {'preset': 'veryfast', 'crf': 26, 'tune': 'stillimage'},
+    {'preset': 'veryfast', 'crf': 23, 'tune': 'stillimage'},
+    {'preset': 'faster', 'crf': 21, 'tune': 'stillimage'},
+    {'preset': 'medium', 'crf': 23},
+    {'preset': 'medium', 'crf': 18},
+]
+
+_METRIC_PATTERNS = {
+    'ssim': re.compile(r'SSIM .*All:([0-9.]+)'),
+    'psnr': re.compile(r'PSNR .*average:([0-9.]+|inf)'),
+}
+
+
+def parse_quality_target(text: str) -> Tuple[str, float]:
+    """解析目标画质，例如 'ssim:0.98'、'psnr:40'
+
+    Returns:
+        Tuple[str, float]: (指标名, 最低分数)
+    """
+    match = re.fullmatch(r'\s*(ssim|psnr)\s*[:=]\s*([0-9]*\.?[0-9]+)\s*', text.lower())
+    if not match:
+        raise ValueError(f"无法解析目标画质: {text}（示例：ssim:0.98、psnr:40）")
+    return match.group(1), float(match.group(2))
+
+
+def settings_args(settings: Dict) -> List[str]:
+    """把编码参数字典转换为libx264的ffmpeg参数"""
+    args = ['-preset', settings['preset'], '-crf', str(settings['crf'])]
+    if settings.get('tune'):
+        args.extend(['-tune', settings['tune']])
+    return args
+
+
+def sample_range(frame_count: int, fps: float) -> Tuple[int, int]:
+    """返回时间线中间 TUNE_SAMPLE_SECONDS 秒的采样窗口 (开始帧, 结束帧)
+
+    开头通常是尚未显示内容的黑场或淡入，在开头试编码会选出画质偏低的参数；
+    中间的窗口同时包含运动中的画面与已经显示的内容。
+    """
+    sample = min(frame_count, math.ceil(TUNE_SAMPLE_SECONDS * fps))
+    start = (frame_count - sample) // 2
+    return start, start + sample
+
+
+def reference_args(duration: float = TUNE_SAMPLE_SECONDS, start: float = 0.0) -> List[str]:
+    """把采样窗口写成无损参考片段（FFV1）的输出参数，start 为窗口在输出时间线上的开始时间（秒）"""
+    seek = ['-ss', f'{start:.6f}'] if start > 0 else []
+    return [*seek, '-t', f'{duration:.6f}', '-c:v', 'ffv1', '-pix_fmt', 'yuv420p']
+
+
+def reference_command(cmd: List[str], reference_path: str, duration: float = TUNE_SAMPLE_SECONDS,
+                      start: float = 0.0) -> List[str]:
+    """把完整编码命令改写为输出无损参考片段的命令（最后一个参数必须是输出路径，后出现的输出选项覆盖前面的）"""
+    return cmd[:-1] + reference_args(duration, start) + [reference_path]
+
+
+def measure_quality(trial_path: str, reference_path: str, metric: str, ffmpeg: str = 'ffmpeg') -> Optional[float]:
+    """用ffmpeg的ssim/psnr滤镜计算试编码结果相对参考片段的画质，失败返回None"""
+    cmd = [ffmpeg, '-hide_banner', '-i', trial_path, '-i', reference_path,
+           '-lavfi', f'[0:v][1:v]{metric}', '-f', 'null', '-']
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    match = _METRIC_PATTERNS[metric].search(result.stderr.decode('utf-8', errors='replace'))
+    if result.returncode != 0 or not match:
+        return None
+    return float('inf') if match.group(1) == 'inf' else float(match.group(1))
+
+
+class EncoderTuner:
+    """试编码调优器"""
+
+    def __init__(self, target: str = 'ssim:0.98', budget: float = 20.0,
+                 cache_path: Optional[str] = DEFAULT_TUNE_CACHE,
+                 candidates: Optional[List[Dict]] = None, ffmpeg: str = 'ffmpeg'):
+        """初始化调优器
+
+        Args:
+            target: 目标画质，例如 'ssim:0.98'、'psnr:40'
+            budget: 试编码的总时间预算（秒），超出后不再尝试剩余候选
+            cache_path: 决策缓存文件（None表示不缓存）
+            candidates: 候选编码参数（默认 TUNE_CANDIDATES）
+            ffmpeg: ffmpeg可执行文件
+        """
+        self.target = target
+        self.metric, self.min_score = parse_quality_target(target)
+        self.budget = budget
+        self.cache_path = cache_path
+        self.candidates = candidates or TUNE_CANDIDATES
+        self.ffmpeg = ffmpeg
+
+    def _load_cache(self) -> Dict:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_decision(self, profile: str, decision: Dict):
+        if not self.cache_path:
+            return
+        cache = self._load_cache()
+        cache[profile] = decision
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        # 先写临时文件再替换，避免并发写入时留下不完整的JSON
+        fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=os.path.dirname(self.cache_path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def tune(self, profile: str, make_reference: Callable[[str], int], default_args: List[str]) -> List[str]:
+        """返回满足目标画质且编码最快的参数
+
+        Args:
+            profile: 内容特征描述，相同特征复用缓存的决策
+            make_reference: 把采样窗口写成无损参考片段的函数 (输出路径) -> ffmpeg返回码
+            default_args: 参考片段生成失败或无法试编码时使用的参数
+
+        Returns:
+            List[str]: libx264编码参数
+        """
+        key = f'{profile}|{self.metric}>={self.min_score}'
+        cached = self._load_cache().get(key)
+        if cached:
+            print(f"编码参数调优: 使用缓存决策 {settings_args(cached)}")
+            return settings_args(cached)
+
+        work_dir = tempfile.mkdtemp(prefix='encoder_tune_')
+        try:
+            reference_path = os.path.join(work_dir, 'reference.mkv')
+            if make_reference(reference_path) != 0 or not os.path.exists(reference_path):
+                print("编码参数调优: 生成参考片段失败，使用默认参数")
+                return default_args
+
+            deadline = time.perf_counter() + self.budget
+            results = []
+            for index, settings in enumerate(self.candidates):
+                if time.perf_counter() > deadline:
+                    print(f"编码参数调优: 超出时间预算，跳过剩余 {len(self.candidates) - index} 组候选")
+                    break
+                trial_path = os.path.join(work_dir, f'trial_{index}.mp4')
+                cmd = [self.ffmpeg, '-y', '-loglevel', 'error', '-i', reference_path, '-c:v', 'libx264',
+                       *settings_args(settings), '-pix_fmt', 'yuv420p', trial_path]
+                start = time.perf_counter()
+                if subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                    continue
+                seconds = time.perf_counter() - start
+                score = measure_quality(trial_path, reference_path, self.metric, self.ffmpeg)
+                if score is None:
+                    continue
+                print(f"编码参数调优: {' '.join(settings_args(settings))} -> "
+                      f"{self.metric}={score:.4f}，{seconds * 1000:.0f}ms，{os.path.getsize(trial_path)} 字节")
+                results.append(dict(settings, metric=self.metric, score=score, seconds=seconds))
+
+            passing = [result for result in results if result['score'] >= self.min_score]
+            if passing:
+                decision = min(passing, key=lambda result: result['seconds'])
+            elif results:
+                # 没有组合达到目标时选择画质最高的组合
+                decision = max(results, key=lambda result: result['score'])
+            else:
+                print("编码参数调优: 所有试编码均失败，使用默认参数")
+                return default_args
+            self._save_decision(key, decision)
+            print(f"编码参数调优: 选择 {settings_args(decision)}")
+            return settings_args(decision)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""FFmpeg滤镜图构建器
+
+用节点（输入、源）、连接标签（pad）和线性滤镜链描述滤镜图，
+最终写成脚本文件通过 -filter_complex_script 传给ffmpeg，滤镜内容不出现在命令行参数中，
+数百个单元格时也不会超出命令行长度，解析开销也更小。
+
+构建时会做几项简化：
+1. 已知尺寸/时长的输入上去掉无效的 scale、pad、trim、setpts=PTS-STARTPTS
+2. 相邻重复的幂等滤镜只保留一个
+3. 纯色背景上的居中叠加改为 pad，尺寸相同时直接省略
+4. 输入过多的 hstack/vstack 分层堆叠
+"""
+
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 单个 hstack/vstack 滤镜的最大输入数量，超过时分层堆叠
+FILTER_MAX_STACK_INPUTS = 32
+
+# 相邻重复时可以只保留一个的滤镜
+IDEMPOTENT_FILTERS = ('scale', 'pad', 'trim', 'setsar', 'format', 'fps', 'setpts', 'null')
+
+# 不改变画面尺寸、时长与时间戳起点的滤镜
+PASSTHROUGH_FILTERS = ('fps', 'format', 'setsar', 'fade', 'hue', 'colorchannelmixer', 'gblur',
+                       'drawtext', 'null')
+
+_SIZE_RE = r'(\d+)[:x](\d+)'
+_SCALE_RE = re.compile(rf'^scale={_SIZE_RE}(:force_original_aspect_ratio=\w+)?(:flags=\w+)?$')
+_PAD_RE = re.compile(r'^pad=(?:w=)?(\d+):(?:h=)?(\d+)(:.*)?$')
+_TRIM_RE = re.compile(r'^trim=duration=([\d.]+)$')
+
+
+def _filter_name(filter_str: str) -> str:
+    """返回滤镜名（第一个 '=' 之前的部分）"""
+    return filter_str.split('=', 1)[0]
+
+
+class FilterChain:
+    """滤镜图中的一条线性滤镜链：[输入标签...]滤镜1,滤镜2,...[输出标签...]"""
+
+    def __init__(self, inputs: Sequence[str], filters: Sequence[str], outputs: Sequence[str]):
+        self.inputs = list(inputs)
+        self.filters = list(filters)
+        self.outputs = list(outputs)
+
+    def render(self) -> str:
+        """返回滤镜链文本"""
+        inputs = ''.join(f'[{label}]' for label in self.inputs)
+        outputs = ''.join(f'[{label}]' for label in self.outputs)
+        return f"{inputs}{','.join(self.filters) or 'null'}{outputs}"
+
+
+class FilterGraph:
+    """滤镜图构建器"""
+
+    def __init__(self, max_stack_inputs: int = FILTER_MAX_STACK_INPUTS):
+        """初始化构建器
+
+        Args:
+            max_stack_inputs: 单个 hstack/vstack 的最大输入数量
+        """
+        self.max_stack_inputs = max(2, max_stack_inputs)
+        self.chains: List[FilterChain] = []
+        # 标签 -> (尺寸, 时长, 时间戳是否从0开始)
+        self._streams: Dict[str, Tuple[Optional[Tuple[int, int]], Optional[float], bool]] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self.chains)
+
+    def input(self, index: int, size: Optional[Tuple[int, int]] = None,
+              duration: Optional[float] = None) -> str:
+        """声明ffmpeg的第index个输入的视频流，返回其标签
+
+        Args:
+            index: 输入序号（与命令行中 -i 的顺序一致）
+            size: 已知的画面尺寸 (宽, 高)
+            duration: 已知的时长（秒）
+        """
+        label = f'{index}:v'
+        self._streams[label] = (size, duration, True)
+        return label
+
+    def _new_label(self, prefix: str) -> str:
+        self._counter += 1
+        return f'{prefix}{self._counter}'
+
+    def _simplify(self, label: str, filters: Sequence[str]) -> Tuple[List[str], Tuple]:
+        """按已知的流属性去掉无效滤镜，返回 (保留的滤镜, 链末端的流属性)
+
+        遇到无法推断的滤镜后不再简化，之后的滤镜原样保留。
+        """
+        size, duration, zero_based = self._streams.get(label, (None, None, False))
+        kept = []
+        for index, filter_str in enumerate(filters):
+            name = _filter_name(filter_str)
+            if kept and kept[-1] == filter_str and name in IDEMPOTENT_FILTERS:
+                continue
+            scale = _SCALE_RE.match(filter_str)
+            pad = _PAD_RE.match(filter_str)
+            trim = _TRIM_RE.match(filter_str)
+            if scale:
+                target = (int(scale.group(1)), int(scale.group(2)))
+                if size == target:
+                    continue
+                size = None if scale.group(3) else target
+            elif pad:
+                target = (int(pad.group(1)), int(pad.group(2)))
+                if size == target:
+                    continue
+                size = target
+            elif trim:
+                limit = float(trim.group(1))
+                if zero_based and duration is not None and duration <= limit:
+                    continue
+                duration = limit if duration is None else min(duration, limit)
+            elif filter_str == 'setpts=PTS-STARTPTS':
+                if zero_based:
+                    continue
+                zero_based = True
+            elif name == 'tpad':
+                duration = None
+            elif name not in PASSTHROUGH_FILTERS:
+                kept.extend(filters[index:])
+                return kept, (None, None, False)
+            kept.append(filter_str)
+        return kept, (size, duration, zero_based)
+
+    def chain(self, inputs, filters: Sequence[str], output: Optional[str] = None,
+              size: Optional[Tuple[int, int]] = None) -> str:
+        """追加一条滤镜链，返回输出标签
+
+        单输入的链会按输入的已知属性简化；简化后没有滤镜且未指定输出标签时，
+        不生成滤镜链，直接返回输入标签。
+
+        Args:
+            inputs: 输入标签或标签列表
+            filters: 滤镜列表
+            output: 输出标签（None表示自动生成）
+            size: 输出的已知尺寸（覆盖推断结果）
+        """
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        stream = (None, None, False)
+        if len(inputs) == 1:
+            filters, stream = self._simplify(inputs[0], filters)
+            if not filters and output is None:
+                if size:
+                    self._streams[inputs[0]] = (size,) + stream[1:]
+                return inputs[0]
+        label = output or self._new_label('v')
+        self.chains.append(FilterChain(inputs, filters, [label]))
+        self._streams[label] = (size or stream[0],) + stream[1:]
+        return label
+
+    def split(self, label: str, count: int = 2) -> List[str]:
+        """把一路流复制为count路，返回各路标签"""
+        labels = [self._new_label('s') for _ in range(count)]
+        self.chains.append(FilterChain([label], [f'split={count}'], labels))
+        for output in labels:
+            self._streams[output] = self._streams.get(label, (None, None, False))
+        return labels
+
+    def source(self, filter_str: str, size: Optional[Tuple[int, int]] = None,
+               duration: Optional[float] = None) -> str:
+        """追加一个源滤镜（如 color），返回其标签，替代 -f lavfi 输入"""
+        label = self._new_label('src')
+        self.chains.append(FilterChain([], [filter_str], [label]))
+        self._streams[label] = (size, duration, True)
+        return label
+
+    def stack(self, labels: List[str], direction: str, size: Optional[Tuple[int, int]] = None) -> str:
+        """水平（h）或垂直（v）堆叠，输入过多时分层堆叠"""
+        while len(labels) > self.max_stack_inputs:
+            merged = []
+            for start in range(0, len(labels), self.max_stack_inputs):
+                batch = labels[start:start + self.max_stack_inputs]
+                merged.append(batch[0] if len(batch) == 1 else
+                              self.chain(batch, [f'{direction}stack=inputs={len(batch)}']))
+            labels = merged
+        if len(labels) == 1:
+            return labels[0]
+        return self.chain(labels, [f'{direction}stack=inputs={len(labels)}'], size=size)
+
+    def stack_grid(self, labels: List[str], cols: int, rows: int,
+                   cell_size: Optional[Tuple[int, int]] = None) -> str:
+        """把尺寸相同的单元格按行优先顺序拼成 cols x rows 的网格，返回网格标签
+
+        每行先水平堆叠，再把所有行垂直堆叠，等价于 xstack=grid=colsxrows，
+        但单个滤镜的输入数量不超过 max_stack_inputs。
+        """
+        row_size = (cell_size[0] * cols, cell_size[1]) if cell_size else None
+        grid_size = (cell_size[0] * cols, cell_size[1] * rows) if cell_size else None
+        row_labels = [self.stack(labels[row * cols:(row + 1) * cols], 'h', row_size)
+                      for row in range(rows)]
+        return self.stack(row_labels, 'v', grid_size)
+
+    def center_on_color(self, label: str, size: Tuple[int, int], canvas_size: Tuple[int, int],
+                        color: str = 'black') -> str:
+        """把不透明的画面居中放到纯色画布上
+
+        等价于在纯色背景上 overlay=(W-w)/2:(H-h)/2，但用 pad 实现，不需要背景输入；
+        画面与画布尺寸相同时背景完全被覆盖，直接返回原标签。
+        """
+        if tuple(size) == tuple(canvas_size):
+            return label
+        width, height = canvas_size
+        return self.chain(label, [f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:{color}'])
+
+    def output(self, label: str, name: str = 'out') -> str:
+        """把标签重命名为最终输出标签（供 -map 使用），返回 name"""
+        for chain in self.chains:
+            if label in chain.outputs:
+                chain.outputs[chain.outputs.index(label)] = name
+                self._streams[name] = self._streams.pop(label)
+                return name
+        self.chains.append(FilterChain([label], [], [name]))
+        return name
+
+    def render(self) -> str:
+        """返回完整的滤镜图文本（每条滤镜链一行）"""
+        return ';\n'.join(chain.render() for chain in self.chains)
+
+    def write_script(self, directory: Optional[str] = None) -> str:
+        """把滤镜图写入脚本文件，返回文件路径（由调用方负责删除）"""
+        fd, script_path = tempfile.mkstemp(suffix='.txt', prefix='filter_', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        return script_path
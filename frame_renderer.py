@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""网格淡入视频的原始帧渲染器
+
+每个单元格只解码、缩放一次，之后每一帧都在NumPy画布上按淡入时间表合成，
+以rgb24原始帧的形式通过stdin写给单个ffmpeg编码进程；
+ffmpeg不再需要为N路 -loop 1 输入在每一帧重复解码、缩放与淡入。
+
+时间线分析会找出画面不变的区间，这些区间只编码一帧并保持到区间结束，
+与逐帧渲染的动画区间分段编码后通过concat流复制拼接。
+"""
+
+import math
+import os
+import subprocess
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+def fade_alpha(time: float, start: float, duration: float) -> float:
+    """与ffmpeg fade=in 一致的不透明度：开始前为0，淡入期间线性增加，结束后为1"""
+    if time < start:
+        return 0.0
+    if duration <= 0 or time >= start + duration:
+        return 1.0
+    return (time - start) / duration
+
+
+class GridFadeRenderer:
+    """按淡入时间表逐帧合成网格画布"""
+
+    def __init__(self, width: int, height: int, cells: List[Optional['np.ndarray']],
+                 positions: List[Tuple[int, int]], fade_starts: List[float],
+                 fade_duration: float, fps: float):
+        """初始化渲染器
+
+        Args:
+            width: 画布宽度
+            height: 画布高度
+            cells: 每个单元格的RGB数组（高x宽x3，uint8），加载失败为None
+            positions: 每个单元格左上角在画布中的坐标 (x, y)
+            fade_starts: 每个单元格的淡入开始时间（秒）
+            fade_duration: 淡入持续时间（秒）
+            fps: 帧率
+        """
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.positions = positions
+        self.fade_starts = fade_starts
+        self.fade_duration = fade_duration
+        self.fps = fps
+
+    def frame_count(self, duration: float) -> int:
+        """返回给定时长对应的帧数"""
+        return max(1, math.ceil(duration * self.fps - 1e-9))
+
+    def _first_frame(self, time: float, inclusive: bool) -> int:
+        """返回时间不早于（inclusive）或晚于time的第一帧，与frames()的帧时间计算一致"""
+        index = max(0, math.floor(time * self.fps) - 1)
+        while index / self.fps < time or (not inclusive and index / self.fps == time):
+            index += 1
+        return index
+
+    def timeline(self, frame_count: int, min_hold_frames: int = 2) -> List[Tuple[int, int, bool]]:
+        """分析时间线，把 [0, frame_count) 划分为动画区间与静止区间
+
+        第k帧与第k-1帧不同，当且仅当某个单元格的不透明度在两帧之间发生变化，
+        即第k帧位于 (淡入开始, 淡入结束] 的时间范围内（淡入时长为0时单元格在淡入开始时刻直接出现）。
+
+        Args:
+            frame_count: 总帧数
+            min_hold_frames: 静止区间的最少帧数，更短的静止区间并入动画区间
+
+        Returns:
+            List[Tuple[int, int, bool]]: 按顺序排列的 (开始帧, 结束帧, 是否静止)，结束帧不包含
+        """
+        changed = bytearray(frame_count)
+        if frame_count:
+            changed[0] = 1
+        for i, cell in enumerate(self.cells):
+            if cell is None:
+                continue
+            first = self._first_frame(self.fade_starts[i], inclusive=self.fade_duration <= 0)
+            last = self._first_frame(self.fade_starts[i] + self.fade_duration, inclusive=True)
+            for k in range(first, min(last + 1, frame_count)):
+                changed[k] = 1
+
+        segments = []
+        run_start = 0
+        for k in range(1, frame_count + 1):
+            if k < frame_count and not changed[k]:
+                continue
+            # [run_start, k) 内的帧都与第 run_start 帧相同
+            is_static = k - run_start >= max(2, min_hold_frames)
+            if segments and not is_static and not segments[-1][2]:
+                segments[-1] = (segments[-1][0], k, False)
+            else:
+                segments.append((run_start, k, is_static))
+            run_start = k
+        return segments
+
+    def _paste(self, canvas, index: int, alpha: float = 1.0):
+        cell = self.cells[index]
+        if cell is None:
+            return
+        x, y = self.positions[index]
+        region = canvas[y:y + cell.shape[0], x:x + cell.shape[1]]
+        if alpha >= 1.0:
+            region[...] = cell
+        else:
+            # 背景为黑色，淡入只需按不透明度缩放像素值
+            np.multiply(cell, alpha, out=region, casting='unsafe')
+
+    def frames(self, start: int, end: int) -> Iterator['np.ndarray']:
+        """按顺序产出 [start, end) 范围内的帧
+
+        已完全显示的单元格保存在底图中，每帧只需复制底图并合成正在淡入的单元格。
+        """
+        base = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        pending = []
+        start_time = start / self.fps
+        for i in range(len(self.cells)):
+            if fade_alpha(start_time, self.fade_starts[i], self.fade_duration) >= 1.0:
+                self._paste(base, i)
+            else:
+                pending.append(i)
+
+        for frame_index in range(start, end):
+            time = frame_index / self.fps
+            frame = base.copy()
+            still_pending = []
+            for i in pending:
+                alpha = fade_alpha(time, self.fade_starts[i], self.fade_duration)
+                if alpha >= 1.0:
+                    self._paste(base, i)
+                    self._paste(frame, i)
+                else:
+                    if alpha > 0.0:
+                        self._paste(frame, i, alpha)
+                    still_pending.append(i)
+            pending = still_pending
+            yield frame
+
+
+class CellRevealRenderer:
+    """逐个显示单元格的渲染器
+
+    时间线：开头 lead_in 秒显示完整网格；之后每个单元格占用 reveal_duration 秒，
+    画面为黑色背景上只有该单元格从黑色淡入；全部单元格显示完后保持完整网格到视频结束。
+    """
+
+    def __init__(self, grid: 'np.ndarray', rects: List[Tuple[int, int, int, int]],
+                 lead_in: float, reveal_duration: float, fps: float):
+        """初始化渲染器
+
+        Args:
+            grid: 完整网格画面（高x宽x3，uint8）
+            rects: 每个单元格在网格中的区域 (x, y, 宽, 高)
+            lead_in: 开头显示完整网格的时长（秒）
+            reveal_duration: 每个单元格的淡入时长（秒）
+            fps: 帧率
+        """
+        self.grid = grid
+        self.rects = rects
+        self.lead_in = lead_in
+        self.reveal_duration = reveal_duration
+        self.fps = fps
+
+    @property
+    def reveal_end(self) -> float:
+        """最后一个单元格淡入结束的时间（秒）"""
+        return self.lead_in + len(self.rects) * self.reveal_duration
+
+    def frame_count(self, duration: float) -> int:
+        """返回视频总帧数（时长至少覆盖所有单元格的淡入）"""
+        return max(1, math.ceil(max(duration, self.reveal_end) * self.fps - 1e-9))
+
+    def frames(self, start: int, end: int) -> Iterator['np.ndarray']:
+        """按顺序产出 [start, end) 范围内的帧"""
+        for frame_index in range(start, end):
+            time = frame_index / self.fps
+            index = math.floor((time - self.lead_in) / self.reveal_duration)
+            if time < self.lead_in or index >= len(self.rects):
+                yield self.grid
+                continue
+            x, y, width, height = self.rects[index]
+            alpha = fade_alpha(time, self.lead_in + index * self.reveal_duration, self.reveal_duration)
+            frame = np.zeros_like(self.grid)
+            np.multiply(self.grid[y:y + height, x:x + width], alpha,
+                        out=frame[y:y + height, x:x + width], casting='unsafe')
+            yield frame
+
+
+def rawvideo_input_args(width: int, height: int, fps: float) -> List[str]:
+    """ffmpeg从stdin读取rgb24原始帧的输入参数"""
+    return ['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-']
+
+
+def encode_frames(frames, width: int, height: int, fps: float, output_path: str,
+                  output_args: List[str], ffmpeg: str = 'ffmpeg') -> Tuple[int, str]:
+    """把帧序列通过stdin写给ffmpeg编码
+
+    Args:
+        frames: 产出 高x宽x3 uint8 数组的可迭代对象
+        width: 帧宽度
+        height: 帧高度
+        fps: 帧率
+        output_path: 输出文件路径
+        output_args: 编码参数（位于输入参数与输出路径之间）
+        ffmpeg: ffmpeg可执行文件
+
+    Returns:
+        Tuple[int, str]: (ffmpeg返回码, 错误输出)
+    """
+    cmd = [ffmpeg, '-y', '-loglevel', 'error'] + rawvideo_input_args(width, height, fps)
+    cmd += output_args + [output_path]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        for frame in frames:
+            process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+    except BrokenPipeError:
+        pass
+    finally:
+        process.stdin.close()
+    stderr = process.stderr.read().decode('utf-8', errors='replace')
+    process.wait()
+    return process.returncode, stderr
+
+
+def encode_hold(frame, frame_count: int, width: int, height: int, fps: float, output_path: str,
+                output_args: List[str], ffmpeg: str = 'ffmpeg') -> Tuple[int, str]:
+    """把一帧编码为持续frame_count帧时长的可变帧率片段
+
+    片段只包含两帧：第一帧位于0时刻，重复帧位于最后一帧的时刻，
+    编码量与时长无关；第二帧与第一帧相同，编码为跳过块。
+
+    Args:
+        frame: 高x宽x3 uint8 数组
+        frame_count: 保持的帧数
+        width: 帧宽度
+        height: 帧高度
+        fps: 帧率
+        output_path: 输出文件路径
+        output_args: 编码参数
+        ffmpeg: ffmpeg可执行文件
+
+    Returns:
+        Tuple[int, str]: (ffmpeg返回码, 错误输出)
+    """
+    if frame_count <= 1:
+        return encode_frames([frame], width, height, fps, output_path, output_args, ffmpeg)
+    hold_args = ['-vf', f'setpts=N*{frame_count - 1}/({fps}*TB)', '-fps_mode', 'passthrough']
+    return encode_frames([frame, frame], width, height, fps, output_path, hold_args + output_args, ffmpeg)
+
+
+def concat_segments(segment_paths: List[str], output_path: str, list_path: str,
+                    ffmpeg: str = 'ffmpeg', output_args: Optional[List[str]] = None) -> Tuple[int, str]:
+    """通过concat demuxer流复制拼接编码参数一致的片段
+
+    Args:
+        segment_paths: 片段文件列表
+        output_path: 输出文件路径
+        list_path: concat列表文件路径
+        ffmpeg: ffmpeg可执行文件
+        output_args: 额外的输出参数（如 -movflags +faststart，流复制时同样生效）
+
+    Returns:
+        Tuple[int, str]: (ffmpeg返回码, 错误输出)
+    """
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+           '-c', 'copy', *(output_args or []), output_path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return result.returncode, result.stderr.decode('utf-8', errors='replace')
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""网格图片的输出格式层
+
+支持渐进式JPEG、WebP与PNG，并可调节编码力度（effort）；
+预算模式（--encode-budget）会依次试编码多个格式/质量组合，
+选出在给定时间或大小目标内质量最高的一个，并报告每个组合的编码耗时与输出大小。
+"""
+
+import io
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+# 格式名称与默认扩展名
+FORMAT_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp', 'png': '.png'}
+
+# 扩展名到格式名称
+EXTENSION_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.webp': 'webp', '.png': 'png'}
+
+# 预算模式的候选组合，按画质从高到低排列：(格式, 质量)
+BUDGET_CANDIDATES = [
+    ('png', None),
+    ('webp', 95), ('jpeg', 95),
+    ('webp', 90), ('jpeg', 90),
+    ('webp', 85), ('jpeg', 85),
+    ('webp', 80), ('jpeg', 80),
+    ('webp', 70), ('jpeg', 70),
+    ('webp', 60), ('jpeg', 50),
+]
+
+_SIZE_UNITS = {'b': 1, 'kb': 1024, 'k': 1024, 'mb': 1024 * 1024, 'm': 1024 * 1024}
+_TIME_UNITS = {'ms': 0.001, 's': 1.0}
+
+
+def format_from_path(path: str) -> Optional[str]:
+    """根据扩展名返回格式名称（jpeg / webp / png），无法识别时返回None"""
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def parse_encode_budget(text: str) -> Tuple[Optional[float], Optional[int]]:
+    """解析编码预算，例如 '200ms'、'500KB'、'1.5s,2MB'
+
+    Args:
+        text: 预算描述，时间与大小可用逗号同时指定
+
+    Returns:
+        Tuple[Optional[float], Optional[int]]: (最大编码秒数, 最大字节数)
+    """
+    max_seconds = None
+    max_bytes = None
+    for part in text.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        match = re.fullmatch(r'([0-9]*\.?[0-9]+)\s*(ms|s|b|kb|k|mb|m)', part)
+        if not match:
+            raise ValueError(f"无法解析编码预算: {part}（示例：200ms、1.5s、500KB、2MB）")
+        value, unit = float(match.group(1)), match.group(2)
+        if unit in _TIME_UNITS:
+            max_seconds = value * _TIME_UNITS[unit]
+        else:
+            max_bytes = int(value * _SIZE_UNITS[unit])
+    if max_seconds is None and max_bytes is None:
+        raise ValueError("编码预算至少需要指定时间或大小")
+    return max_seconds, max_bytes
+
+
+def _save_options(fmt: str, quality: Optional[int], effort: Optional[int], progressive: bool) -> dict:
+    """把通用的 质量/力度/渐进 参数转换为PIL各格式的保存参数"""
+    if fmt == 'jpeg':
+        options = {'quality': quality or 95, 'progressive': progressive}
+        if effort is not None and effort > 0:
+            options['optimize'] = True
+        return options
+    if fmt == 'webp':
+        # method 0-6，越大越慢但压缩越好
+        return {'quality': quality or 95, 'method': 4 if effort is None else max(0, min(6, effort))}
+    if fmt == 'png':
+        # compress_level 0-9
+        return {'compress_level': 6 if effort is None else max(0, min(9, effort))}
+    raise ValueError(f"不支持的输出格式: {fmt}")
+
+
+def encode_image(img, fmt: str, quality: Optional[int] = None, effort: Optional[int] = None,
+                 progressive: bool = False) -> Tuple[bytes, float]:
+    """把图片编码到内存
+
+    Args:
+        img: PIL图片
+        fmt: 格式名称（jpeg / webp / png）
+        quality: 质量（JPEG/WebP）
+        effort: 编码力度（JPEG>0 启用optimize，WebP method 0-6，PNG压缩级别 0-9）
+        progressive: JPEG是否使用渐进式编码
+
+    Returns:
+        Tuple[bytes, float]: (编码结果, 编码耗时秒数)
+    """
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    img.save(buffer, format=fmt.upper(), **_save_options(fmt, quality, effort, progressive))
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def save_image(img, output_path: str, fmt: Optional[str] = None, quality: Optional[int] = None,
+               effort: Optional[int] = None, progressive: bool = False) -> dict:
+    """按指定格式保存图片并返回编码报告
+
+    未指定任何格式参数时等价于 img.save(output_path, quality=95)，与原有行为逐字节一致。
+
+    Args:
+        img: PIL图片
+        output_path: 输出文件路径
+        fmt: 格式名称，None时根据扩展名决定
+        quality: 质量（JPEG/WebP）
+        effort: 编码力度
+        progressive: JPEG是否使用渐进式编码
+
+    Returns:
+        dict: {'path', 'format', 'quality', 'seconds', 'bytes'}
+    """
+    if fmt is None and quality is None and effort is None and not progressive:
+        start = time.perf_counter()
+        img.save(output_path, quality=95)
+        return {'path': output_path, 'format': format_from_path(output_path) or 'auto', 'quality': 95,
+                'seconds': time.perf_counter() - start, 'bytes': os.path.getsize(output_path)}
+
+    fmt = fmt or format_from_path(output_path) or 'jpeg'
+    data, seconds = encode_image(img, fmt, quality, effort, progressive)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return {'path': output_path, 'format': fmt, 'quality': quality, 'seconds': seconds, 'bytes': len(data)}
+
+
+def save_image_with_budget(img, output_path: str, max_seconds: Optional[float] = None,
+                           max_bytes: Optional[int] = None, effort: Optional[int] = None,
+                           candidates: Optional[List[Tuple[str, Optional[int]]]] = None) -> Tuple[dict, List[dict]]:
+    """依次试编码候选组合，保存满足预算且画质最高的一个
+
+    所有候选都不满足时，选择满足时间预算的最小输出；仍不满足则选择编码最快的一个。
+    输出文件的扩展名会替换为所选格式的扩展名。
+
+    Args:
+        img: PIL图片
+        output_path: 输出文件路径（扩展名会按所选格式调整）
+        max_seconds: 最大编码秒数
+        max_bytes: 最大输出字节数
+        effort: 编码力度
+        candidates: 候选 (格式, 质量) 列表，默认 BUDGET_CANDIDATES
+
+    Returns:
+        Tuple[dict, List[dict]]: (所选组合的报告, 所有试编码的报告)
+    """
+    reports = []
+    chosen = None
+    for fmt, quality in candidates or BUDGET_CANDIDATES:
+        progressive = fmt == 'jpeg'
+        data, seconds = encode_image(img, fmt, quality, effort, progressive)
+        report = {'format': fmt, 'quality': quality, 'progressive': progressive,
+                  'seconds': seconds, 'bytes': len(data), 'data': data}
+        report['fits'] = ((max_seconds is None or seconds <= max_seconds)
+                          and (max_bytes is None or len(data) <= max_bytes))
+        reports.append(report)
+        if report['fits']:
+            chosen = report
+            break
+
+    if chosen is None:
+        in_time = [r for r in reports if max_seconds is None or r['seconds'] <= max_seconds]
+        chosen = min(in_time, key=lambda r: r['bytes']) if in_time else min(reports, key=lambda r: r['seconds'])
+
+    path = os.path.splitext(output_path)[0] + FORMAT_EXTENSIONS[chosen['format']]
+    with open(path, 'wb') as f:
+        f.write(chosen['data'])
+    chosen['path'] = path
+    for report in reports:
+        del report['data']
+    return chosen, reports
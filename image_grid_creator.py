@@ -25,9 +25,26 @@ import argparse
 import math
 import subprocess
 import tempfile
-import glob
 import shutil
-from typing import List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, List, Tuple, Optional
+
+from thumbnail_cache import ThumbnailCache, DEFAULT_CACHE_DIR
+from strip_writer import open_strip_writer
+from tile_pyramid import DeepZoomWriter, DEFAULT_TILE_QUALITY
+from image_index import ImageIndex
+from layout_planner import plan_layout, justified_cell_rects
+from image_encoder import (FORMAT_EXTENSIONS, format_from_path, save_image, save_image_with_budget,
+                           parse_encode_budget)
+from filter_graph import FilterGraph
+from frame_renderer import CellRevealRenderer, GridFadeRenderer
+from video_backend import open_video_backend
+from workspace import Workspace, DEFAULT_MEMORY_BUDGET_MB, sigterm_as_exit
+from reveal_scheduler import (REVEAL_FADE, REVEAL_INTERVAL, REVEAL_ORDERS, reveal_times, time_map_unit,
+                              write_time_map)
+from encoder_tuner import EncoderTuner, parse_quality_target, reference_args, reference_command, sample_range
+from chunked_encode import (chunk_ranges, chunk_threads, encode_chunked, encode_command_chunked, gop_args,
+                            gop_frames, run_command, window_trim)
 
 # 尝试导入PIL库，如果没有安装则提供友好的错误信息
 try:
@@ -36,6 +53,86 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
+# NumPy为可选依赖，仅用于numpy合成后端
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# FFmpeg回退方法每次调用的最大输入数量
+FFMPEG_MAX_INPUTS = 32
+
+# 转场视频中短于该时长（秒）的静止区间不单独保持编码，并入相邻的动画区间
+HOLD_MIN_SECONDS = 1.0
+
+# 转场视频与简化视频的默认编码参数（未启用自动调优时使用）
+TRANSITION_ENCODER_ARGS = ['-preset', 'medium', '-crf', '23']
+FLIP_ENCODER_ARGS = ['-preset', 'medium', '-crf', '28']
+
+# 简化视频开头显示完整网格的时长（秒）
+FLIP_LEAD_IN = 0.1
+
+# 原图尺寸至少为目标尺寸的多少倍时，才启用JPEG的DCT缩放解码（draft模式）
+DRAFT_MIN_RATIO = 2
+
+
+def _cell_resample_key(draft: bool, fit: str) -> str:
+    """返回描述缩放方式的缓存键片段（滤镜、是否draft解码、适配方式）"""
+    return f"lanczos{'-draft' if draft else ''}-{fit}"
+
+
+def _load_cell_image(image_path: str, cell_width: int, cell_height: int, draft: bool = True,
+                     cache: Optional[ThumbnailCache] = None, fit: str = 'contain'):
+    """打开图片并按单元格尺寸缩放（模块级函数，便于线程池/进程池调用）
+
+    Args:
+        image_path: 图片路径
+        cell_width: 单元格宽度
+        cell_height: 单元格高度
+        draft: 目标远小于原图时，是否让libjpeg以1/2、1/4或1/8尺寸解码JPEG
+        cache: 缩略图缓存，命中时直接返回缓存的缩放结果，不再解码原图
+        fit: 'contain' 等比缩放到单元格内，'stretch' 拉伸到单元格尺寸
+
+    Returns:
+        Image.Image: 缩放后的图片
+    """
+    if cache is not None:
+        key = cache.key(image_path, cell_width, cell_height, _cell_resample_key(draft, fit))
+        cached = cache.load(key)
+        if cached is not None:
+            return cached
+    
+    with Image.open(image_path) as img:
+        if fit == 'stretch':
+            new_width, new_height = cell_width, cell_height
+        else:
+            # 计算缩放比例以保持宽高比
+            img_ratio = img.width / img.height
+            cell_ratio = cell_width / cell_height
+            
+            if img_ratio > cell_ratio:
+                # 宽度优先
+                new_width = cell_width
+                new_height = int(cell_width / img_ratio)
+            else:
+                # 高度优先
+                new_height = cell_height
+                new_width = int(cell_height * img_ratio)
+        
+        # 单元格远小于原图时，先用DCT缩放解码到不小于目标的尺寸，只保留最后一步缩放
+        if (draft and img.format == 'JPEG'
+                and img.width >= new_width * DRAFT_MIN_RATIO
+                and img.height >= new_height * DRAFT_MIN_RATIO):
+            img.draft(img.mode, (new_width, new_height))
+        
+        # 缩放图片
+        resized = img.resize((new_width, new_height), Image.LANCZOS)
+    
+    if cache is not None:
+        resized = cache.store(key, resized)
+    return resized
+
 
 class ImageGridCreator:
     def __init__(self, 
@@ -44,7 +141,35 @@ class ImageGridCreator:
                  max_height: int = 1080, 
                  create_video: bool = False, 
                  video_duration: float = 5.0, 
-                 fps: float = 30.0):
+                 fps: float = 30.0,
+                 workers: int = 1,
+                 pool_type: str = 'thread',
+                 draft: bool = True,
+                 cache_dir: Optional[str] = None,
+                 cache_size_mb: int = 1024,
+                 backend: str = 'pil',
+                 stream: bool = False,
+                 tiles: bool = False,
+                 tile_size: int = 256,
+                 layout: str = 'sqrt',
+                 cell_width: Optional[int] = None,
+                 cell_height: Optional[int] = None,
+                 output_format: Optional[str] = None,
+                 quality: Optional[int] = None,
+                 effort: Optional[int] = None,
+                 progressive: bool = False,
+                 encode_budget: Optional[str] = None,
+                 renderer: str = 'auto',
+                 static_input: bool = False,
+                 hold_static: bool = True,
+                 encode_chunks: int = 1,
+                 auto_tune: bool = False,
+                 tune_target: str = 'ssim:0.98',
+                 tune_budget: float = 20.0,
+                 video_backend: str = 'auto',
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                 ram_dir: Optional[str] = None,
+                 reveal_order: str = 'row'):
         """初始化图片网格创建器
 
         Args:
@@ -54,6 +179,44 @@ class ImageGridCreator:
             create_video: 是否创建视频
             video_duration: 视频持续时间（秒）
             fps: 视频帧率
+            workers: 并行解码缩放单元格图片的工作数量（1表示串行）
+            pool_type: 工作池类型，'thread'（线程）或 'process'（进程）
+            draft: 单元格远小于原图时是否使用JPEG缩放解码（draft模式）
+            cache_dir: 缩略图缓存目录（None表示不使用缓存）
+            cache_size_mb: 缩略图缓存容量上限（MB）
+            backend: 网格画布合成后端，'pil' 或 'numpy'
+            stream: 是否按行条带流式写出超大网格图片（PNG/TIFF）
+            tiles: 是否输出 Deep Zoom 瓦片金字塔（.dzi）
+            tile_size: 瓦片边长（像素）
+            layout: 布局规划方式，'sqrt'（按数量取平方根）、'auto'（按宽高比选择最佳行列）
+                    或 'justified'（同时考虑等高行布局，仅用于网格图片）
+            cell_width: 流式/瓦片模式的单元格宽度（默认第一张图片的宽度）
+            cell_height: 流式/瓦片模式的单元格高度（默认第一张图片的高度）
+            output_format: 网格图片的输出格式，'jpeg'、'webp' 或 'png'（None表示按扩展名决定）
+            quality: JPEG/WebP质量（None表示默认95，瓦片金字塔默认90）
+            effort: 编码力度（JPEG>0 启用optimize，WebP method 0-6，PNG压缩级别 0-9）
+            progressive: 是否输出渐进式JPEG
+            encode_budget: 编码预算（如 '200ms'、'500KB'、'200ms,500KB'），
+                           指定后自动选择满足预算且画质最高的格式与质量
+            renderer: 转场视频渲染方式，'rawpipe'（NumPy逐帧合成后通过管道送入ffmpeg）、
+                      'ffmpeg'（ffmpeg滤镜图合成）、'mask'（完整网格经单路alpha遮罩 maskedmerge 到背景，
+                      滤镜图大小与单元格数量无关）或 'auto'（可用时使用rawpipe）
+            static_input: ffmpeg滤镜图渲染时，每张图片只作为单帧输入解码缩放一次，
+                          缩放后再用tpad克隆到视频时长（只有淡入逐帧计算）
+            hold_static: rawpipe渲染时，画面不变的区间只编码一帧并保持到区间结束，
+                         与动画区间分段编码后通过concat流复制拼接
+            encode_chunks: 转场视频按GOP边界切分的块数，各块由独立的ffmpeg进程并行编码后
+                           流复制拼接（1表示整条时间线单进程编码）
+            auto_tune: 是否在采样窗口上试编码，自动选择满足目标画质且最快的编码参数
+            tune_target: 自动调优的目标画质，例如 'ssim:0.98'、'psnr:40'
+            tune_budget: 自动调优的试编码时间预算（秒）
+            video_backend: rawpipe帧的编码后端，'pyav'（进程内编码）、'ffmpeg'（管道送入ffmpeg进程）
+                           或 'auto'（安装了PyAV时使用pyav）
+            memory_budget_mb: 中间文件的内存预算（MB），预估大小不超过预算时工作目录放在内存文件系统，
+                              否则放到磁盘（0表示始终使用磁盘）
+            ram_dir: 内存文件系统目录（None表示自动选择 /dev/shm）
+            reveal_order: 转场视频中单元格的显示顺序，'row'（行优先）、'spiral'（螺旋）、
+                          'diagonal'（对角波浪）或 'random'（随机）
         """
         self.output_file = output_file
         self.max_width = max_width
@@ -61,18 +224,54 @@ class ImageGridCreator:
         self.create_video = create_video
         self.video_duration = video_duration
         self.fps = fps
-        self.temp_dir = tempfile.mkdtemp()
+        self.workers = max(1, int(workers))
+        self.pool_type = pool_type
+        self.draft = draft
+        self.backend = backend
+        self.stream = stream
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.layout = layout
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.output_format = output_format
+        self.quality = quality
+        self.effort = effort
+        self.progressive = progressive
+        self.encode_budget = parse_encode_budget(encode_budget) if encode_budget else None
+        self.renderer = renderer
+        self.reveal_order = reveal_order
+        self.static_input = static_input
+        self.hold_static = hold_static
+        self.encode_chunks = max(1, int(encode_chunks))
+        self.tuner = EncoderTuner(tune_target, tune_budget) if auto_tune else None
+        self.video = open_video_backend(video_backend)
+        self.cache = None
+        if cache_dir and PIL_AVAILABLE:
+            self.cache = ThumbnailCache(cache_dir, cache_size_mb * 1024 * 1024)
+        self.workspace = Workspace(self._estimate_workspace_bytes(), memory_budget_mb, ram_dir,
+                                   prefix='image_grid_')
+        self.temp_dir = self.workspace.path
         
     def __del__(self):
-        """清理临时目录"""
-        if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-            try:
-                # 清理临时文件
-                for file in os.listdir(self.temp_dir):
-                    os.remove(os.path.join(self.temp_dir, file))
-                os.rmdir(self.temp_dir)
-            except Exception as e:
-                print(f"警告：清理临时目录失败: {str(e)}")
+        """递归清理临时目录（包括子目录与溢出到磁盘的目录）"""
+        if hasattr(self, 'workspace'):
+            self.workspace.cleanup()
+    
+    def _chunk_dir(self) -> str:
+        """分块编码的块文件目录（工作目录剩余内存不足时溢出到磁盘）"""
+        return self.workspace.dir_for(self._estimate_workspace_bytes())
+    
+    def _estimate_workspace_bytes(self) -> int:
+        """预估中间文件的总大小：网格图片按未压缩RGB计算，视频按每帧约1/50的RGB数据量计算"""
+        frame_bytes = self.max_width * self.max_height * 3
+        video_bytes = 0
+        if self.create_video:
+            video_bytes = int(self.video_duration * self.fps * frame_bytes / 50)
+            if self.encode_chunks > 1:
+                # 分块编码时块文件与拼接结果同时存在
+                video_bytes *= 2
+        return frame_bytes + video_bytes
 
     def check_ffmpeg(self) -> bool:
         """检查FFmpeg是否安装
@@ -101,21 +300,14 @@ class ImageGridCreator:
             print(f"错误：目录不存在: {dir_path}")
             return []
         
-        # 支持的图片格式
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
-        image_files = []
-        
-        for ext in image_extensions:
-            # 使用glob模式匹配所有图片文件
-            pattern = os.path.join(dir_path, f'*{ext}')
-            image_files.extend(glob.glob(pattern))
-            # 处理大写扩展名
-            pattern = os.path.join(dir_path, f'*{ext.upper()}')
-            image_files.extend(glob.glob(pattern))
-        
-        # 按文件名排序
-        image_files.sort()
-        return image_files
+        # 一次 os.scandir 遍历目录，并把图片的宽高与格式记录到元数据索引中
+        index = ImageIndex(dir_path)
+        try:
+            index.scan()
+            # 按文件名排序
+            return [img_path for img_path, _, _, _ in index.images()]
+        finally:
+            index.close()
 
     def calculate_grid_size(self, num_images: int) -> Tuple[int, int]:
         """根据图片数量计算合适的行列数
@@ -136,142 +328,243 @@ class ImageGridCreator:
         
         return rows, cols
 
-    def create_grid_image(self, image_files: List[str], output_path: str) -> bool:
+    def _iter_cell_images(self, image_files: List[str], cell_width: int, cell_height: int,
+                          cell_sizes: Optional[List[Tuple[int, int]]] = None, fit: str = 'contain'):
+        """按顺序产出每个单元格缩放后的图片
+
+        workers大于1时使用工作池并行解码与缩放，但结果仍按输入顺序返回，
+        因此粘贴结果与串行处理完全一致。
+
+        Args:
+            image_files: 图片文件列表
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+            cell_sizes: 每张图片各自的单元格尺寸（等高行布局使用），为None时统一使用 cell_width x cell_height
+            fit: 'contain' 等比缩放到单元格内，'stretch' 拉伸到单元格尺寸
+
+        Yields:
+            Tuple[int, Optional[Image.Image]]: (图片序号, 缩放后的图片，失败时为None)
+        """
+        if cell_sizes is None:
+            cell_sizes = [(cell_width, cell_height)] * len(image_files)
+        
+        if self.workers <= 1 or len(image_files) <= 1:
+            for i, img_path in enumerate(image_files):
+                try:
+                    yield i, _load_cell_image(img_path, *cell_sizes[i], self.draft, self.cache, fit)
+                except Exception as e:
+                    print(f"警告：处理图片 {i} 失败: {str(e)}")
+                    yield i, None
+            return
+        
+        executor_class = ProcessPoolExecutor if self.pool_type == 'process' else ThreadPoolExecutor
+        with executor_class(max_workers=self.workers) as executor:
+            futures = [executor.submit(_load_cell_image, img_path, *cell_sizes[i], self.draft, self.cache, fit)
+                       for i, img_path in enumerate(image_files)]
+            for i, future in enumerate(futures):
+                try:
+                    yield i, future.result()
+                except Exception as e:
+                    print(f"警告：处理图片 {i} 失败: {str(e)}")
+                    yield i, None
+
+    def _evict_cache(self):
+        """网格处理结束后按LRU淘汰超出容量的缓存项"""
+        if self.cache is not None:
+            removed = self.cache.evict()
+            if removed:
+                print(f"缩略图缓存超出容量，已淘汰 {removed} 项")
+
+    def _cached_cell_path(self, image_path: str, cell_width: int, cell_height: int) -> str:
+        """返回拉伸到单元格尺寸的缓存缩略图路径，供FFmpeg直接读取（无缓存时返回原图路径）
+
+        Args:
+            image_path: 原图路径
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+
+        Returns:
+            str: 缩略图（或原图）的绝对路径
+        """
+        if self.cache is None:
+            return os.path.abspath(image_path)
+        try:
+            _load_cell_image(image_path, cell_width, cell_height, self.draft, self.cache, fit='stretch')
+            key = self.cache.key(image_path, cell_width, cell_height, _cell_resample_key(self.draft, 'stretch'))
+            return self.cache.path_for(key)
+        except Exception as e:
+            print(f"警告：读取缩略图缓存失败，使用原图: {str(e)}")
+            return os.path.abspath(image_path)
+
+    def _grid_rects(self, num_images: int, cols: int, cell_width: int, cell_height: int) -> List[Tuple[int, int, int, int]]:
+        """返回规则网格中每张图片所在单元格的矩形 (x, y, 宽, 高)"""
+        return [((i % cols) * cell_width, (i // cols) * cell_height, cell_width, cell_height)
+                for i in range(num_images)]
+
+    def _centered_position(self, rect: Tuple[int, int, int, int], img_width: int, img_height: int) -> Tuple[int, int]:
+        """计算缩放后的图片在单元格矩形中居中放置的左上角坐标
+
+        Returns:
+            Tuple[int, int]: (x, y)
+        """
+        x_pos, y_pos, cell_width, cell_height = rect
+        return x_pos + (cell_width - img_width) // 2, y_pos + (cell_height - img_height) // 2
+
+    def _compose_pil(self, cells, rects: List[Tuple[int, int, int, int]]):
+        """使用PIL逐个粘贴单元格合成网格画布
+
+        Args:
+            cells: 按顺序产出 (序号, 缩放后的图片) 的可迭代对象
+            rects: 每张图片所在单元格的矩形 (x, y, 宽, 高)
+
+        Returns:
+            Image.Image: 网格画布
+        """
+        # 创建空白背景图片
+        grid_image = Image.new('RGB', (self.max_width, self.max_height), color='black')
+        for i, img in cells:
+            if img is None:
+                # 空白单元格或处理失败，保持黑色背景
+                continue
+            grid_image.paste(img, self._centered_position(rects[i], img.width, img.height))
+        return grid_image
+
+    def _compose_numpy(self, cells, rects: List[Tuple[int, int, int, int]]):
+        """预分配一块连续的 HxWx3 uint8 数组，把每个单元格直接写入对应切片
+
+        合成结果与PIL粘贴逐像素一致，可以一次性编码，也可以作为原始帧交给FFmpeg。
+
+        Args:
+            cells: 按顺序产出 (序号, 缩放后的图片) 的可迭代对象
+            rects: 每张图片所在单元格的矩形 (x, y, 宽, 高)
+
+        Returns:
+            np.ndarray: 形状为 (max_height, max_width, 3) 的画布数组
+        """
+        canvas = np.zeros((self.max_height, self.max_width, 3), dtype=np.uint8)
+        for i, img in cells:
+            if img is None:
+                continue
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            x, y = self._centered_position(rects[i], img.width, img.height)
+            canvas[y:y + img.height, x:x + img.width] = np.asarray(img)
+        return canvas
+
+    def _image_dimensions(self, image_files: List[str]) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+        """通过各目录的元数据索引（只读取文件头）获取所有图片的宽高
+
+        Returns:
+            Tuple[List, List]: (宽度列表, 高度列表)，无法识别的图片为None
+        """
+        records = {}
+        for dir_path in sorted({os.path.dirname(os.path.abspath(path)) for path in image_files}):
+            index = ImageIndex(dir_path)
+            try:
+                index.scan()
+                for img_path, width, height, _ in index.images():
+                    records[os.path.abspath(img_path)] = (width, height)
+            finally:
+                index.close()
+        dims = [records.get(os.path.abspath(path), (None, None)) for path in image_files]
+        return [width for width, _ in dims], [height for _, height in dims]
+
+    def _plan_layout(self, image_files: List[str], allow_justified: bool = False) -> dict:
+        """根据 self.layout 规划网格布局
+
+        'sqrt' 使用 calculate_grid_size；'auto' 与 'justified' 根据图片宽高比选择可见像素最多的布局，
+        其中只有 'justified' 且 allow_justified 时才会返回等高行布局。
+
+        Returns:
+            dict: 布局描述，'kind' 为 'grid' 时包含 rows/cols，为 'justified' 时包含每张图片的 rects
+        """
+        num_images = len(image_files)
+        if self.layout != 'sqrt' and NUMPY_AVAILABLE and num_images > 0:
+            widths, heights = self._image_dimensions(image_files)
+            plan = plan_layout(widths, heights, self.max_width, self.max_height,
+                               allow_justified=allow_justified and self.layout == 'justified')
+            if plan['kind'] == 'justified':
+                plan['rects'] = justified_cell_rects(plan, plan['aspects'], self.max_width, self.max_height)
+            return plan
+        if self.layout != 'sqrt' and not NUMPY_AVAILABLE:
+            print("警告：未安装NumPy，布局规划回退到 calculate_grid_size")
+        rows, cols = self.calculate_grid_size(num_images)
+        return {'kind': 'grid', 'rows': rows, 'cols': cols}
+
+    def _grid_size_for(self, image_files: List[str]) -> Tuple[int, int]:
+        """返回规则网格的 (行数, 列数)"""
+        plan = self._plan_layout(image_files)
+        return plan['rows'], plan['cols']
+
+    def create_grid_image(self, image_files: List[str], output_path: str,
+                          plan: Optional[dict] = None) -> Optional[str]:
         """创建网格图片
 
         Args:
             image_files: 图片文件列表
             output_path: 输出文件路径
+            plan: 使用给定的布局规划（None表示按 self.layout 规划，PIL可用时允许等高行布局）
 
         Returns:
-            bool: 是否成功创建
+            Optional[str]: 实际写出的文件路径（编码预算模式下扩展名可能随所选格式变化），失败返回None
         """
         num_images = len(image_files)
         if num_images == 0:
             print("错误：没有找到图片文件！")
-            return False
+            return None
         
-        # 计算行列数
-        rows, cols = self.calculate_grid_size(num_images)
-        print(f"使用 {rows}x{cols} 的网格布局合并 {num_images} 张图片")
-        
-        # 计算每个单元格的尺寸
-        cell_width = self.max_width // cols
-        cell_height = self.max_height // rows
-        
-        # 确保尺寸是偶数（H.264要求）
-        cell_width = cell_width // 2 * 2
-        cell_height = cell_height // 2 * 2
+        # 计算行列数（等高行布局只在PIL方法中使用）
+        if plan is None:
+            plan = self._plan_layout(image_files, allow_justified=PIL_AVAILABLE)
+        if plan['kind'] == 'justified':
+            print(f"使用 {plan['rows']} 行等高布局合并 {num_images} 张图片")
+            rows, cols = plan['rows'], 0
+            cell_width = cell_height = 0
+        else:
+            rows, cols = plan['rows'], plan['cols']
+            print(f"使用 {rows}x{cols} 的网格布局合并 {num_images} 张图片")
+            
+            # 计算每个单元格的尺寸
+            cell_width = self.max_width // cols
+            cell_height = self.max_height // rows
+            
+            # 确保尺寸是偶数（H.264要求）
+            cell_width = cell_width // 2 * 2
+            cell_height = cell_height // 2 * 2
         
         try:
             # 优先使用PIL库来处理图片网格创建，这更可靠
             if PIL_AVAILABLE:
-                print("使用PIL库创建网格图片...")
-                
-                # 创建空白背景图片
-                grid_image = Image.new('RGB', (self.max_width, self.max_height), color='black')
+                if plan['kind'] == 'justified':
+                    rects = plan['rects']
+                    cell_sizes = [(width, height) for _, _, width, height in rects]
+                else:
+                    rects = self._grid_rects(num_images, cols, cell_width, cell_height)
+                    cell_sizes = None
+                # 解码与缩放可在工作池中并行执行，合成按顺序进行
+                cells = self._iter_cell_images(image_files, cell_width, cell_height, cell_sizes)
+                if self.backend == 'numpy' and NUMPY_AVAILABLE:
+                    print("使用NumPy画布合成网格图片...")
+                    grid_image = Image.fromarray(self._compose_numpy(cells, rects))
+                else:
+                    if self.backend == 'numpy':
+                        print("警告：未安装NumPy，回退到PIL合成")
+                    print("使用PIL库创建网格图片...")
+                    grid_image = self._compose_pil(cells, rects)
                 
-                # 处理并放置每张图片
-                for i in range(rows * cols):
-                    row = i // cols
-                    col = i % cols
-                    x_pos = col * cell_width
-                    y_pos = row * cell_height
-                    
-                    try:
-                        if i < num_images:
-                            # 打开并处理实际图片
-                            with Image.open(image_files[i]) as img:
-                                # 计算缩放比例以保持宽高比
-                                img_ratio = img.width / img.height
-                                cell_ratio = cell_width / cell_height
-                                
-                                if img_ratio > cell_ratio:
-                                    # 宽度优先
-                                    new_width = cell_width
-                                    new_height = int(cell_width / img_ratio)
-                                else:
-                                    # 高度优先
-                                    new_height = cell_height
-                                    new_width = int(cell_height * img_ratio)
-                                
-                                # 缩放图片
-                                img = img.resize((new_width, new_height), Image.LANCZOS)
-                                
-                                # 计算居中位置
-                                paste_x = x_pos + (cell_width - new_width) // 2
-                                paste_y = y_pos + (cell_height - new_height) // 2
-                                
-                                # 粘贴到网格中
-                                grid_image.paste(img, (paste_x, paste_y))
-                        else:
-                            # 空白单元格，保持黑色背景
-                            pass
-                    except Exception as e:
-                        print(f"警告：处理图片 {i} 失败: {str(e)}")
-                        # 继续处理其他图片
-                        continue
+                self._evict_cache()
                 
                 # 保存最终的网格图片
-                grid_image.save(output_path, quality=95)
+                output_path = self._save_grid_image(grid_image, output_path)
                 print(f"成功创建网格图片: {output_path}")
-                return True
+                return output_path
             else:
-                # 如果没有PIL库，回退到使用FFmpeg的方法，但进行简化以避免命令行过长
+                # 如果没有PIL库，回退到FFmpeg方法：按行分批生成条带再堆叠，不限制图片数量
                 print("PIL库不可用，回退到FFmpeg方法...")
-                
-                # 使用更简单的FFmpeg方法：创建一个小的网格来测试
-                # 限制最大图片数量以避免命令行过长
-                max_images = 50  # 限制处理的图片数量
-                if num_images > max_images:
-                    print(f"警告：图片数量过多（{num_images}张），将只处理前{max_images}张图片")
-                    image_files = image_files[:max_images]
-                    num_images = max_images
-                    # 重新计算行列数
-                    rows, cols = self.calculate_grid_size(num_images)
-                    print(f"使用调整后的 {rows}x{cols} 网格布局")
-                
-                # 构建FFmpeg命令
-                cmd = ['ffmpeg']
-                
-                # 添加输入文件
-                for img_path in image_files:
-                    cmd.extend(['-i', img_path])
-                
-                # 添加足够的黑色背景
-                for _ in range(num_images, rows * cols):
-                    cmd.extend(['-f', 'lavfi', '-i', f'color=c=black:s=1x1:r=1'])
-                
-                # 构建滤镜
-                filter_complex = []
-                
-                # 处理每个图片，缩放到单元格大小并居中
-                for i in range(rows * cols):
-                    filter_complex.append(
-                        f'[{i}:v]scale={cell_width}:{cell_height}:force_original_aspect_ratio=decrease:flags=lanczos,pad={cell_width}:{cell_height}:(ow-iw)/2:(oh-ih)/2:black[img{i}]'
-                    )
-                
-                # 构建网格堆叠滤镜
-                grid_filters = []
-                for row in range(rows):
-                    row_inputs = ''.join([f'[img{row*cols + col}]' for col in range(cols)])
-                    grid_filters.append(f'{row_inputs}hstack=inputs={cols}[row{row}]')
-                
-                # 垂直堆叠所有行
-                rows_input = ''.join([f'[row{r}]' for r in range(rows)])
-                grid_filters.append(f'{rows_input}vstack=inputs={rows}[final]')
-                
-                # 添加滤镜参数
-                cmd.extend(['-filter_complex', ';'.join(filter_complex + grid_filters)])
-                
-                # 设置输出参数
-                cmd.extend(['-map', '[final]', '-q:v', '2', '-y', output_path])
-                
-                print(f"正在创建网格图片: {output_path}")
-                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                self._create_grid_image_ffmpeg(image_files, output_path, rows, cols, cell_width, cell_height)
                 print(f"成功创建网格图片: {output_path}")
                 print("提示：安装PIL库（pip install pillow）可以获得更好的性能和稳定性！")
-                return True
+                return output_path
         except Exception as e:
             print(f"创建网格图片失败: {str(e)}")
             # 尝试打印详细的错误输出以帮助调试
@@ -281,6 +574,280 @@ class ImageGridCreator:
                     print(f"FFmpeg错误输出: {stderr_output[:500]}...")  # 只打印前500个字符
                 except:
                     pass
+            return None
+
+    def _save_grid_image(self, grid_image, output_path: str) -> str:
+        """按输出格式设置（或编码预算）保存网格图片，并报告编码耗时与输出大小
+
+        Args:
+            grid_image: 合成好的网格图片
+            output_path: 输出文件路径
+
+        Returns:
+            str: 实际写出的文件路径（预算模式下扩展名可能随所选格式变化）
+        """
+        if self.encode_budget:
+            max_seconds, max_bytes = self.encode_budget
+            chosen, reports = save_image_with_budget(grid_image, output_path, max_seconds, max_bytes,
+                                                     effort=self.effort)
+            for report in reports:
+                quality = '无损' if report['quality'] is None else f"质量{report['quality']}"
+                status = '满足预算' if report['fits'] else '超出预算'
+                print(f"  试编码 {report['format']} {quality}: "
+                      f"{report['seconds'] * 1000:.1f}ms, {report['bytes'] / 1024:.1f}KB（{status}）")
+            if not chosen['fits']:
+                print("警告：没有满足编码预算的格式，已选择最接近预算的结果")
+        else:
+            chosen = save_image(grid_image, output_path, self.output_format, self.quality,
+                                self.effort, self.progressive)
+        print(f"编码格式: {chosen['format']}，耗时 {chosen['seconds'] * 1000:.1f}ms，"
+              f"大小 {chosen['bytes'] / 1024:.1f}KB")
+        return chosen['path']
+
+    def _ffmpeg_batch_size(self) -> int:
+        """每次FFmpeg调用允许的最大输入数量，同时受命令行长度与文件描述符上限约束"""
+        batch_size = FFMPEG_MAX_INPUTS
+        try:
+            import resource
+            soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if soft_limit != resource.RLIM_INFINITY:
+                # 每个输入至少占用一个描述符，预留一部分给输出与日志
+                batch_size = min(batch_size, (soft_limit - 32) // 2)
+        except (ImportError, ValueError, OSError):
+            pass
+        return max(2, batch_size)
+
+    def _run_ffmpeg_script(self, input_paths: List[str], graph: FilterGraph, output_path: str,
+                           output_args: Optional[List[str]] = None):
+        """通过 -filter_complex_script 执行滤镜图，滤镜内容不出现在命令行参数中
+
+        Args:
+            input_paths: 输入文件列表
+            graph: 滤镜图，输出标签必须为 [out]
+            output_path: 输出文件路径
+            output_args: 额外的输出参数
+        """
+        script_path = graph.write_script(self.temp_dir)
+        cmd = ['ffmpeg']
+        for input_path in input_paths:
+            cmd.extend(['-i', input_path])
+        cmd.extend(['-filter_complex_script', script_path, '-map', '[out]', '-frames:v', '1'])
+        cmd.extend(output_args or [])
+        cmd.extend(['-y', output_path])
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        finally:
+            os.remove(script_path)
+
+    def _ffmpeg_stack_files(self, paths: List[str], direction: str, output_path: str,
+                            final_filter: Optional[str] = None,
+                            output_args: Optional[List[str]] = None):
+        """分批把尺寸一致的图片水平或垂直堆叠为一张图片（超出批量时分层堆叠）
+
+        Args:
+            paths: 待堆叠的图片列表
+            direction: 'h' 水平堆叠，'v' 垂直堆叠
+            output_path: 输出文件路径
+            final_filter: 最后一次堆叠后追加的滤镜
+            output_args: 最后一次堆叠的额外输出参数
+        """
+        batch_size = self._ffmpeg_batch_size()
+        level = 0
+        while len(paths) > batch_size:
+            # 先把每批图片堆叠为中间PNG（无损），再堆叠中间结果
+            merged = []
+            for start in range(0, len(paths), batch_size):
+                batch = paths[start:start + batch_size]
+                if len(batch) == 1:
+                    merged.append(batch[0])
+                    continue
+                part_path = os.path.join(self.temp_dir, f'stack_{direction}_{level}_{start}_{os.getpid()}.png')
+                self._ffmpeg_stack_files(batch, direction, part_path)
+                merged.append(part_path)
+            paths = merged
+            level += 1
+        
+        graph = FilterGraph(max_stack_inputs=batch_size)
+        stacked = graph.stack([graph.input(i) for i in range(len(paths))], direction)
+        graph.chain(stacked, [final_filter] if final_filter else [], output='out')
+        self._run_ffmpeg_script(paths, graph, output_path, output_args)
+
+    def _create_grid_image_ffmpeg(self, image_files: List[str], output_path: str,
+                                  rows: int, cols: int, cell_width: int, cell_height: int):
+        """不依赖PIL的网格图片创建：逐行分批缩放并水平堆叠为条带，再垂直堆叠所有条带
+
+        每次FFmpeg调用的输入数量受 _ffmpeg_batch_size 限制，滤镜图通过脚本文件传递，
+        因此可以处理成千上万张图片而不会超出命令行长度或文件描述符上限，也不会丢弃图片。
+
+        Args:
+            image_files: 图片文件列表
+            output_path: 输出文件路径
+            rows: 行数
+            cols: 列数
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+        """
+        batch_size = self._ffmpeg_batch_size()
+        strip_dir = tempfile.mkdtemp(prefix='grid_strips_',
+                                     dir=self.workspace.dir_for(rows * cols * cell_width * cell_height * 3))
+        try:
+            row_paths = []
+            for row in range(rows):
+                row_files = image_files[row * cols:(row + 1) * cols]
+                segment_paths = []
+                for start in range(0, cols, batch_size):
+                    segment_files = row_files[start:start + batch_size]
+                    segment_cells = min(batch_size, cols - start)
+                    graph = FilterGraph(max_stack_inputs=batch_size)
+                    cell_labels = []
+                    for i in range(segment_cells):
+                        if i < len(segment_files):
+                            # 缩放到单元格大小并居中
+                            cell_labels.append(graph.chain(graph.input(i), [
+                                f'scale={cell_width}:{cell_height}:force_original_aspect_ratio=decrease:flags=lanczos',
+                                f'pad={cell_width}:{cell_height}:(ow-iw)/2:(oh-ih)/2:black', 'setsar=1', 'format=rgb24']))
+                        else:
+                            # 最后一行不足的单元格使用黑色填充
+                            cell_labels.append(graph.chain(
+                                graph.source(f'color=c=black:s={cell_width}x{cell_height}:r=1:d=1'),
+                                ['setsar=1', 'format=rgb24']))
+                    graph.output(graph.stack(cell_labels, 'h'))
+                    segment_path = os.path.join(strip_dir, f'row_{row:05d}_{start:05d}.png')
+                    self._run_ffmpeg_script(segment_files, graph, segment_path)
+                    segment_paths.append(segment_path)
+                
+                if len(segment_paths) == 1:
+                    row_paths.append(segment_paths[0])
+                else:
+                    row_path = os.path.join(strip_dir, f'row_{row:05d}.png')
+                    self._ffmpeg_stack_files(segment_paths, 'h', row_path)
+                    row_paths.append(row_path)
+                print(f"已生成第 {row + 1}/{rows} 行条带")
+            
+            # 垂直堆叠所有条带，并与PIL方法一样把网格放在 max_width x max_height 画布的左上角
+            print(f"正在创建网格图片: {output_path}")
+            self._ffmpeg_stack_files(row_paths, 'v', output_path,
+                                     final_filter=f'pad={self.max_width}:{self.max_height}:0:0:black',
+                                     output_args=['-q:v', '2'])
+        finally:
+            shutil.rmtree(strip_dir, ignore_errors=True)
+
+    def create_grid_image_streaming(self, image_files: List[str], output_path: str,
+                                    cell_width: Optional[int] = None,
+                                    cell_height: Optional[int] = None) -> bool:
+        """按行条带流式创建超大网格图片（PNG或TIFF），峰值内存只与一个条带有关
+
+        行列数与calculate_grid_size一致，但画布不受max_width/max_height限制，
+        单元格默认使用第一张图片的原始尺寸。
+
+        Args:
+            image_files: 图片文件列表
+            output_path: 输出文件路径（.png / .tif / .tiff）
+            cell_width: 单元格宽度（默认第一张图片的宽度）
+            cell_height: 单元格高度（默认第一张图片的高度）
+
+        Returns:
+            bool: 是否成功创建
+        """
+        num_images = len(image_files)
+        if num_images == 0:
+            print("错误：没有找到图片文件！")
+            return False
+        if not PIL_AVAILABLE:
+            print("错误：流式网格图片需要PIL库（pip install pillow）")
+            return False
+        
+        rows, cols = self.calculate_grid_size(num_images)
+        try:
+            if not cell_width or not cell_height:
+                with Image.open(image_files[0]) as first:
+                    cell_width = cell_width or first.width
+                    cell_height = cell_height or first.height
+            canvas_width = cols * cell_width
+            canvas_height = rows * cell_height
+            print(f"使用 {rows}x{cols} 的网格布局流式合并 {num_images} 张图片")
+            print(f"单元格尺寸: {cell_width}x{cell_height}, 画布尺寸: {canvas_width}x{canvas_height}")
+            
+            writer = open_strip_writer(output_path, canvas_width, canvas_height)
+            try:
+                for row in range(rows):
+                    # 每次只解码、缩放并合成一行单元格
+                    row_files = image_files[row * cols:(row + 1) * cols]
+                    strip = Image.new('RGB', (canvas_width, cell_height), color='black')
+                    rects = self._grid_rects(len(row_files), cols, cell_width, cell_height)
+                    for i, img in self._iter_cell_images(row_files, cell_width, cell_height):
+                        if img is not None:
+                            strip.paste(img, self._centered_position(rects[i], img.width, img.height))
+                    writer.write_strip(strip.tobytes(), cell_height)
+                    print(f"已写出第 {row + 1}/{rows} 行条带")
+            finally:
+                writer.close()
+            
+            self._evict_cache()
+            print(f"成功创建网格图片: {output_path}")
+            return True
+        except Exception as e:
+            print(f"流式创建网格图片失败: {str(e)}")
+            return False
+
+    def create_tile_pyramid(self, image_files: List[str], output_path: str,
+                            cell_width: Optional[int] = None,
+                            cell_height: Optional[int] = None,
+                            tile_size: int = 256) -> bool:
+        """按网格布局生成 Deep Zoom 瓦片金字塔（.dzi + 瓦片目录）
+
+        瓦片直接由（缓存的）单元格缩略图拼出；再次生成时只重写受变化影响的瓦片。
+
+        Args:
+            image_files: 图片文件列表
+            output_path: .dzi 描述文件路径
+            cell_width: 最高层级的单元格宽度（默认第一张图片的宽度）
+            cell_height: 最高层级的单元格高度（默认第一张图片的高度）
+            tile_size: 瓦片边长（像素）
+
+        Returns:
+            bool: 是否成功创建
+        """
+        num_images = len(image_files)
+        if num_images == 0:
+            print("错误：没有找到图片文件！")
+            return False
+        if not PIL_AVAILABLE:
+            print("错误：瓦片金字塔需要PIL库（pip install pillow）")
+            return False
+        
+        rows, cols = self.calculate_grid_size(num_images)
+        try:
+            if not cell_width or not cell_height:
+                with Image.open(image_files[0]) as first:
+                    cell_width = cell_width or first.width
+                    cell_height = cell_height or first.height
+            writer = DeepZoomWriter(output_path, rows, cols, cell_width, cell_height, tile_size,
+                                    self.quality or DEFAULT_TILE_QUALITY)
+            print(f"使用 {rows}x{cols} 的网格布局生成瓦片金字塔: {writer.width}x{writer.height}, "
+                  f"{writer.max_level + 1} 个层级")
+            
+            # 单元格身份：路径、大小与修改时间，任何一项变化都会使相关瓦片失效
+            cell_identities = []
+            for img_path in image_files:
+                stat = os.stat(img_path)
+                cell_identities.append(f"{os.path.abspath(img_path)}|{stat.st_size}|{stat.st_mtime_ns}")
+            
+            def load_cell(index, width, height):
+                # 最高层级的原尺寸单元格不写入缩略图缓存，避免挤掉真正的缩略图
+                cache = self.cache if width < cell_width or height < cell_height else None
+                try:
+                    return _load_cell_image(image_files[index], width, height, self.draft, cache)
+                except Exception as e:
+                    print(f"警告：处理图片 {index} 失败: {str(e)}")
+                    return None
+            
+            written, skipped = writer.write(cell_identities, load_cell)
+            self._evict_cache()
+            print(f"成功生成瓦片金字塔: {output_path}（重写 {written} 个瓦片，未变化 {skipped} 个）")
+            return True
+        except Exception as e:
+            print(f"生成瓦片金字塔失败: {str(e)}")
             return False
 
     def create_transition_video(self, image_files: List[str], output_path: str) -> bool:
@@ -302,7 +869,7 @@ class ImageGridCreator:
             return False
         
         # 计算行列数
-        rows, cols = self.calculate_grid_size(num_images)
+        rows, cols = self._grid_size_for(image_files)
         print(f"使用 {rows}x{cols} 的网格布局创建视频")
         
         # 计算每个单元格的尺寸
@@ -313,64 +880,28 @@ class ImageGridCreator:
         cell_width = cell_width // 2 * 2
         cell_height = cell_height // 2 * 2
         
+        if self._use_rawpipe():
+            return self._create_transition_video_rawpipe(image_files, output_path, rows, cols,
+                                                         cell_width, cell_height)
+        
         try:
-            # 准备FFmpeg命令
-            cmd = ['/opt/homebrew/bin/ffmpeg']
-            
-            # 添加图片输入
-            for img_path in image_files:
-                cmd.extend(['-loop', '1', '-i', os.path.abspath(img_path)])
-            
-            # 计算需要的空白单元格数量
-            total_cells = rows * cols
-            empty_cells_needed = total_cells - num_images
-            
-            # 添加空白单元格（使用黑色背景）
-            for _ in range(empty_cells_needed):
-                cmd.extend(['-f', 'lavfi', '-i', f'color=c=black:s={cell_width}x{cell_height}:r={self.fps}:d={self.video_duration}'])
-            
-            # 添加主背景
-            cmd.extend(['-f', 'lavfi', '-i', f'color=c=black:s={self.max_width}x{self.max_height}:r={self.fps}:d={self.video_duration}'])
-            
-            # 构建filter_complex，确保特殊字符被正确处理
-            filter_complex_parts = []
-            
-            # 为每张图片创建缩放和处理，添加fade淡入效果，每张图片依次延迟淡入
-            for i in range(num_images):
-                # 计算淡入起始时间，每张图片延迟0.5秒
-                fade_start_time = i * 0.5
-                # 使用字符串格式化而不是直接拼接，确保特殊字符正确处理
-                filter_str = f"[{i}:v]scale={cell_width}:{cell_height},trim=duration={self.video_duration},setpts=PTS-STARTPTS,fade=in:st={fade_start_time}:d=0.5:alpha=1[img{i+1}]"
-                filter_complex_parts.append(filter_str)
-            
-            # 处理空白单元格
-            for i in range(num_images, total_cells):
-                blank_index = i
-                filter_str = f"[{blank_index}:v]trim=duration={self.video_duration},setpts=PTS-STARTPTS[img{i+1}]"
-                filter_complex_parts.append(filter_str)
-            
-            # 使用xstack组合图片网格
-            xstack_inputs = ''.join([f'[img{i+1}]' for i in range(total_cells)])
-            filter_complex_parts.append(f"{xstack_inputs}xstack=grid={cols}x{rows}[grid]")
-            
-            # 将网格叠加到背景上
-            background_index = total_cells
-            filter_complex_parts.append(f"[{background_index}:v][grid]overlay=(W-w)/2:(H-h)/2[out]")
-            
-            # 构建完整的filter_complex字符串（使用分号分隔）
-            filter_complex = ";".join(filter_complex_parts)
-            
-            # 添加输出参数
-            cmd.extend(['-filter_complex', filter_complex])
-            cmd.extend(['-map', '[out]'])
-            cmd.extend(['-t', str(self.video_duration)])
-            cmd.extend(['-r', str(self.fps)])
-            cmd.extend(['-c:v', 'libx264'])
-            cmd.extend(['-preset', 'medium'])
-            cmd.extend(['-crf', '23'])
-            cmd.extend(['-pix_fmt', 'yuv420p'])
-            cmd.extend(['-y', output_path])
-            
+            if self._use_mask():
+                mask_inputs = self._prepare_mask_inputs(image_files, rows, cols, cell_width, cell_height)
+                build_command = lambda encoder_args=None, frame_range=None: self._mask_reveal_command(
+                    *mask_inputs, output_path, rows, cols, cell_width, cell_height, encoder_args, frame_range)
+            else:
+                build_command = lambda encoder_args=None, frame_range=None: self._transition_video_command(
+                    image_files, output_path, rows, cols, cell_width, cell_height, encoder_args, frame_range)
+            frame_count = max(1, math.ceil(self.video_duration * self.fps - 1e-9))
+            encoder_args = None
+            if self.tuner:
+                # 采样窗口取时间线中间（开头单元格尚未显示，几乎是黑场），只渲染窗口内的帧
+                sample = sample_range(frame_count, self.fps)
+                encoder_args = self._encoder_args(
+                    f'transition|{self.max_width}x{self.max_height}|{rows}x{cols}|{self.fps}fps',
+                    TRANSITION_ENCODER_ARGS,
+                    lambda path: run_command(reference_command(build_command(frame_range=sample), path))[0])
+            cmd = build_command(encoder_args)
          
             # 执行FFmpeg命令
             print(f"正在创建视频: {output_path}")
@@ -378,20 +909,327 @@ class ImageGridCreator:
             print(f"使用 {rows}x{cols} 网格布局，共 {num_images} 张图片")
             print(f"FFmpeg命令: {' '.join(cmd)}")
             
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-            stdout, stderr = process.communicate()
+            if self.encode_chunks > 1:
+                returncode, stderr = encode_command_chunked(
+                    lambda start, end: build_command(encoder_args, (start, end)), frame_count, self.fps,
+                    output_path, self.encode_chunks, self._chunk_dir())
+            else:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                stdout, stderr = process.communicate()
+                returncode = process.returncode
+            self._evict_cache()
+            
+            if returncode == 0 and os.path.exists(output_path):
+                print(f"成功创建视频: {output_path} (大小: {os.path.getsize(output_path)} 字节)")
+                return True
+            else:
+                print(f"FFmpeg命令执行失败: {returncode}")
+                print(f"错误输出: {stderr[:500]}")
+                return False
+        except Exception as e:
+            print(f"创建视频失败: {str(e)}")
+            return False
+    
+    def _transition_video_command(self, image_files: List[str], output_path: str, rows: int, cols: int,
+                                  cell_width: int, cell_height: int,
+                                  encoder_args: Optional[List[str]] = None,
+                                  frame_range: Optional[Tuple[int, int]] = None) -> List[str]:
+        """构建滤镜图方式的转场视频FFmpeg命令
+
+        Args:
+            image_files: 图片文件列表
+            output_path: 输出文件路径
+            rows: 行数
+            cols: 列数
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+            encoder_args: libx264编码参数（默认 TRANSITION_ENCODER_ARGS）
+            frame_range: 只渲染 [开始帧, 结束帧) 的分块命令（None表示整条时间线），
+                         窗口在淡入之前裁剪，块之前的帧不做淡入与堆叠
+
+        Returns:
+            List[str]: FFmpeg命令
+        """
+        num_images = len(image_files)
+        fade_starts = self._reveal_starts(num_images, rows, cols)
+        duration = self.video_duration
+        if frame_range:
+            duration = (frame_range[1] - frame_range[0]) / self.fps
+            window = [window_trim(*frame_range)]
+        # 准备FFmpeg命令
+        cmd = ['/opt/homebrew/bin/ffmpeg']
+        graph = FilterGraph()
+        cell_labels = []
+        
+        # 添加图片输入（启用缓存时直接使用已缩放到单元格尺寸的缩略图）
+        for i, img_path in enumerate(image_files):
+            cell_path = self._cached_cell_path(img_path, cell_width, cell_height)
+            scale = [f"scale={cell_width}:{cell_height}"]
+            if self.static_input:
+                # 单帧输入：只解码一次，缩放后克隆缩放结果，逐帧只计算淡入
+                cmd.extend(['-framerate', str(self.fps), '-i', cell_path])
+                filters = scale + [f"tpad=stop_mode=clone:stop_duration={self.video_duration}"]
+            else:
+                # 循环输入每帧都要缩放，先裁剪窗口再缩放
+                cmd.extend(['-loop', '1', '-framerate', str(self.fps), '-i', cell_path])
+                filters = scale if frame_range is None else window + scale
+            # 每张图片按显示时间表淡入；背景为黑色，直接淡入到黑色即可，不需要alpha通道与背景叠加
+            fade = f"fade=in:st={fade_starts[i]}:d={REVEAL_FADE}"
+            if frame_range is None:
+                filters.extend([f"trim=duration={self.video_duration}", "setpts=PTS-STARTPTS", fade])
+            else:
+                # 淡入使用原时间戳，之后再让块的时间戳从0开始
+                filters.extend((window if self.static_input else []) + [fade, "setpts=PTS-STARTPTS"])
+            cell_labels.append(graph.chain(graph.input(i), filters))
+        
+        # 空白单元格（黑色）直接由滤镜图内的color源生成
+        for _ in range(rows * cols - num_images):
+            cell_labels.append(graph.source(
+                f"color=c=black:s={cell_width}x{cell_height}:r={self.fps}:d={duration}",
+                size=(cell_width, cell_height), duration=duration))
+        
+        # 逐行堆叠为网格（单元格过多时分层堆叠），再居中放到黑色画布上
+        grid = graph.stack_grid(cell_labels, cols, rows, (cell_width, cell_height))
+        graph.output(graph.center_on_color(grid, (cols * cell_width, rows * cell_height),
+                                           (self.max_width, self.max_height)))
+        
+        # 添加输出参数（滤镜图通过脚本文件传递，随临时目录一起清理）
+        cmd.extend(['-filter_complex_script', graph.write_script(self.temp_dir)])
+        cmd.extend(['-map', '[out]'])
+        cmd.extend(['-t', str(duration)])
+        cmd.extend(['-r', str(self.fps)])
+        cmd.extend(['-c:v', 'libx264'])
+        cmd.extend(encoder_args or TRANSITION_ENCODER_ARGS)
+        cmd.extend(['-pix_fmt', 'yuv420p'])
+        cmd.extend(['-y', output_path])
+        return cmd
+
+    def _reveal_starts(self, num_images: int, rows: int, cols: int) -> List[float]:
+        """返回每张图片（行优先）开始淡入的时间"""
+        if self.reveal_order == 'row' or not NUMPY_AVAILABLE:
+            if self.reveal_order != 'row':
+                print(f"警告：{self.reveal_order} 显示顺序需要NumPy，回退到行优先顺序")
+            return [i * REVEAL_INTERVAL for i in range(num_images)]
+        times = reveal_times(rows, cols, num_images, self.reveal_order).ravel()
+        return [float(times[i]) for i in range(num_images)]
+    
+    def _use_mask(self) -> bool:
+        """判断转场视频是否使用alpha遮罩合成"""
+        if self.renderer != 'mask':
+            return False
+        if not (PIL_AVAILABLE and NUMPY_AVAILABLE):
+            print("警告：mask渲染需要PIL与NumPy，回退到FFmpeg滤镜图渲染")
+            return False
+        return True
+    
+    def _prepare_mask_inputs(self, image_files: List[str], rows: int, cols: int,
+                             cell_width: int, cell_height: int) -> Tuple[str, str, float]:
+        """写出遮罩合成的两个输入：完整网格图片（无损PNG）与每个单元格一个像素的16位时间图
+
+        Returns:
+            Tuple[str, str, float]: (网格图片路径, 时间图路径, 时间图每一级代表的秒数)
+        """
+        num_images = len(image_files)
+        rects = self._grid_rects(num_images, cols, cell_width, cell_height)
+        grid = self._compose_numpy(self._iter_cell_images(image_files, cell_width, cell_height, fit='stretch'),
+                                   rects)
+        self._evict_cache()
+        grid_path = os.path.join(self.temp_dir, 'reveal_grid.png')
+        Image.fromarray(grid[:rows * cell_height, :cols * cell_width]).save(grid_path, compress_level=1)
+        
+        times = reveal_times(rows, cols, num_images, self.reveal_order)
+        unit = time_map_unit(times)
+        map_path = os.path.join(self.temp_dir, 'reveal_times.pgm')
+        write_time_map(times, map_path, unit)
+        return grid_path, map_path, unit
+    
+    def _mask_reveal_command(self, grid_path: str, map_path: str, unit: float, output_path: str,
+                             rows: int, cols: int, cell_width: int, cell_height: int,
+                             encoder_args: Optional[List[str]] = None,
+                             frame_range: Optional[Tuple[int, int]] = None) -> List[str]:
+        """构建遮罩合成方式的转场视频FFmpeg命令
+
+        时间图每个像素对应一个单元格，geq按 clip((T-开始时间)/淡入时长,0,1) 只在 rows x cols 个像素上
+        计算不透明度（最近邻取样，奇数宽高的时间图也不会取到相邻单元格），
+        再用 scale=...:flags=neighbor 放大为整张网格的alpha遮罩，用一个 maskedmerge 把完整网格合成到黑色背景上。
+
+        Args:
+            grid_path: 完整网格图片路径（cols*cell_width x rows*cell_height）
+            map_path: 16位时间图路径
+            unit: 时间图每一级代表的秒数
+            output_path: 输出文件路径
+            rows: 行数
+            cols: 列数
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+            encoder_args: libx264编码参数（默认 TRANSITION_ENCODER_ARGS）
+            frame_range: 只渲染 [开始帧, 结束帧) 的分块命令（None表示整条时间线），
+                         geq使用原时间戳计算不透明度，之后再让块的时间戳从0开始
+
+        Returns:
+            List[str]: FFmpeg命令
+        """
+        grid_size = (cols * cell_width, rows * cell_height)
+        duration = self.video_duration
+        input_duration = self.video_duration
+        window, rebase = [], []
+        if frame_range:
+            duration = (frame_range[1] - frame_range[0]) / self.fps
+            input_duration = frame_range[1] / self.fps
+            window, rebase = [window_trim(*frame_range)], ['setpts=PTS-STARTPTS']
+        graph = FilterGraph()
+        grid = graph.chain(graph.input(0, grid_size), window + rebase + ['format=gbrp'])
+        mask = graph.chain(graph.input(1, (cols, rows)), window + [
+            'format=gray16le',
+            f"geq=lum='clip((T-p(X,Y)*{unit})/{REVEAL_FADE},0,1)*65535':interpolation=nearest"] + rebase + [
+            f'scale={grid_size[0]}:{grid_size[1]}:flags=neighbor',
+            'format=gbrp'])
+        background = graph.source(f'color=c=black:s={grid_size[0]}x{grid_size[1]}:r={self.fps}:d={duration}',
+                                  size=grid_size, duration=duration)
+        background = graph.chain(background, ['format=gbrp'])
+        revealed = graph.chain([background, grid, mask], ['maskedmerge'], size=grid_size)
+        graph.output(graph.center_on_color(revealed, grid_size, (self.max_width, self.max_height)))
+        
+        loop_args = ['-loop', '1', '-framerate', str(self.fps), '-t', str(input_duration)]
+        return ['ffmpeg', *loop_args, '-i', grid_path, *loop_args, '-i', map_path,
+                '-filter_complex_script', graph.write_script(self.temp_dir), '-map', '[out]',
+                '-t', str(duration), '-r', str(self.fps),
+                '-c:v', 'libx264', *(encoder_args or TRANSITION_ENCODER_ARGS), '-pix_fmt', 'yuv420p',
+                '-y', output_path]
+    
+    def _encoder_args(self, profile: str, default_args: List[str],
+                      make_reference: Callable[[str], int]) -> List[str]:
+        """返回libx264编码参数：启用自动调优时在采样窗口上试编码选择，否则使用默认参数
+
+        Args:
+            profile: 内容特征描述（相同特征复用缓存的调优决策）
+            default_args: 默认编码参数
+            make_reference: 把采样窗口写成无损参考片段的函数 (输出路径) -> ffmpeg返回码
+        """
+        if self.tuner is None:
+            return default_args
+        return self.tuner.tune(profile, make_reference, default_args)
+
+    def _use_rawpipe(self) -> bool:
+        """判断转场视频是否使用原始帧管道渲染"""
+        if self.renderer in ('ffmpeg', 'mask'):
+            return False
+        available = PIL_AVAILABLE and NUMPY_AVAILABLE
+        if self.renderer == 'rawpipe' and not available:
+            print("警告：rawpipe渲染需要PIL与NumPy，回退到FFmpeg滤镜图渲染")
+        return available
+
+    def _create_transition_video_rawpipe(self, image_files: List[str], output_path: str,
+                                         rows: int, cols: int, cell_width: int, cell_height: int) -> bool:
+        """每个单元格只解码缩放一次，用NumPy逐帧合成淡入网格，通过stdin送入单个ffmpeg编码
+
+        画面与滤镜图方式一致：单元格拉伸到单元格尺寸，每张图片按显示时间表淡入0.5秒，
+        网格居中叠加在黑色背景上。
+
+        Args:
+            image_files: 图片文件列表
+            output_path: 输出文件路径
+            rows: 行数
+            cols: 列数
+            cell_width: 单元格宽度
+            cell_height: 单元格高度
+
+        Returns:
+            bool: 是否成功创建
+        """
+        try:
+            num_images = len(image_files)
+            cells = [None] * num_images
+            for i, img in self._iter_cell_images(image_files, cell_width, cell_height, fit='stretch'):
+                if img is not None:
+                    cells[i] = np.asarray(img.convert('RGB'))
+            self._evict_cache()
+            
+            offset_x = (self.max_width - cols * cell_width) // 2
+            offset_y = (self.max_height - rows * cell_height) // 2
+            positions = [(offset_x + (i % cols) * cell_width, offset_y + (i // cols) * cell_height)
+                         for i in range(num_images)]
+            renderer = GridFadeRenderer(self.max_width, self.max_height, cells, positions,
+                                        self._reveal_starts(num_images, rows, cols), REVEAL_FADE, self.fps)
+            frame_count = renderer.frame_count(self.video_duration)
+            
+            print(f"正在创建视频: {output_path}")
+            print(f"视频时长: {self.video_duration}秒, 帧率: {self.fps}fps")
+            print(f"使用 {rows}x{cols} 网格布局，共 {num_images} 张图片（原始帧管道渲染，{frame_count} 帧）")
+            
+            segments = [(0, frame_count, False)]
+            if self.hold_static:
+                segments = renderer.timeline(frame_count, math.ceil(HOLD_MIN_SECONDS * self.fps))
+            if self.encode_chunks > 1:
+                # 动画区间按GOP边界继续切分为块，与静止区间一起并行编码
+                segments = [(chunk_start, chunk_end, False)
+                            for start, end, is_static in segments if not is_static
+                            for chunk_start, chunk_end in chunk_ranges(start, end, self.encode_chunks,
+                                                                       gop_frames(self.fps))] + \
+                           [segment for segment in segments if segment[2]]
+                segments.sort()
+            sample = sample_range(frame_count, self.fps)
+            encoder_args = self._encoder_args(
+                f'transition|{self.max_width}x{self.max_height}|{rows}x{cols}|{self.fps}fps',
+                TRANSITION_ENCODER_ARGS,
+                lambda path: self.video.encode_frames(renderer.frames(*sample), self.max_width,
+                                                      self.max_height, self.fps, path, reference_args())[0])
+            if len(segments) == 1 and not segments[0][2]:
+                output_args = ['-t', str(self.video_duration), '-c:v', 'libx264', *encoder_args,
+                               '-pix_fmt', 'yuv420p']
+                returncode, stderr = self.video.encode_frames(renderer.frames(0, frame_count), self.max_width,
+                                                              self.max_height, self.fps, output_path, output_args)
+            else:
+                returncode, stderr = self._encode_transition_segments(renderer, segments, output_path,
+                                                                      encoder_args)
             
-            if process.returncode == 0 and os.path.exists(output_path):
+            if returncode == 0 and os.path.exists(output_path):
                 print(f"成功创建视频: {output_path} (大小: {os.path.getsize(output_path)} 字节)")
                 return True
             else:
-                print(f"FFmpeg命令执行失败: {process.returncode}")
+                print(f"FFmpeg命令执行失败: {returncode}")
                 print(f"错误输出: {stderr[:500]}")
                 return False
         except Exception as e:
             print(f"创建视频失败: {str(e)}")
             return False
     
+    def _encode_transition_segments(self, renderer: GridFadeRenderer, segments: List[Tuple[int, int, bool]],
+                                    output_path: str, encoder_args: List[str]) -> Tuple[int, str]:
+        """分段编码转场视频：动画区间逐帧渲染，静止区间只编码一帧并保持，最后流复制拼接
+
+        encode_chunks大于1时各片段由独立的ffmpeg进程并行编码。
+
+        Args:
+            renderer: 网格淡入渲染器
+            segments: 按时间顺序排列的 (开始帧, 结束帧, 是否静止) 列表
+            output_path: 输出文件路径
+            encoder_args: libx264编码参数
+
+        Returns:
+            Tuple[int, str]: (ffmpeg返回码, 错误输出)
+        """
+        # 所有片段使用相同的编码参数与时间基，保证可以直接流复制拼接
+        output_args = ['-c:v', 'libx264', *encoder_args, '-pix_fmt', 'yuv420p',
+                       '-video_track_timescale', '90000']
+        if self.encode_chunks > 1:
+            output_args += gop_args(self.fps, chunk_threads(self.encode_chunks))
+        held_frames = sum(end - start for start, end, is_static in segments if is_static)
+        print(f"时间线分析: {len(segments)} 个片段，{held_frames} 帧为静止画面（只编码一帧并保持）")
+        
+        static_starts = {start for start, _, is_static in segments if is_static}
+        
+        def encode_segment(start: int, end: int, segment_path: str) -> Tuple[int, str]:
+            if start in static_starts:
+                frame = next(renderer.frames(start, start + 1))
+                return self.video.encode_hold(frame, end - start, self.max_width, self.max_height,
+                                              self.fps, segment_path, output_args)
+            return self.video.encode_frames(renderer.frames(start, end), self.max_width, self.max_height,
+                                            self.fps, segment_path, output_args)
+        
+        return encode_chunked(encode_segment, [(start, end) for start, end, _ in segments], output_path,
+                              self.encode_chunks, self._chunk_dir())
+    
     def create_simple_video(self, image_files: List[str], output_path: str) -> bool:
         """为大量图片创建简化的视频
         
@@ -405,7 +1243,10 @@ class ImageGridCreator:
         return self.create_simple_flip_video(image_files, output_path)
     
     def create_simple_flip_video(self, image_files: List[str], output_path: str) -> bool:
-        """为图片创建简化的淡入效果视频
+        """为图片创建逐个单元格淡入显示的视频
+        
+        时间线：开头 FLIP_LEAD_IN 秒显示完整网格，之后每张图片依次在黑色背景上单独淡入，
+        最后保持完整网格到视频结束。整个视频一次渲染、只编码一次，不生成中间片段文件。
         
         Args:
             image_files: 图片文件列表
@@ -416,156 +1257,144 @@ class ImageGridCreator:
         """
         try:
             # 1. 创建一个大的网格图片（使用我们已经优化过的PIL方法）
-            grid_image_path = os.path.join(self.temp_dir, 'grid_image.jpg')
-            if not self.create_grid_image(image_files, grid_image_path):
+            # 逐个淡入的单元格区域是规则网格，网格图片使用同一个规则网格布局（不使用等高行布局）
+            plan = self._plan_layout(image_files)
+            grid_image_path = self.create_grid_image(image_files, os.path.join(self.temp_dir, 'grid_image.jpg'),
+                                                     plan)
+            if not grid_image_path:
                 print("创建网格图片失败，无法继续创建视频")
                 return False
             
-            # 2. 使用这个网格图片创建一个带有动态效果的视频
-            # 采用更简单的方法实现逐个淡入效果
-            rows, cols = self.calculate_grid_size(len(image_files))
+            # 2. 单元格区域与网格图片一致（偶数尺寸）
+            rows, cols = plan['rows'], plan['cols']
             num_images = len(image_files)
+            cell_width = self.max_width // cols // 2 * 2
+            cell_height = self.max_height // rows // 2 * 2
+            rects = self._grid_rects(num_images, cols, cell_width, cell_height)
             
-            # 创建视频脚本文件
-            concat_file = os.path.join(self.temp_dir, 'simple_fade_concat.txt')
-            temp_files = []  # 用于跟踪临时文件
+            # 计算每个淡入效果的持续时间，留一些时间给开头和结尾
+            reveal_duration = max(0.2, self.video_duration / (num_images + 2))
             
-            with open(concat_file, 'w') as f:
-                # 初始背景帧
-                f.write(f"file '{os.path.abspath(grid_image_path)}'\n")
-                f.write(f"duration 0.1\n")
-                
-                # 计算每个淡入效果的持续时间
-                transition_duration = max(0.2, self.video_duration / (num_images + 2))  # 留一些时间给开头和结尾
-                
-                # 创建一个临时目录存储中间视频片段
-                temp_frames_dir = os.path.join(self.temp_dir, 'temp_frames')
-                os.makedirs(temp_frames_dir, exist_ok=True)
-                
-                # 为每个图片创建一个简单的淡入效果
-                for i in range(num_images):
-                    # 计算图片在网格中的位置
-                    row = i // cols
-                    col = i % cols
-                    cell_w = self.max_width // cols
-                    cell_h = self.max_height // rows
-                    x_pos = col * cell_w
-                    y_pos = row * cell_h
-                    
-                    # 创建临时视频文件
-                    temp_video = os.path.join(temp_frames_dir, f'simple_fade_{i}.mp4')
-                    temp_files.append(temp_video)
-                    
-                    # 创建最简单的图片进入效果
-                    fade_cmd = [
-                        'ffmpeg', '-loop', '1', '-i', grid_image_path,
-                        '-vf', (
-                            # 创建黑色背景
-                            f'color=c=black:s={self.max_width}x{self.max_height}[bg];'
-                            # 裁剪出当前图片
-                            f'crop=w={cell_w}:h={cell_h}:x={x_pos}:y={y_pos}[img];'
-                            # 最简单的淡入效果
-                            f'[img]fade=in:st=0:d={transition_duration},trim=duration={transition_duration},setpts=PTS-STARTPTS[img_faded];'
-                            # 叠加到背景
-                            f'[bg][img_faded]overlay=x={x_pos}:y={y_pos}[out]'
-                        ),
-                        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28', 
-                        '-pix_fmt', 'yuv420p', '-r', str(self.fps), '-y', temp_video
-                    ]
-                    
-                    # 执行命令创建临时视频，添加错误处理
-                    try:
-                        subprocess.run(fade_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                        # 添加到concat文件
-                        f.write(f"file '{os.path.abspath(temp_video)}'\n")
-                    except Exception as e:
-                        print(f"创建图片 {i+1} 的简化淡入动画失败，跳过: {str(e)}")
-                        # 如果失败，添加一个短暂的空白帧
-                        blank_video = os.path.join(temp_frames_dir, f'blank_{i}.mp4')
-                        temp_files.append(blank_video)
-                        
-                        # 创建空白视频
-                        blank_cmd = [
-                            'ffmpeg', '-f', 'lavfi', '-i', f'color=c=black:s={self.max_width}x{self.max_height}:r={self.fps}',
-                            '-t', str(0.1), '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28',
-                            '-pix_fmt', 'yuv420p', '-y', blank_video
-                        ]
-                        subprocess.run(blank_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                        f.write(f"file '{os.path.abspath(blank_video)}'\n")
-                        continue
-                
-                # 添加最后的静止画面，确保总时长
-                # 计算总使用时间
-                total_used_time = 0.1 + (num_images * transition_duration)
-                remaining_time = max(0, self.video_duration - total_used_time)
-                
-                if remaining_time > 0:
-                    # 创建一个静止画面视频
-                    static_video = os.path.join(temp_frames_dir, 'final_static.mp4')
-                    temp_files.append(static_video)
-                    
-                    static_cmd = [
-                        'ffmpeg', '-loop', '1', '-i', grid_image_path,
-                        '-t', str(remaining_time), '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28',
-                        '-pix_fmt', 'yuv420p', '-r', str(self.fps), '-y', static_video
-                    ]
-                    subprocess.run(static_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    f.write(f"file '{os.path.abspath(static_video)}'\n")
+            renderer = None
+            if self._use_rawpipe():
+                renderer = self._flip_renderer(grid_image_path, rects, reveal_duration)
+                frame_count = renderer.frame_count(self.video_duration)
+            else:
+                duration = max(self.video_duration, FLIP_LEAD_IN + num_images * reveal_duration)
+                frame_count = max(1, math.ceil(duration * self.fps - 1e-9))
+            build_command = lambda encoder_args, path: self._flip_video_command(
+                grid_image_path, num_images, cols, cell_width, cell_height, reveal_duration, encoder_args, path)
+            
+            # 启用自动调优时以时间线中间（单元格逐个淡入的过程）作为采样窗口
+            start, end = sample_range(frame_count, self.fps)
+            
+            def make_reference(path: str) -> int:
+                if renderer is not None:
+                    return self.video.encode_frames(renderer.frames(start, end), self.max_width, self.max_height,
+                                                    self.fps, path, reference_args())[0]
+                return run_command(reference_command(build_command(FLIP_ENCODER_ARGS, path), path,
+                                                     (end - start) / self.fps, start / self.fps))[0]
             
-            # 合并所有视频片段
-            create_video_cmd = [
-                'ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat_file,
-                '-c:v', 'libx264', '-preset', 'medium', '-crf', '28', 
-                '-pix_fmt', 'yuv420p', '-r', str(self.fps), '-y', output_path
-            ]
+            encoder_args = self._encoder_args(f'flip|{self.max_width}x{self.max_height}|{self.fps}fps',
+                                              FLIP_ENCODER_ARGS, make_reference)
             
             print(f"正在创建简化视频: {output_path}")
             print(f"视频时长: {self.video_duration}秒, 帧率: {self.fps}fps")
-            print(f"使用分阶段处理实现图片逐个淡入显示效果")
+            print(f"单次渲染逐个淡入显示 {num_images} 个单元格，每个 {reveal_duration:.2f} 秒")
             
-            subprocess.run(create_video_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"成功创建简化视频: {output_path}")
-            return True
+            if renderer is not None:
+                returncode, stderr = self.video.encode_frames(
+                    renderer.frames(0, frame_count), self.max_width, self.max_height, self.fps, output_path,
+                    ['-c:v', 'libx264', *encoder_args, '-pix_fmt', 'yuv420p'])
+            else:
+                returncode, stderr = run_command(build_command(encoder_args, output_path))
+            
+            if returncode == 0 and os.path.exists(output_path):
+                print(f"成功创建简化视频: {output_path}")
+                return True
+            print(f"FFmpeg命令执行失败: {returncode}")
+            print(f"FFmpeg错误输出: {stderr[:500]}")
+            return False
         except Exception as e:
             print(f"创建简化视频失败: {str(e)}")
-            # 尝试打印详细的错误输出以帮助调试
-            if hasattr(e, 'stderr'):
-                try:
-                    stderr_output = e.stderr.decode('utf-8')
-                    print(f"FFmpeg错误输出: {stderr_output[:500]}")
-                except:
-                    pass
             return False
+    
+    def _flip_renderer(self, grid_image_path: str, rects: List[Tuple[int, int, int, int]],
+                       reveal_duration: float) -> CellRevealRenderer:
+        """网格图片只解码一次，返回用NumPy逐帧生成逐个淡入画面的渲染器（原始帧通过stdin送入单个ffmpeg编码）"""
+        with Image.open(grid_image_path) as img:
+            grid = np.asarray(img.convert('RGB'))
+        # 网格图片与画布尺寸不一致时放到画布左上角
+        canvas = np.zeros((self.max_height, self.max_width, 3), dtype=np.uint8)
+        height = min(grid.shape[0], self.max_height)
+        width = min(grid.shape[1], self.max_width)
+        canvas[:height, :width] = grid[:height, :width]
+        
+        return CellRevealRenderer(canvas, rects, FLIP_LEAD_IN, reveal_duration, self.fps)
+    
+    def _flip_video_command(self, grid_image_path: str, num_images: int, cols: int, cell_width: int,
+                            cell_height: int, reveal_duration: float, encoder_args: List[str],
+                            output_path: str) -> List[str]:
+        """构建逐个淡入视频的单个FFmpeg命令（不依赖NumPy）
+
+        裁剪位置、叠加位置与淡入系数都是随时间变化的表达式，滤镜图大小与单元格数量无关。
+        """
+        total_duration = max(self.video_duration, FLIP_LEAD_IN + num_images * reveal_duration)
+        # 当前正在淡入的单元格序号与淡入系数
+        # （overlay/crop 的时间变量为 t，geq 为 T）
+        def cell_index(time_var: str) -> str:
+            return f"clip(trunc(({time_var}-{FLIP_LEAD_IN})/{reveal_duration}),0,{num_images - 1})"
+        index = cell_index('t')
+        cell_x = f"mod({index},{cols})*{cell_width}"
+        cell_y = f"trunc({index}/{cols})*{cell_height}"
+        alpha = f"clip((T-{FLIP_LEAD_IN}-{cell_index('T')}*{reveal_duration})/{reveal_duration},0,1)"
+        
+        graph = FilterGraph()
+        full, source = graph.split(graph.input(0, (self.max_width, self.max_height)))
+        cell = graph.chain(source, [f"crop=w={cell_width}:h={cell_height}:x='{cell_x}':y='{cell_y}'",
+                                    "format=rgb24",
+                                    f"geq=r='r(X,Y)*{alpha}':g='g(X,Y)*{alpha}':b='b(X,Y)*{alpha}'"])
+        background = graph.source(f"color=c=black:s={self.max_width}x{self.max_height}:r={self.fps}:d={total_duration}")
+        reveal = graph.chain([background, cell], [f"overlay=x='{cell_x}':y='{cell_y}':eval=frame"])
+        # 开头与结尾显示完整网格
+        graph.chain([reveal, full], [f"overlay=0:0:enable='lt(t,{FLIP_LEAD_IN})+gte(t,{FLIP_LEAD_IN + num_images * reveal_duration})'"],
+                    output='out')
+        
+        return ['ffmpeg', '-loop', '1', '-framerate', str(self.fps), '-t', str(total_duration),
+                '-i', grid_image_path,
+                '-filter_complex_script', graph.write_script(self.temp_dir), '-map', '[out]',
+                '-t', str(total_duration), '-r', str(self.fps),
+                '-c:v', 'libx264', *encoder_args, '-pix_fmt', 'yuv420p', '-y', output_path]
 
-    def process_directory(self, dir_path: str) -> bool:
+    def process_directory(self, dir_path: str) -> Optional[str]:
         """处理目录模式
 
         Args:
             dir_path: 目录路径
 
         Returns:
-            bool: 是否成功处理
+            Optional[str]: 实际写出的输出文件路径，失败返回None
         """
         # 获取目录中的图片文件
         image_files = self.get_image_files_from_dir(dir_path)
         if not image_files:
-            return False
+            return None
         
         return self.process_images(image_files)
 
-    def process_images(self, image_files: List[str]) -> bool:
+    def process_images(self, image_files: List[str]) -> Optional[str]:
         """处理图片列表
 
         Args:
             image_files: 图片文件列表
 
         Returns:
-            bool: 是否成功处理
+            Optional[str]: 实际写出的输出文件路径（扩展名可能按输出格式调整），失败返回None
         """
         if self.create_video:
             # 创建视频
             if not self.check_ffmpeg():
-                return False
+                return None
             
             # 确定输出文件扩展名
             output_ext = os.path.splitext(self.output_file)[1].lower()
@@ -574,18 +1403,39 @@ class ImageGridCreator:
             else:
                 video_output = self.output_file
             
-            return self.create_transition_video(image_files, video_output)
+            return video_output if self.create_transition_video(image_files, video_output) else None
+        elif self.tiles:
+            # 输出 Deep Zoom 瓦片金字塔
+            image_output = os.path.splitext(self.output_file)[0] + '.dzi'
+            if not self.create_tile_pyramid(image_files, image_output, self.cell_width,
+                                            self.cell_height, self.tile_size):
+                return None
+            return image_output
+        elif self.stream:
+            # 流式创建超大网格图片，只支持PNG和TIFF
+            output_ext = os.path.splitext(self.output_file)[1].lower()
+            if output_ext not in ['.png', '.tif', '.tiff']:
+                image_output = os.path.splitext(self.output_file)[0] + '.png'
+            else:
+                image_output = self.output_file
+            
+            if not self.create_grid_image_streaming(image_files, image_output,
+                                                    self.cell_width, self.cell_height):
+                return None
+            return image_output
         else:
             # 创建图片
             # 确定输出文件扩展名
             output_ext = os.path.splitext(self.output_file)[1].lower()
-            if not output_ext or output_ext not in ['.jpg', '.jpeg', '.png', '.bmp']:
+            if self.output_format and format_from_path(self.output_file) != self.output_format:
+                image_output = os.path.splitext(self.output_file)[0] + FORMAT_EXTENSIONS[self.output_format]
+            elif not output_ext or output_ext not in ['.jpg', '.jpeg', '.png', '.bmp', '.webp']:
                 image_output = os.path.splitext(self.output_file)[0] + '.jpg'
             else:
                 image_output = self.output_file
             
             if not self.check_ffmpeg():
-                return False
+                return None
             
             return self.create_grid_image(image_files, image_output)
 
@@ -607,46 +1457,140 @@ def main():
     parser.add_argument('-v', '--video', action='store_true', help='生成视频而不是图片')
     parser.add_argument('-t', '--duration', type=float, default=5.0, help='视频持续时间（秒，默认：5.0）')
     parser.add_argument('--fps', type=float, default=30.0, help='视频帧率（默认：30.0）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='并行解码缩放图片的工作数量（默认：CPU核数，1表示串行）')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                        help='工作池类型：thread 或 process（默认：thread）')
+    parser.add_argument('--no-draft', action='store_true',
+                        help='禁用JPEG缩放解码（draft模式），始终完整解码原图后再缩放')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'缩略图缓存目录（默认：{DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--cache-size-mb', type=int, default=1024, help='缩略图缓存容量上限（MB，默认：1024）')
+    parser.add_argument('--no-cache', action='store_true', help='禁用缩略图缓存')
+    parser.add_argument('--backend', choices=['pil', 'numpy'], default='pil',
+                        help='网格画布合成后端：pil 或 numpy（默认：pil）')
+    parser.add_argument('--stream', action='store_true',
+                        help='按行条带流式写出超大网格图片（PNG/TIFF，不受最大宽高限制）')
+    parser.add_argument('--tiles', action='store_true',
+                        help='输出 Deep Zoom 瓦片金字塔（.dzi + 瓦片目录），再次生成时只重写变化的瓦片')
+    parser.add_argument('--tile-size', type=int, default=256, help='瓦片边长（默认：256）')
+    parser.add_argument('--layout', choices=['sqrt', 'auto', 'justified'], default='sqrt',
+                        help='布局规划：sqrt 按数量取平方根；auto 按图片宽高比选择可见像素最多的行列；'
+                             'justified 同时考虑等高行布局（仅网格图片）（默认：sqrt）')
+    parser.add_argument('--cell-width', type=int, help='流式/瓦片模式的单元格宽度（默认第一张图片的宽度）')
+    parser.add_argument('--cell-height', type=int, help='流式/瓦片模式的单元格高度（默认第一张图片的高度）')
+    parser.add_argument('--format', choices=['jpeg', 'webp', 'png'], dest='output_format',
+                        help='网格图片输出格式（默认按输出文件扩展名决定）')
+    parser.add_argument('--quality', type=int, help='JPEG/WebP质量（默认：95，瓦片金字塔默认：90）')
+    parser.add_argument('--effort', type=int,
+                        help='编码力度：JPEG>0 启用optimize，WebP method 0-6，PNG压缩级别 0-9')
+    parser.add_argument('--progressive', action='store_true', help='输出渐进式JPEG')
+    parser.add_argument('--encode-budget',
+                        help='编码预算，如 200ms、500KB 或 200ms,500KB；自动选择满足预算且画质最高的格式与质量')
+    parser.add_argument('--renderer', choices=['auto', 'rawpipe', 'ffmpeg', 'mask'], default='auto',
+                        help='转场视频渲染方式：rawpipe 每张图片只解码一次并由NumPy逐帧合成；'
+                             'ffmpeg 使用滤镜图合成；mask 完整网格经单路alpha遮罩合成，滤镜图与单元格数量无关；'
+                             'auto 可用时使用rawpipe（默认：auto）')
+    parser.add_argument('--reveal-order', choices=list(REVEAL_ORDERS), default='row',
+                        help='转场视频中单元格的显示顺序：row 行优先、spiral 螺旋、diagonal 对角波浪、'
+                             'random 随机（默认：row）')
+    parser.add_argument('--static-input', action='store_true',
+                        help='滤镜图渲染时每张图片只解码缩放一次，再用tpad克隆到视频时长')
+    parser.add_argument('--no-hold', action='store_true',
+                        help='rawpipe渲染时禁用静止区间保持编码，所有帧都逐帧渲染编码')
+    parser.add_argument('--encode-chunks', type=int, default=1,
+                        help='转场视频按GOP边界分块并行编码的块数，完成后流复制拼接（默认：1，不分块）')
+    parser.add_argument('--auto-tune', action='store_true',
+                        help='在采样窗口上试编码几组preset/crf/tune组合，选择满足目标画质且最快的参数（按内容特征缓存）')
+    parser.add_argument('--tune-target', default='ssim:0.98',
+                        help='自动调优的目标画质，如 ssim:0.98 或 psnr:40（默认：ssim:0.98）')
+    parser.add_argument('--tune-budget', type=float, default=20.0,
+                        help='自动调优的试编码时间预算（秒，默认：20）')
+    parser.add_argument('--video-backend', choices=['auto', 'pyav', 'ffmpeg'], default='auto',
+                        help='rawpipe帧的编码后端：pyav 在进程内编码（需要PyAV）；ffmpeg 通过管道送入ffmpeg进程；'
+                             'auto 安装了PyAV时使用pyav（默认：auto）')
+    parser.add_argument('--memory-budget-mb', type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f'中间文件的内存预算（MB），预估大小不超过预算时放在/dev/shm，否则放到磁盘'
+                             f'（0表示始终使用磁盘，默认：{DEFAULT_MEMORY_BUDGET_MB}）')
+    parser.add_argument('--ram-dir', help='内存文件系统目录（默认：/dev/shm）')
     
     args = parser.parse_args()
+    if args.encode_budget:
+        try:
+            parse_encode_budget(args.encode_budget)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        parse_quality_target(args.tune_target)
+    except ValueError as e:
+        parser.error(str(e))
     
-    # 创建图片网格创建器
-    creator = ImageGridCreator(
-        output_file=args.output,
-        max_width=args.width,
-        max_height=args.height,
-        create_video=args.video,
-        video_duration=args.duration,
-        fps=args.fps
-    )
+    with sigterm_as_exit():
+        # 创建图片网格创建器
+        creator = ImageGridCreator(
+            output_file=args.output,
+            max_width=args.width,
+            max_height=args.height,
+            create_video=args.video,
+            video_duration=args.duration,
+            fps=args.fps,
+            workers=args.workers,
+            pool_type=args.pool,
+            draft=not args.no_draft,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            cache_size_mb=args.cache_size_mb,
+            backend=args.backend,
+            stream=args.stream,
+            tiles=args.tiles,
+            tile_size=args.tile_size,
+            layout=args.layout,
+            cell_width=args.cell_width,
+            cell_height=args.cell_height,
+            output_format=args.output_format,
+            quality=args.quality,
+            effort=args.effort,
+            progressive=args.progressive,
+            encode_budget=args.encode_budget,
+            renderer=args.renderer,
+            static_input=args.static_input,
+            hold_static=not args.no_hold,
+            encode_chunks=args.encode_chunks,
+            auto_tune=args.auto_tune,
+            tune_target=args.tune_target,
+            tune_budget=args.tune_budget,
+            video_backend=args.video_backend,
+            memory_budget_mb=args.memory_budget_mb,
+            ram_dir=args.ram_dir,
+            reveal_order=args.reveal_order
+        )
     
-    # 处理输入
-    success = False
-    if args.directory:
-        # 目录模式
-        success = creator.process_directory(args.directory)
-    elif args.images:
-        # 多图片模式
-        # 验证图片文件是否存在
-        valid_images = []
-        for img_path in args.images:
-            if os.path.isfile(img_path):
-                valid_images.append(img_path)
-            else:
-                print(f"警告：图片文件不存在: {img_path}")
+        # 处理输入
+        output_path = None
+        if args.directory:
+            # 目录模式
+            output_path = creator.process_directory(args.directory)
+        elif args.images:
+            # 多图片模式
+            # 验证图片文件是否存在
+            valid_images = []
+            for img_path in args.images:
+                if os.path.isfile(img_path):
+                    valid_images.append(img_path)
+                else:
+                    print(f"警告：图片文件不存在: {img_path}")
         
-        if valid_images:
-            success = creator.process_images(valid_images)
-        else:
-            print("错误：没有有效的图片文件！")
+            if valid_images:
+                output_path = creator.process_images(valid_images)
+            else:
+                print("错误：没有有效的图片文件！")
     
-    # 输出结果
-    if success:
-        print(f"任务完成！输出文件已保存至: {args.output}")
-        return 0
-    else:
-        print("任务失败！")
-        return 1
+        # 输出结果
+        if output_path:
+            print(f"任务完成！输出文件已保存至: {output_path}")
+            return 0
+        else:
+            print("任务失败！")
+            return 1
 
 
 if __name__ == '__main__':
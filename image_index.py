@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""图片目录的元数据索引
+
+用一次 os.scandir 遍历目录，只读取文件头获取宽、高与格式（不解码图片数据），
+结果保存在缓存目录中按图片目录区分的 SQLite 文件里（不在用户的图片目录中写入任何文件）；
+再次扫描时只重新读取大小或修改时间发生变化的文件。索引文件无法写入（只读、被锁定）时改用内存索引。
+网格规划与图片转视频特效工具查询整个目录的索引；只需要单张图片尺寸时（图片分割工具）
+用 get_image_dimensions 直接读取该文件的文件头，不扫描所在目录。两者都不需要打开图片主体或调用ffprobe。
+"""
+
+import hashlib
+import os
+import struct
+import sqlite3
+from typing import List, Optional, Tuple
+
+# 支持的图片格式（与 ImageGridCreator.get_image_files_from_dir 一致，扩展名为全小写或全大写）
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
+_EXTENSION_SET = set(IMAGE_EXTENSIONS) | {ext.upper() for ext in IMAGE_EXTENSIONS}
+
+# 默认索引目录，每个图片目录对应其中的一个SQLite文件
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'p-video-ffmpeg-capture', 'image_index')
+
+# 索引文件被其他进程锁定时的等待时间（秒），超时后改用内存索引
+INDEX_LOCK_TIMEOUT = 1.0
+
+# JPEG中携带图片尺寸的SOF标记（排除DHT/JPG/DAC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _read_jpeg_header(f) -> Optional[Tuple[int, int]]:
+    """跳过各个段，直到找到SOF段读取宽高"""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        # 无长度字段的独立标记
+        if marker in (0x01,) or 0xD0 <= marker <= 0xD9:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) != 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_header(image_path: str) -> Optional[Tuple[int, int, str]]:
+    """只读取文件头获取图片宽、高与格式
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Optional[Tuple[int, int, str]]: (宽度, 高度, 格式)，无法识别时返回None
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            head = f.read(32)
+            if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+                width, height = struct.unpack('>II', head[16:24])
+                return width, height, 'PNG'
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                width, height = struct.unpack('<HH', head[6:10])
+                return width, height, 'GIF'
+            if head.startswith(b'BM') and len(head) >= 26:
+                header_size = struct.unpack('<I', head[14:18])[0]
+                if header_size == 12:
+                    width, height = struct.unpack('<HH', head[18:22])
+                else:
+                    width, height = struct.unpack('<ii', head[18:26])
+                return abs(width), abs(height), 'BMP'
+            if head.startswith(b'\xff\xd8'):
+                size = _read_jpeg_header(f)
+                if size:
+                    return size[0], size[1], 'JPEG'
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def index_path_for(dir_path: str, index_dir: Optional[str] = None) -> str:
+    """返回图片目录对应的索引文件路径（按目录绝对路径的摘要命名）"""
+    digest = hashlib.sha1(os.path.abspath(dir_path).encode('utf-8')).hexdigest()
+    return os.path.join(index_dir or DEFAULT_INDEX_DIR, f'{digest}.sqlite')
+
+
+class ImageIndex:
+    """单个图片目录的元数据索引"""
+
+    def __init__(self, dir_path: str, index_dir: Optional[str] = None):
+        """初始化索引（索引目录不可写时退化为内存索引）
+
+        Args:
+            dir_path: 图片目录
+            index_dir: 索引文件所在目录，默认 ~/.cache/p-video-ffmpeg-capture/image_index
+        """
+        self.dir_path = dir_path
+        self.in_memory = False
+        try:
+            index_path = index_path_for(dir_path, index_dir)
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            self.conn = sqlite3.connect(index_path, timeout=INDEX_LOCK_TIMEOUT)
+            self._create_table()
+        except (OSError, sqlite3.Error):
+            self.conn = sqlite3.connect(':memory:')
+            self.in_memory = True
+            self._create_table()
+
+    def _create_table(self):
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS images ('
+            'name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+            'width INTEGER, height INTEGER, format TEXT)'
+        )
+        self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _fall_back_to_memory(self):
+        """改用内存数据库，能读取时先复制已有的记录"""
+        memory = sqlite3.connect(':memory:')
+        try:
+            self.conn.backup(memory)
+        except sqlite3.Error:
+            memory.close()
+            memory = sqlite3.connect(':memory:')
+        self.conn.close()
+        self.conn = memory
+        self.in_memory = True
+        self._create_table()
+
+    def scan(self) -> Tuple[int, int]:
+        """一次 os.scandir 遍历目录，只为新增或变化的文件读取文件头
+
+        索引文件只读、被锁定或损坏时改用内存索引重新扫描，不向调用方抛出数据库错误。
+
+        Returns:
+            Tuple[int, int]: (重新读取的文件数, 删除的记录数)
+        """
+        try:
+            return self._scan()
+        except sqlite3.DatabaseError as e:
+            if self.in_memory:
+                raise
+            print(f"警告：图片索引无法写入（{e}），本次使用内存索引")
+            self._fall_back_to_memory()
+            return self._scan()
+
+    def _scan(self) -> Tuple[int, int]:
+        known = {name: (size, mtime_ns) for name, size, mtime_ns
+                 in self.conn.execute('SELECT name, size, mtime_ns FROM images')}
+        seen = set()
+        updates = []
+        with os.scandir(self.dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or os.path.splitext(entry.name)[1] not in _EXTENSION_SET:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                seen.add(entry.name)
+                if known.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                header = read_image_header(entry.path) or (None, None, None)
+                updates.append((entry.name, stat.st_size, stat.st_mtime_ns) + tuple(header))
+
+        removed = [(name,) for name in known if name not in seen]
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)', updates)
+            self.conn.executemany('DELETE FROM images WHERE name = ?', removed)
+        return len(updates), len(removed)
+
+    def images(self) -> List[Tuple[str, Optional[int], Optional[int], Optional[str]]]:
+        """返回按路径排序的图片列表
+
+        Returns:
+            List[Tuple[str, int, int, str]]: (图片路径, 宽度, 高度, 格式)，无法识别的文件宽高为None
+        """
+        rows = self.conn.execute('SELECT name, width, height, format FROM images')
+        return sorted((os.path.join(self.dir_path, name), width, height, fmt) for name, width, height, fmt in rows)
+
+    def get(self, image_path: str) -> Optional[Tuple[int, int, str]]:
+        """查询单个图片的宽、高与格式
+
+        Args:
+            image_path: 图片路径（必须位于索引目录中）
+
+        Returns:
+            Optional[Tuple[int, int, str]]: (宽度, 高度, 格式)，未索引或无法识别时返回None
+        """
+        row = self.conn.execute('SELECT width, height, format FROM images WHERE name = ?',
+                                (os.path.basename(image_path),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row
+
+
+def get_image_dimensions(image_path: str) -> Optional[Tuple[int, int]]:
+    """只读取单张图片的文件头获取宽高，不扫描所在目录、不写入索引
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        Optional[Tuple[int, int]]: (宽度, 高度)，无法识别时返回None
+    """
+    header = read_image_header(image_path)
+    return (header[0], header[1]) if header else None
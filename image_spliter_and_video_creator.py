@@ -4,24 +4,69 @@
 图片分割与视频合成工具（将项目截图-长截图等转换成一个视频）
 功能：
 1. 根据指定的切割宽度和高度，将一张图片切割成多张图片
-2. 将切割后的多张图片合并成一个视频
+2. 将切割后的多张图片合并成一个视频（短序列、slideleft转场与主序列在同一个滤镜图中，只编码一次）；
+   安装了PIL与NumPy时切割块像素以原始帧直接通过管道送入编码器，不生成JPEG中间文件
+3. scroll模式：切割尺寸的取景窗口在原图上平滑移动（在每个切割块位置停留），一次渲染、只编码一次
 
 用法示例：
 python image_spliter_and_video_creator.py -i images/output_001.jpg -cw 300 -ch 200
 python image_spliter_and_video_creator.py -i images/output_001.jpg -cw 200 -ch 200 -o output_video.mp4
+python image_spliter_and_video_creator.py -i long_screenshot.png -cw 1280 -ch 720 --mode scroll
+python image_spliter_and_video_creator.py -i images/output_001.jpg -cw 300 -ch 200 --tiles-dir tiles
 """
 import os
 import subprocess
 import argparse
 import sys
-import tempfile
+import zlib
+from functools import lru_cache
 from pathlib import Path
 import re
 
+from image_index import get_image_dimensions
+from filter_graph import FilterGraph
+from chunked_encode import (encode_command_chunked, encode_chunked, chunk_ranges, chunk_threads, gop_args,
+                            gop_frames, window_trim)
+from video_backend import open_video_backend
+from workspace import Workspace, DEFAULT_MEMORY_BUDGET_MB, sigterm_as_exit
+from strip_reader import open_strip_reader
+
+# PIL为可选依赖：用于只解码一次原图切割所有切割块，以及进程内编码切割块视频
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# NumPy为可选依赖，用于切割块原始帧管道与进程内编码切割块视频
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 过小切割块的尺寸阈值（像素），宽或高小于阈值的切割块被跳过
+MIN_SIZE_THRESHOLD = 30
+
+# scroll模式在每个切割块位置的停留时长与相邻位置之间的移动时长（秒）
+SCROLL_PAUSE_SECONDS = 1.0
+SCROLL_MOVE_SECONDS = 0.6
+
+# tiles模式：短序列与主序列中每张切割块的显示时长，以及两者之间slideleft转场的时长（秒）
+SHORT_SECONDS_PER_TILE = 0.2
+MAIN_SECONDS_PER_TILE = 1
+TRANSITION_SECONDS = 0.7
+
+# ffmpeg pad 按解码像素格式的色度子采样把偏移向下对齐：子采样标记 -> (水平对齐, 垂直对齐)
+PAD_ALIGNMENT = {'420': (2, 2), '422': (2, 1), '440': (1, 2), '411': (4, 1), '410': (4, 2)}
+
 class ImageSpliterAndVideoCreator:
     """图片分割与视频合成类，用于将图片切割并合成视频"""
     
-    def __init__(self, input_image, crop_width, crop_height, output_video=None, fps=25, output_size=None):
+    def __init__(self, input_image, crop_width, crop_height, output_video=None, fps=25, output_size=None,
+                 encode_chunks=1, video_backend='auto', memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 ram_dir=None, stream=False, mode='tiles', scroll_pause=SCROLL_PAUSE_SECONDS,
+                 scroll_move=SCROLL_MOVE_SECONDS, pipeline='auto', tiles_dir=None):
         """初始化图片分割与视频合成工具
         
         Args:
@@ -31,6 +76,23 @@ class ImageSpliterAndVideoCreator:
             output_video: 输出视频路径
             fps: 视频帧率，默认为25
             output_size: 输出视频分辨率，例如 '1280:720'，默认使用原图片尺寸
+            encode_chunks: 最终转场视频按GOP边界分块并行编码的块数（1表示不分块）
+            video_backend: 编解码后端，'pyav'（进程内逐帧生成并编码切割块视频）、'ffmpeg'（命令行）
+                           或 'auto'（安装了PyAV时使用pyav）
+            memory_budget_mb: 中间文件的内存预算（MB），预估大小不超过预算时临时目录放在内存文件系统，
+                              否则放到磁盘（0表示始终使用磁盘）
+            ram_dir: 内存文件系统目录（None表示自动选择 /dev/shm）
+            stream: 按切割行流式解码原图（仅8位非隔行PNG），每次只解码当前切割行所需的行条带，
+                    峰值内存与 切割高度 x 原图宽度 成正比，而不是整张图片
+                    （rawpipe管道中切割块以zlib压缩保存在内存中，原图同样只解码一次）
+            mode: 'tiles'（切割为图片后合成视频）或 'scroll'（取景窗口在原图上平滑移动，不生成切割块文件）
+            scroll_pause: scroll模式在每个切割块位置的停留时长（秒）
+            scroll_move: scroll模式在相邻位置之间的移动时长（秒），移动过程先加速后减速
+            pipeline: 切割块送入编码器的方式，'rawpipe'（切割块像素以原始帧直接送入编码器，
+                      不生成中间文件，需要PIL与NumPy）、'files'（切割块保存为JPEG后由concat分离器读取）
+                      或 'auto'（可用时使用rawpipe）
+            tiles_dir: 保存切割块JPEG的目录（None表示不保留切割块）；该目录不在临时目录中，
+                       clean_up 不会删除其中的文件
         """
         # 检查ffmpeg是否安装
         if not self._check_ffmpeg_installed():
@@ -44,6 +106,20 @@ class ImageSpliterAndVideoCreator:
         self.crop_width = int(crop_width)
         self.crop_height = int(crop_height)
         self.fps = int(fps)
+        self.encode_chunks = max(1, int(encode_chunks))
+        self.stream = stream
+        if mode not in ('tiles', 'scroll'):
+            raise ValueError(f"未知的模式: {mode}")
+        self.mode = mode
+        self.scroll_pause = max(0.0, float(scroll_pause))
+        self.scroll_move = max(1.0 / self.fps, float(scroll_move))
+        self.video = open_video_backend(video_backend)
+        if pipeline not in ('auto', 'rawpipe', 'files'):
+            raise ValueError(f"未知的切割块管道: {pipeline}")
+        self.pipeline = pipeline
+        self.tiles_dir = tiles_dir
+        if tiles_dir:
+            os.makedirs(tiles_dir, exist_ok=True)
         
         # 获取原图片尺寸
         self.original_width, self.original_height = self._get_image_dimensions(input_image)
@@ -80,20 +156,34 @@ class ImageSpliterAndVideoCreator:
         else:
             self.output_size = f"{self.original_width}:{self.original_height}"
             
-        # 创建临时目录用于存储切割后的图片
-        self.temp_dir = tempfile.mkdtemp(prefix="image_spliter_")
+        self.rawpipe = self._use_rawpipe()
+        
+        # 创建临时目录用于存储切割后的图片与分块编码的块文件（符合内存预算时放在内存文件系统）
+        self.workspace = Workspace(self._estimate_workspace_bytes(), memory_budget_mb, ram_dir,
+                                   prefix="image_spliter_")
+        self.temp_dir = self.workspace.path
         
         # 存储切割后的图片路径列表
         self.cropped_images = []
+        self._pad_align = None
         
         print(f"初始化成功：")
         print(f"- 输入图片: {input_image}")
         print(f"- 原图片尺寸: {self.original_width}x{self.original_height}")
         print(f"- 切割尺寸: {self.crop_width}x{self.crop_height}")
         print(f"- 将切割为: {self.rows}行 × {self.cols}列 = {self.rows * self.cols}张图片")
-        print(f"- 临时目录: {self.temp_dir}")
+        print(f"- 临时目录: {self.workspace.describe()}")
         print(f"- 输出视频: {self.output_video}")
     
+    def _estimate_workspace_bytes(self):
+        """预估中间文件的总大小：切割块JPEG（原始帧管道或保存到tiles_dir时不在临时目录中）约为未压缩RGB的1/8，
+        分块编码时的块文件（每块约1.2秒）按每帧约1/50的RGB数据量计算"""
+        tile_bytes = self.crop_width * self.crop_height * 3
+        tiles = self.rows * self.cols
+        jpeg_bytes = 0 if self.rawpipe or self.tiles_dir else tiles * tile_bytes // 8
+        chunk_bytes = int(tiles * 1.2 * self.fps * tile_bytes / 50) if self.encode_chunks > 1 else 0
+        return jpeg_bytes + chunk_bytes
+    
     def _check_ffmpeg_installed(self):
         """检查ffmpeg是否安装"""
         try:
@@ -111,6 +201,11 @@ class ImageSpliterAndVideoCreator:
         Returns:
             tuple: (宽度, 高度)
         """
+        # 优先只读取文件头获取尺寸，无法识别时再调用ffprobe
+        dimensions = get_image_dimensions(image_path)
+        if dimensions:
+            return dimensions
+        
         try:
             # 使用ffprobe获取图片尺寸
             result = subprocess.run(
@@ -128,14 +223,13 @@ class ImageSpliterAndVideoCreator:
         except Exception as e:
             raise RuntimeError(f"获取图片尺寸失败: {str(e)}")
     
-    def split_image(self):
-        """将图片切割成多张图片，包含处理剩余部分"""
-        print(f"开始切割图片...")
+    def _tile_specs(self):
+        """返回需要输出的切割块，跳过宽或高小于 MIN_SIZE_THRESHOLD 的切割块
         
-        # 清空存储列表
-        self.cropped_images = []
-        
-        # 遍历所有切割块
+        Returns:
+            list: (行, 列, x, y, 实际宽度, 实际高度, 缩放后宽度, 缩放后高度) 列表
+        """
+        specs = []
         for row in range(self.rows):
             for col in range(self.cols):
                 # 计算切割起始坐标
@@ -146,192 +240,443 @@ class ImageSpliterAndVideoCreator:
                 actual_width = min(self.crop_width, self.original_width - x)
                 actual_height = min(self.crop_height, self.original_height - y)
                 
-                # 定义过小尺寸阈值（像素）
-                MIN_SIZE_THRESHOLD = 30
-                
                 # 检查是否是过小尺寸，如果是则跳过该切割块
                 if actual_width < MIN_SIZE_THRESHOLD or actual_height < MIN_SIZE_THRESHOLD:
                     print(f"跳过过小切割块: 位置({x},{y}), 尺寸({actual_width}x{actual_height}) < 阈值({MIN_SIZE_THRESHOLD})")
                     continue
                 
-                # 设置输出图片路径
-                output_image = os.path.join(self.temp_dir, f"cropped_{row}_{col}.jpg")
-                
-                # 构建ffmpeg命令切割图片，并使用scale和pad确保所有切割块都具有统一的尺寸
-                # 1. 先裁剪出实际区域
-                # 2. 然后缩放到目标尺寸（保持宽高比）
-                # 3. 最后填充到目标尺寸，确保所有切割块尺寸一致
-                cmd = [
-                    "ffmpeg",
-                    "-i", self.input_image,
-                    "-vf", f"crop={actual_width}:{actual_height}:{x}:{y},scale=iw*min({self.crop_width}/iw\,{self.crop_height}/ih):ih*min({self.crop_width}/iw\,{self.crop_height}/ih),pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black",
-                    "-y",  # 覆盖已存在的文件
-                    output_image
-                ]
-                
-                try:
-                    # 执行命令
-                    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    self.cropped_images.append(output_image)
-                    print(f"已切割: {output_image} (位置: {x},{y}, 尺寸: {actual_width}x{actual_height})")
-                except subprocess.CalledProcessError as e:
-                    print(f"切割图片失败: {str(e)}")
-                    raise
-        
-        print(f"图片切割完成，共生成 {len(self.cropped_images)} 张图片")
+                # 与 scale=iw*min(cw/iw,ch/ih):ih*min(cw/iw,ch/ih) 相同的双精度计算与截断
+                factor = min(self.crop_width / actual_width, self.crop_height / actual_height)
+                specs.append((row, col, x, y, actual_width, actual_height,
+                              int(actual_width * factor), int(actual_height * factor)))
+        return specs
     
-    def create_video(self):
-        """将切割后的图片合并成视频，包含短视频和主视频的转场效果"""
-        if not self.cropped_images:
-            raise ValueError("没有可用于合成视频的切割图片，请先执行split_image方法")
+    def _tile_path(self, row, col):
+        return os.path.join(self.tiles_dir or self.temp_dir, f"cropped_{row}_{col}.jpg")
+    
+    def _use_rawpipe(self):
+        """判断切割块是否以原始帧直接送入编码器"""
+        if self.pipeline == 'files':
+            return False
+        available = PIL_AVAILABLE and NUMPY_AVAILABLE
+        if self.pipeline == 'rawpipe' and not available:
+            print("警告：rawpipe管道需要PIL与NumPy，回退到切割块文件")
+        return available
+    
+    def split_image(self):
+        """将图片切割成多张图片，包含处理剩余部分
         
-        print(f"开始合成视频...")
+        原图只解码一次：安装了PIL时在一次加载的图片上逐块裁剪（流式模式下每次只解码一个切割行的行条带），
+        否则用一次ffmpeg调用，split 后每个切割块一路 crop 输出。
+        每个切割块先裁剪出实际区域，再等比缩放到切割尺寸内，最后居中填充黑边，确保所有切割块尺寸一致。
+        """
+        print(f"开始切割图片...")
         
-        # 生成短视频（只包含前2张图片，持续1秒）
-        short_video_path = os.path.join(self.temp_dir, "short_video.mp4")
-        self._create_short_video(short_video_path)
+        # 清空存储列表
+        self.cropped_images = []
+        specs = self._tile_specs()
+        if not specs:
+            print("没有可输出的切割块")
+            return
         
-        # 生成主视频（包含所有图片）
-        main_video_path = os.path.join(self.temp_dir, "main_video.mp4")
-        self._create_main_video(main_video_path)
+        reader = open_strip_reader(self.input_image) if self.stream else None
+        if self.stream and reader is None:
+            print("警告：流式解码只支持8位非隔行PNG（需要PIL），回退到整张解码")
+        if reader is not None:
+            with reader:
+                for spec, tile in self._iter_tiles_strips(reader, specs):
+                    self._save_tile(tile, spec)
+        elif PIL_AVAILABLE:
+            for spec, tile in self._iter_tiles_pil(specs):
+                self._save_tile(tile, spec)
+        else:
+            self._split_with_ffmpeg(specs)
         
-        # 合并短视频和主视频，并添加转场效果
-        self._merge_videos_with_transition(short_video_path, main_video_path, self.output_video)
+        for row, col, x, y, actual_width, actual_height, _, _ in specs:
+            output_image = self._tile_path(row, col)
+            self.cropped_images.append(output_image)
+            print(f"已切割: {output_image} (位置: {x},{y}, 尺寸: {actual_width}x{actual_height})")
         
-        print(f"视频合成完成: {self.output_video}")
+        print(f"图片切割完成，共生成 {len(self.cropped_images)} 张图片")
+    
+    def _pad_alignment(self):
+        """返回ffmpeg pad 对原图解码像素格式使用的偏移对齐 (水平, 垂直)，例如JPEG的yuvj420p为(2, 2)、PNG的rgb24为(1, 1)"""
+        if self._pad_align is None:
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=pix_fmt", "-of", "csv=p=0", self.input_image],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+            match = re.search(r'4[124][014]', result.stdout)
+            self._pad_align = PAD_ALIGNMENT.get(match.group(0), (1, 1)) if match else (1, 1)
+        return self._pad_align
     
-    def _create_short_video(self, output_path):
-        """创建时长非常短的视频，确保能处理不同尺寸的图片"""
-        # 使用所有切割后的图片创建短视频
-        short_images = self.cropped_images
+    def _fit_tile(self, tile, spec):
+        """把裁剪出的实际区域等比缩放、居中填充到切割尺寸
         
-        # 创建文件列表文件
-        file_list_path = os.path.join(self.temp_dir, "short_filelist.txt")
-        with open(file_list_path, 'w') as f:
-            for img in short_images:
-                abs_path = os.path.abspath(img).replace('\\', '/')
-                f.write(f"file '{abs_path}'\nduration 0.2\n")  # 每张图片显示0.2秒
-            # 最后一张图片需要再写一次
-            if short_images:
-                abs_path = os.path.abspath(short_images[-1]).replace('\\', '/')
-                f.write(f"file '{abs_path}'\n")
+        尺寸与填充偏移和 _split_with_ffmpeg 的 scale/pad 一致；缩放使用PIL的BICUBIC而不是swscale，
+        需要缩放的切割块像素值与ffmpeg输出有细微差异（平滑内容上平均误差约1个色阶），不是逐字节一致。
+        """
+        _, _, _, _, actual_width, actual_height, scaled_width, scaled_height = spec
+        if tile.mode != 'RGB':
+            tile = tile.convert('RGB')
+        if (scaled_width, scaled_height) != (actual_width, actual_height):
+            tile = tile.resize((scaled_width, scaled_height), Image.BICUBIC)
+        if (scaled_width, scaled_height) == (self.crop_width, self.crop_height):
+            return tile
+        canvas = Image.new('RGB', (self.crop_width, self.crop_height), 'black')
+        # 与 pad=(ow-iw)/2:(oh-ih)/2 相同：偏移按原图像素格式的色度子采样向下对齐
+        align_x, align_y = self._pad_alignment()
+        canvas.paste(tile, ((self.crop_width - scaled_width) // 2 // align_x * align_x,
+                            (self.crop_height - scaled_height) // 2 // align_y * align_y))
+        return canvas
+    
+    def _save_tile(self, tile, spec):
+        """把裁剪出的实际区域等比缩放、居中填充到切割尺寸后保存"""
+        row, col = spec[:2]
+        self._fit_tile(tile, spec).save(self._tile_path(row, col), quality=95)
+    
+    def _iter_tiles_pil(self, specs):
+        """在一次解码的图片上按顺序裁剪所有切割块，产出 (切割块参数, 实际区域图片)"""
+        with Image.open(self.input_image) as source:
+            source = source.convert('RGB')
+            for spec in specs:
+                _, _, x, y, actual_width, actual_height, _, _ = spec
+                yield spec, source.crop((x, y, x + actual_width, y + actual_height))
+    
+    def _iter_tiles_strips(self, reader, specs):
+        """按切割行流式解码：每个切割行只解码对应的行条带，产出该行的切割块后立即释放"""
+        specs_by_row = {}
+        for spec in specs:
+            specs_by_row.setdefault(spec[0], []).append(spec)
+        for row, band in enumerate(reader.bands(self.crop_height)):
+            # 整行都被跳过时仍需读过这些行，条带随即释放
+            for spec in specs_by_row.get(row, []):
+                _, _, x, _, actual_width, actual_height, _, _ = spec
+                yield spec, band.crop((x, 0, x + actual_width, actual_height))
+            del band
+    
+    def _split_with_ffmpeg(self, specs):
+        """一次ffmpeg调用：原图解码一次后 split 为N路，每路 crop/scale/pad 后输出一个切割块"""
+        graph = FilterGraph()
+        branches = graph.split(graph.input(0, (self.original_width, self.original_height)), len(specs))
+        outputs = []
+        for index, (branch, spec) in enumerate(zip(branches, specs)):
+            row, col, x, y, actual_width, actual_height, scaled_width, scaled_height = spec
+            filters = [f"crop={actual_width}:{actual_height}:{x}:{y}"]
+            # 完整切割块不需要缩放与填充
+            if (scaled_width, scaled_height) != (actual_width, actual_height):
+                filters.append(f"scale={scaled_width}:{scaled_height}")
+            if (scaled_width, scaled_height) != (self.crop_width, self.crop_height):
+                filters.append(f"pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black")
+            label = graph.chain(branch, filters, output=f"t{index}")
+            outputs += ["-map", f"[{label}]", "-frames:v", "1", self._tile_path(row, col)]
+        cmd = ["ffmpeg", "-y", "-i", self.input_image,
+               "-filter_complex_script", graph.write_script(self.temp_dir), *outputs]
         
-        # 构建ffmpeg命令合成短视频
-        # 由于切割的图片已经是统一尺寸，这里只需要设置fps即可
-        # 仍然保留scale和pad作为保险措施，确保所有图片在视频中显示为统一尺寸
-        cmd = [
-            "ffmpeg",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", file_list_path,
-            "-vf", f"scale={self.crop_width}:{self.crop_height}:force_original_aspect_ratio=decrease,pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black,fps={self.fps}",
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            "-y",
-            output_path
-        ]
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except subprocess.CalledProcessError as e:
+            print(f"切割图片失败: {str(e)}")
+            raise
+    
+    def create_video(self):
+        """将切割后的图片合成视频：短序列与主序列之间用slideleft转场，整个时间线只编码一次"""
+        if not self.cropped_images:
+            raise ValueError("没有可用于合成视频的切割图片，请先执行split_image方法")
+        
+        short_duration, transition, total_duration = self._timeline(len(self.cropped_images))
+        print(f"开始合成视频，时长 {total_duration:.2f} 秒...")
         
+        if self.video.in_process and NUMPY_AVAILABLE:
+            # 进程内后端解码切割块并按时间线逐帧生成、编码，不启动ffmpeg进程；
+            # 切割块与命令行路径一样由libavcodec解码
+            def load(index):
+                frames = self.video.decode_frames(self.cropped_images[index])
+                try:
+                    return next(frames)
+                finally:
+                    frames.close()
+            self._encode_timeline(self._tile_cache(load), len(self.cropped_images))
+            print(f"视频合成完成: {self.output_video}")
+            return
+        
+        cmd = self._video_command(short_duration - transition, transition)
         print(f"ffmpeg cmd: {cmd}")
         
         try:
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"短视频合成完成: {output_path}")
+            if self.encode_chunks > 1:
+                returncode, stderr = encode_command_chunked(
+                    lambda start, end: self._video_command(short_duration - transition, transition, (start, end)),
+                    round(total_duration * self.fps), self.fps, self.output_video, self.encode_chunks,
+                    self.workspace.dir_for(self._estimate_workspace_bytes()))
+                if returncode != 0:
+                    raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+            else:
+                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         except subprocess.CalledProcessError as e:
-            print(f"短视频合成失败: {str(e)}")
+            print(f"视频合成失败: {str(e)}")
             raise
+        
+        print(f"视频合成完成: {self.output_video}")
+    
+    def _timeline(self, count):
+        """按切割块数量直接计算时间线，不需要探测中间视频的时长
+        
+        Returns:
+            tuple: (短序列时长, 转场时长, 输出总时长)，转场从 短序列时长-转场时长 开始
+        """
+        short_duration = round(count * SHORT_SECONDS_PER_TILE, 6)
+        # 切割块很少时短序列不足转场时长，转场缩短为整个短序列
+        transition = min(TRANSITION_SECONDS, short_duration)
+        return short_duration, transition, round(short_duration - transition + count * MAIN_SECONDS_PER_TILE, 6)
+    
+    def _fit_filters(self):
+        """缩放并居中填充到切割尺寸的滤镜"""
+        return [f"scale={self.crop_width}:{self.crop_height}:force_original_aspect_ratio=decrease",
+                f"pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black"]
     
-    def _create_main_video(self, output_path):
-        """创建包含所有图片的主视频，确保能处理不同尺寸的图片"""
-        # 创建文件列表文件
-        file_list_path = os.path.join(self.temp_dir, "main_filelist.txt")
+    def _filter_script_args(self, graph):
+        """把滤镜图写入临时目录中的脚本文件，返回对应的ffmpeg参数"""
+        return ["-filter_complex_script", graph.write_script(self.temp_dir), "-map", "[out]"]
+    
+    def _write_concat_list(self, name, seconds_per_image):
+        """写入concat分离器的文件列表，每张切割块显示seconds_per_image秒，返回列表路径"""
+        file_list_path = os.path.join(self.temp_dir, name)
         with open(file_list_path, 'w') as f:
             for img in self.cropped_images:
                 abs_path = os.path.abspath(img).replace('\\', '/')
-                f.write(f"file '{abs_path}'\nduration 1\n")  # 每张图片显示1秒
+                f.write(f"file '{abs_path}'\nduration {seconds_per_image}\n")
             # 最后一张图片需要再写一次
             abs_path = os.path.abspath(self.cropped_images[-1]).replace('\\', '/')
             f.write(f"file '{abs_path}'\n")
+        return file_list_path
+    
+    def _video_command(self, offset, transition, frame_range=None):
+        """构建一次编码的FFmpeg命令：短序列与主序列作为同一个滤镜图的两路输入，经xfade转场后只编码一次
         
-        # 构建ffmpeg命令合成主视频
-        # 由于切割的图片已经是统一尺寸，这里只需要设置fps即可
-        # 仍然保留scale和pad作为保险措施，确保所有图片在视频中显示为统一尺寸
-        cmd = [
+        Args:
+            offset: 转场开始时间（秒）
+            transition: 转场时长（秒）
+            frame_range: 只输出 [开始帧, 结束帧) 的分块命令（None表示整条时间线）。窗口位于xfade之后：
+                         concat输入每张切割块只解码一次，窗口之前的帧只是fps复制的引用（转场期间除外），
+                         不做像素格式转换也不编码
+        """
+        # 切割后的图片已经是统一尺寸，滤镜图构建器会省略多余的scale和pad，只保留fps
+        size = (self.crop_width, self.crop_height)
+        graph = FilterGraph()
+        short = graph.chain(graph.input(0, size), self._fit_filters() + [f"fps={self.fps}"])
+        main = graph.chain(graph.input(1, size), self._fit_filters() + [f"fps={self.fps}"])
+        window = [] if frame_range is None else [window_trim(*frame_range), "setpts=PTS-STARTPTS"]
+        graph.chain([short, main], [f"xfade=transition=slideleft:duration={transition}:offset={offset:.6g}",
+                                    *window, "format=yuv420p"], output="out")
+        return [
             "ffmpeg",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", file_list_path,
-            "-vf", f"scale={self.crop_width}:{self.crop_height}:force_original_aspect_ratio=decrease,pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black,fps={self.fps}",
+            "-f", "concat", "-safe", "0",
+            "-i", self._write_concat_list("short_filelist.txt", SHORT_SECONDS_PER_TILE),
+            "-f", "concat", "-safe", "0",
+            "-i", self._write_concat_list("main_filelist.txt", MAIN_SECONDS_PER_TILE),
+            *self._filter_script_args(graph),
             "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
+            "-preset", "medium",
             "-y",
-            output_path
+            self.output_video
         ]
+    
+    def _timeline_frames(self, tile_at, count, start=0, end=None):
+        """按时间线逐帧产出第 [start, end) 帧：短序列 -> slideleft转场 -> 主序列
         
-        print(f"ffmpeg cmd: {cmd}")
+        时间线与ffmpeg命令一致：每个序列中每张切割块重复固定帧数（帧重复即计时），最后一张再多显示一帧；
+        转场期间短序列的画面向左移出，主序列的画面从右侧移入。每一帧直接由帧序号算出所需的切割块，
+        分块编码时每块只生成自己的帧范围。
         
-        try:
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"主视频合成完成: {output_path}")
-        except subprocess.CalledProcessError as e:
-            print(f"主视频合成失败: {str(e)}")
-            raise
+        Args:
+            tile_at: 按序号返回切割块（高x宽x3 uint8）的函数
+            count: 切割块数量
+            start: 开始帧
+            end: 结束帧（不包含，None表示时间线末尾）
+        """
+        short_duration, transition, _ = self._timeline(count)
+        offset = round((short_duration - transition) * self.fps)
+        transition_frames = max(1, round(transition * self.fps))
+        short_frames = max(1, round(SHORT_SECONDS_PER_TILE * self.fps))
+        main_frames = max(1, round(MAIN_SECONDS_PER_TILE * self.fps))
+        total = offset + count * main_frames + 1
+        
+        for index in range(start, total if end is None else min(end, total)):
+            # 最后一张切割块保持到序列结束
+            short = min(index // short_frames, count - 1)
+            if index < offset:
+                yield tile_at(short)
+                continue
+            frame = tile_at(min((index - offset) // main_frames, count - 1))
+            if index - offset < transition_frames:
+                shift = round((index - offset) * self.crop_width / transition_frames)
+                frame = np.concatenate([tile_at(short)[:, shift:], frame[:, :shift]], axis=1)
+            yield frame
     
-    def _merge_videos_with_transition(self, video1_path, video2_path, output_path):
-        """合并两个视频并添加转场效果"""
-        # 定义转场效果：使用xfade滤镜，设置为fade转场，持续1秒
-        # 先获取两个视频的时长
-        duration1 = self._get_video_duration(video1_path)
+    def _tile_cache(self, load):
+        """包装按序号加载切割块的函数：每块编码同一时刻最多用到两张切割块，缓存最近用到的几张"""
+        return lru_cache(maxsize=2 * max(1, self.encode_chunks))(load)
+    
+    def _encode_timeline(self, tile_at, count):
+        """把时间线的原始帧送入编码后端（pyav进程内编码，或通过管道送入ffmpeg进程）
+        
+        分块编码时每块只生成并编码 [开始帧, 结束帧) 的帧，各块并行编码后流复制拼接。
+        """
+        output_args = ["-c:v", "libx264", "-preset", "medium"]
+        frame_count = round(self._timeline(count)[2] * self.fps)
+        if self.encode_chunks > 1:
+            ranges = chunk_ranges(0, frame_count, self.encode_chunks, gop_frames(self.fps))
+            chunk_args = output_args + gop_args(self.fps, chunk_threads(len(ranges))) + ["-pix_fmt", "yuv420p"]
+            print(f"分块编码: {len(ranges)} 块并行")
+            returncode, stderr = encode_chunked(
+                lambda start, end, path: self.video.encode_frames(
+                    self._timeline_frames(tile_at, count, start, end),
+                    self.crop_width, self.crop_height, self.fps, path, chunk_args),
+                ranges, self.output_video, len(ranges), self.workspace.dir_for(self._estimate_workspace_bytes()),
+                os.path.splitext(self.output_video)[1] or '.mp4')
+        else:
+            returncode, stderr = self.video.encode_frames(
+                self._timeline_frames(tile_at, count, 0, frame_count), self.crop_width, self.crop_height, self.fps,
+                self.output_video, ["-t", str(frame_count / self.fps), *output_args, "-pix_fmt", "yuv420p"])
+        if returncode != 0:
+            raise RuntimeError(stderr)
+    
+    def _rawpipe_tile_frames(self, specs):
+        """原图只解码一次，返回按序号取切割块原始帧的函数，不写入任何中间文件
+        
+        流式模式下按行条带解码原图，切割块以zlib快速压缩后保存在内存中，取用时再解压（带缓存）；
+        否则切割块直接保存在内存中。指定了 tiles_dir 时同时把切割块另存为JPEG。
+        """
+        def keep(spec, tile):
+            if self.tiles_dir:
+                tile.save(self._tile_path(*spec[:2]), quality=95)
+            return np.asarray(tile)
+        
+        if self.stream:
+            reader = open_strip_reader(self.input_image)
+            if reader is not None:
+                with reader:
+                    packed = [zlib.compress(keep(spec, self._fit_tile(tile, spec)).tobytes(), 1)
+                              for spec, tile in self._iter_tiles_strips(reader, specs)]
+                shape = (self.crop_height, self.crop_width, 3)
+                return self._tile_cache(
+                    lambda index: np.frombuffer(zlib.decompress(packed[index]), np.uint8).reshape(shape))
+            print("警告：流式解码只支持8位非隔行PNG（需要PIL），回退到整张解码")
+        tiles = [keep(spec, self._fit_tile(tile, spec)) for spec, tile in self._iter_tiles_pil(specs)]
+        return tiles.__getitem__
+    
+    def create_video_rawpipe(self):
+        """切割块像素直接以原始帧送入编码器：不生成切割块JPEG与concat列表，没有JPEG编解码的画质损失"""
+        specs = self._tile_specs()
+        if not specs:
+            raise ValueError("没有可用于合成视频的切割块")
+        short_duration, transition, total_duration = self._timeline(len(specs))
+        print(f"开始合成视频（原始帧管道，{len(specs)} 个切割块），时长 {total_duration:.2f} 秒...")
+        self._encode_timeline(self._rawpipe_tile_frames(specs), len(specs))
+        if self.tiles_dir:
+            print(f"切割块已保存到: {self.tiles_dir}")
+        print(f"视频合成完成: {self.output_video}")
+    
+    def clean_up(self):
+        """递归清理临时目录（包括溢出到磁盘的目录）"""
+        if os.path.exists(self.temp_dir):
+            self.workspace.cleanup()
+            print(f"已清理临时目录: {self.temp_dir}")
+    
+    def _scroll_stops(self, crop_size, original_size, count):
+        """返回一个方向上的停留位置数：末尾不足 MIN_SIZE_THRESHOLD 的剩余部分不单独停留
+        （取景窗口在最后一个位置会贴住原图边缘，剩余部分已经可见）"""
+        remainder = original_size - (count - 1) * crop_size
+        if count > 1 and remainder < MIN_SIZE_THRESHOLD:
+            return count - 1
+        return count
+    
+    def _scroll_expressions(self):
+        """返回取景窗口左上角随时间变化的 (x表达式, y表达式, 总时长)
+        
+        停留位置按行优先顺序排列，第i个位置为
+        (min(mod(i,列数)*切割宽度, 原图宽度-切割宽度), min(trunc(i/列数)*切割高度, 原图高度-切割高度))。
+        每个周期先停留 scroll_pause 秒，再用 smoothstep 缓动在 scroll_move 秒内移动到下一个位置。
+        """
+        cols = self._scroll_stops(self.crop_width, self.original_width, self.cols)
+        rows = self._scroll_stops(self.crop_height, self.original_height, self.rows)
+        stops = rows * cols
+        period = self.scroll_pause + self.scroll_move
+        duration = stops * self.scroll_pause + (stops - 1) * self.scroll_move
         
-        # 构建ffmpeg命令合并视频并添加转场
-        # 确保两个视频在合并前都具有相同的尺寸，以避免转场时出现问题
-        # 使用scale和pad滤镜确保两个视频都具有相同的尺寸
+        index = f"min(trunc(t/{period}),{stops - 1})"
+        next_index = f"min({index}+1,{stops - 1})"
+        progress = f"clip((t-{index}*{period}-{self.scroll_pause})/{self.scroll_move},0,1)"
+        eased = f"({progress})*({progress})*(3-2*({progress}))"
+        
+        def position(i, axis, crop_size, original_size):
+            offset = f"mod({i},{cols})" if axis == 'x' else f"trunc(({i})/{cols})"
+            return f"min({offset}*{crop_size},{original_size - crop_size})"
+        
+        expressions = []
+        for axis, crop_size, original_size in (('x', self.crop_width, self.original_width),
+                                               ('y', self.crop_height, self.original_height)):
+            start = position(index, axis, crop_size, original_size)
+            end = position(next_index, axis, crop_size, original_size)
+            expressions.append(f"{start}+({end}-{start})*{eased}")
+        return expressions[0], expressions[1], duration
+    
+    def _scroll_command(self, frame_range=None):
+        """构建scroll模式的FFmpeg命令：原图只解码一次，tpad克隆后逐帧裁剪取景窗口
+        
+        Args:
+            frame_range: 只输出 [开始帧, 结束帧) 的分块命令（None表示整条时间线），
+                         窗口在裁剪之前，块之前的帧只是克隆的引用
+        """
+        x_expr, y_expr, duration = self._scroll_expressions()
+        crop = f"crop=w={self.crop_width}:h={self.crop_height}:x='{x_expr}':y='{y_expr}'"
+        if frame_range is None:
+            filters = [crop, f"trim=duration={duration}"]
+        else:
+            # 裁剪表达式使用原时间戳，之后再让块的时间戳从0开始
+            filters = [window_trim(*frame_range), crop, "setpts=PTS-STARTPTS"]
+        graph = FilterGraph()
+        graph.chain(graph.input(0, (self.original_width, self.original_height)), [
+            f"tpad=stop_mode=clone:stop_duration={duration}", *filters, "format=yuv420p"], output="out")
         cmd = [
             "ffmpeg",
-            "-i", video1_path,
-            "-i", video2_path,
-            "-filter_complex", \
-            f"[0:v]scale={self.crop_width}:{self.crop_height}:force_original_aspect_ratio=decrease,pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black[v0];"
-            f"[1:v]scale={self.crop_width}:{self.crop_height}:force_original_aspect_ratio=decrease,pad={self.crop_width}:{self.crop_height}:(ow-iw)/2:(oh-ih)/2:black[v1];"
-            f"[v0][v1]xfade=transition=slideleft:duration=0.7:offset={duration1-0.7},format=yuv420p",
+            "-framerate", str(self.fps),
+            "-i", self.input_image,
+            *self._filter_script_args(graph),
+            "-r", str(self.fps),
             "-c:v", "libx264",
             "-preset", "medium",
             "-y",
-            output_path
+            self.output_video
         ]
-        
-        try:
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"视频合并完成，并添加了转场效果")
-        except subprocess.CalledProcessError as e:
-            print(f"视频合并失败: {str(e)}")
-            raise
+        return cmd, duration
     
-    def _get_video_duration(self, video_path):
-        """获取视频时长（秒）"""
-        try:
-            # 使用ffprobe获取视频时长
-            result = subprocess.run(
-                ["ffprobe", "-v", "error", "-show_entries", "format=duration", 
-                 "-of", "default=noprint_wrappers=1:nokey=1", video_path],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            
-            # 解析输出结果
-            duration = float(result.stdout.strip())
-            return duration
-        except Exception as e:
-            raise RuntimeError(f"获取视频时长失败: {str(e)}")
-    
-    def clean_up(self):
-        """清理临时文件"""
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-            print(f"已清理临时目录: {self.temp_dir}")
+    def create_scroll_video(self):
+        """scroll模式：取景窗口在原图上平滑移动并在每个切割块位置停留，不生成切割块文件，只编码一次"""
+        cmd, duration = self._scroll_command()
+        print(f"开始渲染滚动视频，时长 {duration:.2f} 秒...")
+        if self.encode_chunks > 1:
+            returncode, stderr = encode_command_chunked(lambda start, end: self._scroll_command((start, end))[0],
+                                                        round(duration * self.fps), self.fps,
+                                                        self.output_video, self.encode_chunks,
+                                                        self.workspace.dir_for(self._estimate_workspace_bytes()))
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+        else:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        print(f"视频合成完成: {self.output_video}")
     
     def run(self):
-        """执行完整流程：分割图片并合成视频"""
+        """执行完整流程：分割图片并合成视频（scroll模式直接渲染滚动视频）"""
         try:
+            if self.mode == 'scroll':
+                self.create_scroll_video()
+                return True
+            if self.rawpipe:
+                self.create_video_rawpipe()
+                return True
             self.split_image()
             self.create_video()
             return True
@@ -352,6 +697,26 @@ def parse_args():
     parser.add_argument('-o', '--output', help='输出视频路径')
     parser.add_argument('-fps', '--frames-per-second', type=int, default=25, help='视频帧率')
     parser.add_argument('-s', '--size', help='输出视频分辨率，例如 1280x720')
+    parser.add_argument('-j', '--encode-chunks', type=int, default=1,
+                        help='最终视频按GOP边界分块并行编码的块数（默认：1，不分块）')
+    parser.add_argument('--memory-budget-mb', type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f'中间文件的内存预算（MB），预估大小不超过预算时放在/dev/shm，否则放到磁盘'
+                             f'（0表示始终使用磁盘，默认：{DEFAULT_MEMORY_BUDGET_MB}）')
+    parser.add_argument('--ram-dir', help='内存文件系统目录（默认：/dev/shm）')
+    parser.add_argument('--mode', choices=['tiles', 'scroll'], default='tiles',
+                        help='tiles 切割为图片后合成视频；scroll 取景窗口在原图上平滑移动，一次渲染（默认：tiles）')
+    parser.add_argument('--scroll-pause', type=float, default=SCROLL_PAUSE_SECONDS,
+                        help=f'scroll模式在每个切割块位置的停留时长（秒，默认：{SCROLL_PAUSE_SECONDS}）')
+    parser.add_argument('--scroll-move', type=float, default=SCROLL_MOVE_SECONDS,
+                        help=f'scroll模式相邻位置之间的移动时长（秒，默认：{SCROLL_MOVE_SECONDS}）')
+    parser.add_argument('--stream', action='store_true',
+                        help='按切割行流式解码原图（8位非隔行PNG），峰值内存与 切割高度 x 宽度 成正比')
+    parser.add_argument('--pipeline', choices=['auto', 'rawpipe', 'files'], default='auto',
+                        help='切割块送入编码器的方式：rawpipe 切割块像素以原始帧直接送入编码器，不生成中间文件（需要PIL与NumPy）；'
+                             'files 切割块保存为JPEG后由concat分离器读取；auto 可用时使用rawpipe（默认：auto）')
+    parser.add_argument('--tiles-dir', help='保存切割块JPEG的目录（默认不保留切割块）')
+    parser.add_argument('--video-backend', choices=['auto', 'pyav', 'ffmpeg'], default='auto',
+                        help='编解码后端：pyav 进程内编码（需要PyAV）；ffmpeg 命令行；auto 安装了PyAV时使用pyav（默认：auto）')
     
     return parser.parse_args()
 
@@ -360,30 +725,41 @@ def main():
     # 解析命令行参数
     args = parse_args()
     
-    try:
-        # 创建图片分割与视频合成实例
-        tool = ImageSpliterAndVideoCreator(
-            input_image=args.input,
-            crop_width=args.crop_width,
-            crop_height=args.crop_height,
-            output_video=args.output,
-            fps=args.frames_per_second,
-            output_size=args.size
-        )
-        
-        # 执行完整流程
-        success = tool.run()
-        
-        if success:
-            print("\n任务完成！")
-            sys.exit(0)
-        else:
-            print("\n任务失败，请检查错误信息")
-            sys.exit(1)
+    with sigterm_as_exit():
+        try:
+            # 创建图片分割与视频合成实例
+            tool = ImageSpliterAndVideoCreator(
+                input_image=args.input,
+                crop_width=args.crop_width,
+                crop_height=args.crop_height,
+                output_video=args.output,
+                fps=args.frames_per_second,
+                output_size=args.size,
+                encode_chunks=args.encode_chunks,
+                video_backend=args.video_backend,
+                memory_budget_mb=args.memory_budget_mb,
+                ram_dir=args.ram_dir,
+                stream=args.stream,
+                mode=args.mode,
+                scroll_pause=args.scroll_pause,
+                scroll_move=args.scroll_move,
+                pipeline=args.pipeline,
+                tiles_dir=args.tiles_dir
+            )
+        
+            # 执行完整流程
+            success = tool.run()
+        
+            if success:
+                print("\n任务完成！")
+                sys.exit(0)
+            else:
+                print("\n任务失败，请检查错误信息")
+                sys.exit(1)
             
-    except Exception as e:
-        print(f"错误: {str(e)}")
-        sys.exit(1)
+        except Exception as e:
+            print(f"错误: {str(e)}")
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按宽高比规划网格布局
+
+calculate_grid_size 只根据图片数量取 ceil(sqrt(n)) 列，不考虑图片本身的宽高比；
+例如 9:16 的手机截图放在 16:9 画布上时，大部分单元格都是黑边。
+这里利用（只读取文件头得到的）图片尺寸，一次向量化计算所有 行x列 候选布局
+以及等高行（justified）布局的可见像素数，选择可见像素最多的布局。
+对 10000 张图片也只需几十毫秒，可以在规划循环中反复调用。
+"""
+
+import math
+from typing import List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 尺寸未知的图片按16:9处理
+DEFAULT_ASPECT = 16 / 9
+
+
+def _aspect_ratios(widths: List[Optional[int]], heights: List[Optional[int]]):
+    """把宽高列表转换为宽高比数组，未知尺寸使用已知图片的中位数（或16:9）"""
+    w = np.array([value or 0 for value in widths], dtype=np.float64)
+    h = np.array([value or 0 for value in heights], dtype=np.float64)
+    known = (w > 0) & (h > 0)
+    aspects = np.full(len(w), DEFAULT_ASPECT)
+    aspects[known] = w[known] / h[known]
+    if known.any() and not known.all():
+        aspects[~known] = np.median(aspects[known])
+    return aspects
+
+
+def plan_grid_layout(aspects, canvas_width: int, canvas_height: int) -> dict:
+    """在所有 行x列 网格中选择可见像素最多的一个
+
+    每个候选列数 c 对应 rows=ceil(n/c)，单元格尺寸与 create_grid_image 一致（偶数对齐）。
+    图片等比缩放进单元格后的面积为：宽高比 a 大于单元格宽高比时 w*w/a，否则 h*h*a。
+    先对宽高比排序并求前缀和，每个候选只需一次二分查找即可得到总面积。
+
+    Args:
+        aspects: 每张图片的宽高比（numpy数组）
+        canvas_width: 画布宽度
+        canvas_height: 画布高度
+
+    Returns:
+        dict: {'kind': 'grid', 'rows', 'cols', 'cell_width', 'cell_height', 'visible_pixels'}
+    """
+    n = len(aspects)
+    cols = np.arange(1, n + 1)
+    rows = -(-n // cols)
+    cell_width = (canvas_width // cols) // 2 * 2
+    cell_height = (canvas_height // rows) // 2 * 2
+    valid = (cell_width > 0) & (cell_height > 0)
+
+    sorted_aspects = np.sort(aspects)
+    prefix_aspect = np.concatenate(([0.0], np.cumsum(sorted_aspects)))
+    prefix_inverse = np.concatenate(([0.0], np.cumsum(1.0 / sorted_aspects)))
+
+    cell_ratio = cell_width / np.maximum(cell_height, 1)
+    # 宽高比不大于单元格宽高比的图片高度占满，其余图片宽度占满
+    split = np.searchsorted(sorted_aspects, cell_ratio, side='right')
+    visible = (cell_height.astype(np.float64) ** 2 * prefix_aspect[split]
+               + cell_width.astype(np.float64) ** 2 * (prefix_inverse[-1] - prefix_inverse[split]))
+    visible[~valid] = -1
+
+    best = int(np.argmax(visible))
+    return {
+        'kind': 'grid',
+        'rows': int(rows[best]),
+        'cols': int(cols[best]),
+        'cell_width': int(cell_width[best]),
+        'cell_height': int(cell_height[best]),
+        'visible_pixels': float(visible[best]),
+    }
+
+
+def plan_justified_layout(aspects, canvas_width: int, canvas_height: int,
+                          max_rows: Optional[int] = None) -> dict:
+    """在所有行数的等高行布局中选择可见像素最多的一个
+
+    图片按原顺序依宽高比累计值均分到 r 行，每行缩放到同一高度后恰好铺满画布宽度
+    （行高 = W / 行内宽高比之和）；总高度超出画布时整体等比缩小。
+    所有行数候选的分行边界通过一次 searchsorted 得到，行内求和使用 reduceat。
+
+    Args:
+        aspects: 每张图片的宽高比（numpy数组）
+        canvas_width: 画布宽度
+        canvas_height: 画布高度
+        max_rows: 最多尝试的行数（默认约为 4*sqrt(n)）
+
+    Returns:
+        dict: {'kind': 'justified', 'rows', 'boundaries', 'row_heights', 'visible_pixels'}
+    """
+    n = len(aspects)
+    if max_rows is None:
+        max_rows = 4 * math.isqrt(n) + 8
+    max_rows = max(1, min(n, max_rows))
+
+    cumulative = np.concatenate(([0.0], np.cumsum(aspects)))
+    total = cumulative[-1]
+
+    # 所有 (行数r, 边界k) 组合，k = 0..r
+    row_counts = np.arange(1, max_rows + 1)
+    pair_rows = np.repeat(row_counts, row_counts + 1)
+    pair_k = np.arange(len(pair_rows)) - np.repeat(np.cumsum(row_counts + 1) - (row_counts + 1), row_counts + 1)
+    targets = total * pair_k / pair_rows
+    # 取累计宽高比最接近目标值的分割位置
+    index = np.clip(np.searchsorted(cumulative, targets), 1, n)
+    closer_left = (targets - cumulative[index - 1]) < (cumulative[index] - targets)
+    boundaries = np.where(closer_left, index - 1, index)
+    boundaries[pair_k == 0] = 0
+    boundaries[pair_k == pair_rows] = n
+
+    # 每行的宽高比之和（丢弃每个r的最后一个边界作为起点的组合）
+    starts = np.ones(len(pair_rows), dtype=bool)
+    starts[np.cumsum(row_counts + 1) - 1] = False
+    row_sums = cumulative[boundaries[1:]] - cumulative[boundaries[:-1]]
+    row_sums = row_sums[starts[:-1]]
+    row_of_r = np.repeat(row_counts, row_counts)
+
+    empty_rows = np.zeros(max_rows + 1, dtype=bool)
+    np.logical_or.at(empty_rows, row_of_r, row_sums <= 0)
+    inverse_sums = np.zeros(max_rows + 1)
+    np.add.at(inverse_sums, row_of_r, 1.0 / np.maximum(row_sums, 1e-12))
+    inverse_sums = inverse_sums[1:]
+
+    # 总高度 T = W * sum(1/A_i)，面积 = s^2 * W^2 * sum(1/A_i)，s = min(1, H/T)
+    total_height = canvas_width * inverse_sums
+    scale = np.minimum(1.0, canvas_height / total_height)
+    visible = scale ** 2 * canvas_width ** 2 * inverse_sums
+    visible[empty_rows[1:]] = -1
+
+    best = int(np.argmax(visible))
+    best_rows = int(row_counts[best])
+    first = int(np.sum(row_counts[:best] + 1))
+    best_boundaries = [int(b) for b in boundaries[first:first + best_rows + 1]]
+    best_sums = np.diff(cumulative[best_boundaries])
+    row_heights = [float(canvas_width / a * scale[best]) for a in best_sums]
+    return {
+        'kind': 'justified',
+        'rows': best_rows,
+        'boundaries': best_boundaries,
+        'row_heights': row_heights,
+        'visible_pixels': float(visible[best]),
+    }
+
+
+def justified_cell_rects(layout: dict, aspects, canvas_width: int, canvas_height: int) -> List[tuple]:
+    """把等高行布局转换为每张图片的矩形 (x, y, 宽, 高)，整体在画布中居中"""
+    rects = []
+    total_height = sum(int(height) for height in layout['row_heights'])
+    y = (canvas_height - total_height) // 2
+    boundaries = layout['boundaries']
+    for row, height in enumerate(layout['row_heights']):
+        height = int(height)
+        start, end = boundaries[row], boundaries[row + 1]
+        widths = [max(1, int(aspects[i] * height)) for i in range(start, end)]
+        x = (canvas_width - sum(widths)) // 2
+        for width in widths:
+            rects.append((x, y, width, max(1, height)))
+            x += width
+        y += height
+    return rects
+
+
+def plan_layout(widths: List[Optional[int]], heights: List[Optional[int]],
+                canvas_width: int, canvas_height: int, allow_justified: bool = False) -> dict:
+    """选择可见像素最多的布局
+
+    Args:
+        widths: 每张图片的宽度（未知为None）
+        heights: 每张图片的高度（未知为None）
+        canvas_width: 画布宽度
+        canvas_height: 画布高度
+        allow_justified: 是否同时考虑等高行布局
+
+    Returns:
+        dict: 最佳布局（见 plan_grid_layout / plan_justified_layout），额外包含 'aspects'
+    """
+    aspects = _aspect_ratios(widths, heights)
+    best = plan_grid_layout(aspects, canvas_width, canvas_height)
+    if allow_justified:
+        justified = plan_justified_layout(aspects, canvas_width, canvas_height)
+        if justified['visible_pixels'] > best['visible_pixels']:
+            best = justified
+    best['aspects'] = aspects
+    return best
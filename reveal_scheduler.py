@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""网格单元格的显示时间表
+
+用NumPy为 rows x cols 的网格计算每个单元格开始淡入的时间（行优先、螺旋、对角波浪、随机），
+时间表可以直接交给逐帧渲染器，也可以写成每个单元格一个像素的16位灰度图：
+ffmpeg只需在这张小图上按时间计算不透明度，再最近邻放大为整张网格的alpha遮罩，
+用一个 maskedmerge 把完整网格合成到背景上，滤镜图大小与逐帧开销都与单元格数量无关。
+"""
+
+from typing import Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 支持的显示顺序
+REVEAL_ORDERS = ('row', 'spiral', 'diagonal', 'random')
+
+# 相邻两批单元格开始淡入的间隔（秒）
+REVEAL_INTERVAL = 0.5
+
+# 每个单元格的淡入时长（秒）
+REVEAL_FADE = 0.5
+
+# 16位灰度时间图的最大取值
+TIME_MAP_MAX = 65535
+
+
+def _spiral_ranks(rows: int, cols: int) -> 'np.ndarray':
+    """从左上角开始顺时针由外向内的螺旋顺序"""
+    ranks = np.zeros((rows, cols), dtype=np.int64)
+    top, bottom, left, right = 0, rows - 1, 0, cols - 1
+    rank = 0
+    while top <= bottom and left <= right:
+        for c in range(left, right + 1):
+            ranks[top, c] = rank
+            rank += 1
+        for r in range(top + 1, bottom + 1):
+            ranks[r, right] = rank
+            rank += 1
+        if top < bottom:
+            for c in range(right - 1, left - 1, -1):
+                ranks[bottom, c] = rank
+                rank += 1
+        if left < right:
+            for r in range(bottom - 1, top, -1):
+                ranks[r, left] = rank
+                rank += 1
+        top, bottom, left, right = top + 1, bottom - 1, left + 1, right - 1
+    return ranks
+
+
+def reveal_ranks(rows: int, cols: int, order: str = 'row', seed: Optional[int] = 0) -> 'np.ndarray':
+    """返回每个单元格的显示批次（rows x cols 整数数组，同一批次的单元格同时开始淡入）
+
+    Args:
+        rows: 行数
+        cols: 列数
+        order: 'row'（行优先）、'spiral'（螺旋）、'diagonal'（对角波浪，同一反对角线同时显示）
+               或 'random'（随机）
+        seed: 随机顺序的种子（None表示每次不同）
+    """
+    if order == 'row':
+        return np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+    if order == 'spiral':
+        return _spiral_ranks(rows, cols)
+    if order == 'diagonal':
+        return np.add.outer(np.arange(rows), np.arange(cols)).astype(np.int64)
+    if order == 'random':
+        return np.random.default_rng(seed).permutation(rows * cols).reshape(rows, cols)
+    raise ValueError(f"未知的显示顺序: {order}（可选：{', '.join(REVEAL_ORDERS)}）")
+
+
+def reveal_times(rows: int, cols: int, num_cells: int, order: str = 'row',
+                 interval: float = REVEAL_INTERVAL, seed: Optional[int] = 0) -> 'np.ndarray':
+    """返回每个单元格开始淡入的时间（rows x cols 浮点数组，单位秒）
+
+    只对前num_cells个（行优先）有图片的单元格重新编号，批次之间没有空档；空白单元格的时间为0。
+    """
+    ranks = reveal_ranks(rows, cols, order, seed).ravel()
+    occupied = np.arange(rows * cols) < num_cells
+    times = np.zeros(rows * cols, dtype=np.float64)
+    # 稠密排名：保留同一批次，去掉空白单元格留下的空档
+    _, dense = np.unique(ranks[occupied], return_inverse=True)
+    times[occupied] = dense * interval
+    return times.reshape(rows, cols)
+
+
+def time_map_unit(times: 'np.ndarray') -> float:
+    """返回16位时间图每一级代表的秒数（至少1毫秒）"""
+    return max(0.001, float(times.max(initial=0.0)) / TIME_MAP_MAX)
+
+
+def write_time_map(times: 'np.ndarray', path: str, unit: float):
+    """把时间表写成16位灰度PGM（每个单元格一个像素，取值为 时间/unit）"""
+    rows, cols = times.shape
+    values = np.clip(np.rint(times / unit), 0, TIME_MAP_MAX).astype('>u2')
+    with open(path, 'wb') as f:
+        f.write(f'P5\n{cols} {rows}\n{TIME_MAP_MAX}\n'.encode('ascii'))
+        f.write(values.tobytes())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按行条带流式读取超长PNG
+
+超长截图（例如 2644x40000 的整页截图）整张解码需要数百MB内存。这里的读取器按顺序读取IDAT块，
+增量解压出每个行条带的滤波后扫描行，只在内存中保留当前条带：
+
+条带的第一行可能引用上一行（Up/Average/Paeth滤波），因此把上一个条带已还原的最后一行
+以 None 滤波放在条带前面，拼成一张只有 条带行数+1 行的小PNG（zlib存储模式，不压缩），
+交给PIL在C代码中完成反滤波，再去掉第一行。峰值内存只与 条带高度 x 宽度 有关。
+
+只支持非隔行扫描、8位深度的PNG（灰度、RGB、调色板、灰度+alpha、RGBA），
+其他情况由调用方回退到整张解码。
+"""
+
+import io
+import struct
+import zlib
+from typing import Iterator, Optional
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG颜色类型 -> 每个像素的通道数
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# 每次从文件读取的压缩数据量
+READ_CHUNK_BYTES = 1 << 20
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """返回一个完整的PNG数据块（长度 + 类型 + 数据 + CRC）"""
+    return (struct.pack('>I', len(data)) + chunk_type + data +
+            struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+class PngStripReader:
+    """流式PNG读取器：按顺序产出行条带，不在内存中保留整张图片"""
+
+    def __init__(self, path: str):
+        """打开PNG并读取IDAT之前的头部信息
+
+        Raises:
+            ValueError: 不是PNG，或者是不支持流式读取的PNG（隔行扫描、非8位深度）
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+        self.rows_read = 0
+        self._decompressor = zlib.decompressobj()
+        self._pending = b''
+        self._previous_row = None
+        self._idat_remaining = 0
+        self._finished = False
+
+    def _read_header(self):
+        if self._file.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"不是PNG文件: {self.path}")
+        self._ancillary = []
+        while True:
+            length, chunk_type = struct.unpack('>I4s', self._file.read(8))
+            if chunk_type == b'IDAT':
+                self._first_idat_length = length
+                break
+            data = self._file.read(length)
+            self._file.read(4)
+            if chunk_type == b'IHDR':
+                (self.width, self.height, self.bit_depth, self.color_type,
+                 _, _, interlace) = struct.unpack('>IIBBBBB', data)
+                if interlace or self.bit_depth != 8 or self.color_type not in PNG_CHANNELS:
+                    raise ValueError("只支持非隔行扫描的8位PNG流式读取")
+            elif chunk_type in (b'PLTE', b'tRNS'):
+                # 调色板与透明度信息需要复制到每个条带
+                self._ancillary.append(_chunk(chunk_type, data))
+            elif chunk_type == b'IEND':
+                raise ValueError(f"PNG没有图像数据: {self.path}")
+        self.row_bytes = self.width * PNG_CHANNELS[self.color_type]
+
+    def _compressed_data(self) -> bytes:
+        """读取下一段IDAT压缩数据，没有更多数据时返回空字节串"""
+        while self._idat_remaining == 0:
+            if self._first_idat_length is not None:
+                self._idat_remaining = self._first_idat_length
+                self._first_idat_length = None
+                continue
+            self._file.read(4)  # 上一个IDAT的CRC
+            header = self._file.read(8)
+            if len(header) < 8:
+                return b''
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type != b'IDAT':
+                return b''
+            self._idat_remaining = length
+        data = self._file.read(min(self._idat_remaining, READ_CHUNK_BYTES))
+        self._idat_remaining -= len(data)
+        return data
+
+    def _filtered_rows(self, num_rows: int) -> bytes:
+        """解压出num_rows行滤波后的扫描行（每行1字节滤波类型 + row_bytes字节数据）"""
+        needed = num_rows * (self.row_bytes + 1)
+        parts = [self._pending]
+        have = len(self._pending)
+        while have < needed:
+            if self._decompressor.unconsumed_tail:
+                data = self._decompressor.decompress(self._decompressor.unconsumed_tail, needed - have)
+            else:
+                compressed = self._compressed_data()
+                if not compressed:
+                    break
+                data = self._decompressor.decompress(compressed, needed - have)
+            parts.append(data)
+            have += len(data)
+        buffer = b''.join(parts)
+        if len(buffer) < needed:
+            raise ValueError(f"PNG图像数据不完整: {self.path}")
+        self._pending = buffer[needed:]
+        return buffer[:needed]
+
+    def read_rows(self, num_rows: int) -> 'Image.Image':
+        """读取接下来的num_rows行，返回对应的PIL图片"""
+        num_rows = min(num_rows, self.height - self.rows_read)
+        if num_rows <= 0:
+            raise ValueError("已经读取到图片末尾")
+        data = self._filtered_rows(num_rows)
+        prefix = b'' if self._previous_row is None else b'\x00' + self._previous_row
+        band_height = num_rows + (1 if prefix else 0)
+        png = (PNG_SIGNATURE +
+               _chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, band_height, 8, self.color_type, 0, 0, 0)) +
+               b''.join(self._ancillary) +
+               _chunk(b'IDAT', zlib.compress(prefix + data, 0)) +
+               _chunk(b'IEND', b''))
+        band = Image.open(io.BytesIO(png))
+        band.load()
+        if prefix:
+            band = band.crop((0, 1, self.width, band_height))
+        # 保存最后一行的原始像素，供下一个条带反滤波
+        self._previous_row = band.crop((0, num_rows - 1, self.width, num_rows)).tobytes()
+        self.rows_read += num_rows
+        return band
+
+    def bands(self, band_height: int) -> Iterator['Image.Image']:
+        """按顺序产出高度为band_height的行条带（最后一个条带可能更矮）"""
+        while self.rows_read < self.height:
+            yield self.read_rows(band_height)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'PngStripReader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_strip_reader(path: str) -> Optional[PngStripReader]:
+    """尝试以流式方式打开图片，不支持时返回None（调用方应回退到整张解码）"""
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        return PngStripReader(path)
+    except (OSError, ValueError, struct.error):
+        return None
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按行条带流式写出超大图片（PNG / TIFF）
+
+超大网格（例如 30000x20000 像素的存档拼图）无法整张放在内存里，
+这里的写出器每次只接收一个行条带的RGB数据并立即写入文件，峰值内存只与一个条带有关。
+"""
+
+import os
+import struct
+import zlib
+
+# 普通TIFF的偏移量为32位，超过此大小需要BigTIFF
+TIFF_MAX_BYTES = 2 ** 32 - 1
+
+
+class PngStripWriter:
+    """流式PNG写出器：逐条带压缩为IDAT块，不在内存中保留整张图片"""
+
+    def __init__(self, path: str, width: int, height: int, compress_level: int = 6):
+        """初始化PNG写出器
+
+        Args:
+            path: 输出文件路径
+            width: 图片宽度
+            height: 图片高度
+            compress_level: zlib压缩级别（0-9）
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._stride = width * 3
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        # 8位RGB，非隔行
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        """写入一个PNG数据块（长度 + 类型 + 数据 + CRC）"""
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def write_strip(self, data: bytes, num_rows: int):
+        """写入一个行条带
+
+        Args:
+            data: 条带的RGB原始数据（num_rows * width * 3 字节）
+            num_rows: 条带行数
+        """
+        if len(data) != num_rows * self._stride:
+            raise ValueError(f"条带数据长度不匹配: {len(data)} != {num_rows * self._stride}")
+        # 每行前加上滤波类型字节0（None）
+        filtered = bytearray()
+        for row in range(num_rows):
+            filtered += b'\x00'
+            filtered += data[row * self._stride:(row + 1) * self._stride]
+        compressed = self._compressor.compress(bytes(filtered))
+        if compressed:
+            self._write_chunk(b'IDAT', compressed)
+        self.rows_written += num_rows
+
+    def close(self):
+        """结束写出并关闭文件"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"写入行数({self.rows_written})与图片高度({self.height})不一致")
+            self._write_chunk(b'IDAT', self._compressor.flush())
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+
+class TiffStripWriter:
+    """流式TIFF写出器：每个行条带写成一个无压缩TIFF strip，IFD在最后写入"""
+
+    def __init__(self, path: str, width: int, height: int):
+        """初始化TIFF写出器
+
+        Args:
+            path: 输出文件路径
+            width: 图片宽度
+            height: 图片高度
+        """
+        if width * height * 3 + 4096 > TIFF_MAX_BYTES:
+            raise ValueError(f"图片过大({width}x{height})，超出普通TIFF的4GB限制，请改用PNG输出")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._stride = width * 3
+        self._rows_per_strip = None
+        self._strip_offsets = []
+        self._strip_byte_counts = []
+        self._file = open(path, 'wb')
+        # 小端字节序文件头，IFD偏移量在close时回填
+        self._file.write(b'II*\x00' + struct.pack('<I', 0))
+
+    def write_strip(self, data: bytes, num_rows: int):
+        """写入一个行条带（除最后一个条带外，行数必须保持一致）
+
+        Args:
+            data: 条带的RGB原始数据（num_rows * width * 3 字节）
+            num_rows: 条带行数
+        """
+        if len(data) != num_rows * self._stride:
+            raise ValueError(f"条带数据长度不匹配: {len(data)} != {num_rows * self._stride}")
+        if self._rows_per_strip is None:
+            self._rows_per_strip = num_rows
+        elif num_rows > self._rows_per_strip or (
+                num_rows < self._rows_per_strip and self.rows_written + num_rows != self.height):
+            raise ValueError("TIFF条带行数必须一致（最后一个条带除外）")
+        self._strip_offsets.append(self._file.tell())
+        self._strip_byte_counts.append(len(data))
+        self._file.write(data)
+        self.rows_written += num_rows
+
+    def close(self):
+        """写入IFD并关闭文件"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"写入行数({self.rows_written})与图片高度({self.height})不一致")
+            self._write_ifd()
+        finally:
+            self._file.close()
+
+    def _write_ifd(self):
+        """写出IFD（标签按编号升序），并把IFD偏移量回填到文件头"""
+        num_strips = len(self._strip_offsets)
+
+        # 超过4字节的标签值放在IFD之前的附加数据区
+        def append_data(fmt: str, values) -> int:
+            if self._file.tell() % 2:
+                self._file.write(b'\x00')
+            offset = self._file.tell()
+            self._file.write(struct.pack('<' + fmt * len(values), *values))
+            return offset
+
+        bits_offset = append_data('H', [8, 8, 8])
+        resolution_offset = append_data('I', [72, 1])
+        offsets_value = self._strip_offsets[0] if num_strips == 1 else append_data('I', self._strip_offsets)
+        counts_value = self._strip_byte_counts[0] if num_strips == 1 else append_data('I', self._strip_byte_counts)
+
+        # (标签, 类型, 数量, 值或偏移)；类型 3=SHORT 4=LONG 5=RATIONAL
+        entries = [
+            (256, 4, 1, self.width),                  # ImageWidth
+            (257, 4, 1, self.height),                 # ImageLength
+            (258, 3, 3, bits_offset),                 # BitsPerSample
+            (259, 3, 1, 1),                           # Compression: 无压缩
+            (262, 3, 1, 2),                           # PhotometricInterpretation: RGB
+            (273, 4, num_strips, offsets_value),      # StripOffsets
+            (277, 3, 1, 3),                           # SamplesPerPixel
+            (278, 4, 1, self._rows_per_strip),        # RowsPerStrip
+            (279, 4, num_strips, counts_value),       # StripByteCounts
+            (282, 5, 1, resolution_offset),           # XResolution
+            (283, 5, 1, resolution_offset),           # YResolution
+            (284, 3, 1, 1),                           # PlanarConfiguration: 交错
+            (296, 3, 1, 2),                           # ResolutionUnit: 英寸
+        ]
+
+        if self._file.tell() % 2:
+            self._file.write(b'\x00')
+        ifd_offset = self._file.tell()
+        self._file.write(struct.pack('<H', len(entries)))
+        for tag, value_type, count, value in entries:
+            if value_type == 3 and count == 1:
+                self._file.write(struct.pack('<HHIHH', tag, value_type, count, value, 0))
+            else:
+                self._file.write(struct.pack('<HHII', tag, value_type, count, value))
+        self._file.write(struct.pack('<I', 0))
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', ifd_offset))
+
+
+def open_strip_writer(path: str, width: int, height: int):
+    """根据输出扩展名创建流式写出器
+
+    Args:
+        path: 输出文件路径（.png / .tif / .tiff）
+        width: 图片宽度
+        height: 图片高度
+
+    Returns:
+        PngStripWriter 或 TiffStripWriter
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.tif', '.tiff'):
+        return TiffStripWriter(path, width, height)
+    if ext == '.png':
+        return PngStripWriter(path, width, height)
+    raise ValueError(f"流式写出只支持PNG或TIFF格式: {path}")
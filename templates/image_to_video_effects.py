@@ -10,12 +10,27 @@ import subprocess
 import argparse
 import sys
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# 允许从仓库根目录导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_index import ImageIndex
+from filter_graph import FilterGraph
+from chunked_encode import chunk_threads, run_command
+from encoder_tuner import EncoderTuner, reference_args, sample_range
+
+# 未启用自动调优时的默认编码参数
+DEFAULT_ENCODER_ARGS = ["-crf", "18", "-preset", "medium"]
+
+
 class ImageToVideoEffects:
     """图片转视频特效类，用于将图片序列转换为带有各种特效的视频"""
     
-    def __init__(self, input_pattern, output_dir=None, fps=25, duration=6, output_size="1280x720"):
+    def __init__(self, input_pattern, output_dir=None, fps=25, duration=6, output_size="1280x720",
+                 static_input=False, encode_chunks=1, auto_tune=False, tune_target='ssim:0.98',
+                 tune_budget=20.0):
         """初始化图片转视频特效工具
         
         Args:
@@ -24,6 +39,13 @@ class ImageToVideoEffects:
             fps: 帧率，默认为25（输出帧率）
             duration: 每个效果视频的时长（秒）
             output_size: 输出分辨率，例如 '1280x720'
+            static_input: 单张图片输入时只解码一次，scale/pad之后再用tpad克隆到目标时长，
+                          只有fade、zoompan等随时间变化的滤镜逐帧执行
+            encode_chunks: 并行生成的特效视频数（1表示逐个生成）。特效滤镜（zoompan、按帧淡入淡出）
+                           依赖从第一帧开始的帧计数，无法按时间窗口分块，改为多个特效同时编码
+            auto_tune: 是否为每个特效在采样窗口上试编码，自动选择满足目标画质且最快的编码参数
+            tune_target: 自动调优的目标画质，例如 'ssim:0.98'、'psnr:40'
+            tune_budget: 自动调优的试编码时间预算（秒）
         """
         # 检查ffmpeg是否安装
         if not self._check_ffmpeg_installed():
@@ -44,6 +66,11 @@ class ImageToVideoEffects:
         
         # 输入文件统计
         self._detect_input_set()
+        self.static_input = bool(static_input) and not self.is_sequence
+        self.encode_chunks = max(1, int(encode_chunks))
+        self.tuner = EncoderTuner(tune_target, tune_budget) if auto_tune else None
+        # 并行生成时试编码调优逐个进行，避免同时试编码互相抢占CPU、影响计时
+        self._tune_lock = threading.Lock()
         
         # 设置输出目录
         if output_dir:
@@ -221,15 +248,37 @@ class ImageToVideoEffects:
             return False
     
     def _detect_input_set(self):
-        """检测输入是序列还是单图，并统计数量，计算输入帧率。"""
-        import glob, re
+        """检测输入是序列还是单图，并统计数量，计算输入帧率。
+
+        匹配文件通过所在目录的元数据索引查询（只读取文件头），
+        同时记录每张图片的宽高与格式到 self.input_images。
+        """
+        import glob, re, fnmatch
         self.is_sequence = False
         pattern = self.input_pattern
         # 统计匹配文件
         glob_pattern = pattern
         if "%" in pattern:
             glob_pattern = re.sub(r"%0?\d*d", "*", pattern)
-        matching_files = sorted(glob.glob(glob_pattern))
+        dir_path, name_pattern = os.path.split(glob_pattern)
+        dir_path = dir_path or "."
+        if not any(ch in dir_path for ch in ["*", "?", "["]) and os.path.isdir(dir_path):
+            index = ImageIndex(dir_path)
+            try:
+                index.scan()
+                self.input_images = [record for record in index.images()
+                                     if fnmatch.fnmatch(os.path.basename(record[0]), name_pattern)]
+            finally:
+                index.close()
+        else:
+            # 目录部分包含通配符时退回glob，尺寸未知
+            self.input_images = [(path, None, None, None) for path in sorted(glob.glob(glob_pattern))]
+        matching_files = [record[0] for record in self.input_images]
+        # 所有输入图片尺寸一致时记录输入尺寸，供滤镜图省略多余的缩放与填充
+        sizes = {(record[1], record[2]) for record in self.input_images}
+        self.input_size = None
+        if len(sizes) == 1 and None not in next(iter(sizes)):
+            self.input_size = sizes.pop()
         self.num_input_frames = len(matching_files) if matching_files else 0
         # 判断是否为序列
         if any(ch in pattern for ch in ["*", "?", "["]) or "%" in pattern:
@@ -264,35 +313,49 @@ class ImageToVideoEffects:
             args.extend(["-framerate", str(self.input_fps), "-pattern_type", "glob", "-i", pattern])
         elif "%" in pattern:
             args.extend(["-framerate", str(self.input_fps), "-i", pattern])
+        elif self.static_input:
+            # 单张图片（静态输入）：只读取一帧，缩放后由tpad克隆
+            args.extend(["-framerate", str(self.output_fps), "-i", pattern])
         else:
             # 单张图片：开启loop并限定时长
             args.extend(["-loop", "1", "-t", str(self.duration), "-i", pattern])
         return args
     
-    def _build_output_args(self, output_path: Path):
-        """统一的输出编码参数。"""
+    def _build_output_args(self, output_path: Path, encoder_args=None, threads=None):
+        """统一的输出编码参数，encoder_args 为自动调优选出的 libx264 参数，threads 为编码线程数。"""
         return [
             "-c:v", "libx264",
-            "-crf", "18",
-            "-preset", "medium",
+            *(encoder_args or DEFAULT_ENCODER_ARGS),
+            *(["-threads", str(threads)] if threads else []),
             "-pix_fmt", "yuv420p",
             "-movflags", "+faststart",
             "-r", str(self.output_fps),
             str(output_path)
         ]
     
-    def _vf_chain(self, filters):
-        """将滤镜列表拼接为 -vf 参数字符串。"""
-        return ",".join(filters)
+    def _effect_graph(self, filters):
+        """构建单个特效的滤镜图，输入尺寸已知时省略多余的 scale/pad。"""
+        graph = FilterGraph()
+        graph.chain(graph.input(0, self.input_size), filters, output="out")
+        return graph
     
     def _vf_with_duration(self, filters, add_trim=False):
-        """在现有滤镜链后追加 tpad+trim 来保证输出时长。"""
+        """在现有滤镜列表后追加 tpad+trim 来保证输出时长，返回新的滤镜列表。
+
+        静态输入模式下，在开头的 scale/pad 之后插入 tpad 克隆，
+        缩放结果只计算一次，后续滤镜逐帧处理克隆出的帧。
+        """
         chain = list(filters)
+        if self.static_input:
+            static_count = 0
+            while static_count < len(chain) and chain[static_count].startswith(("scale=", "pad=")):
+                static_count += 1
+            chain.insert(static_count, f"tpad=stop_mode=clone:stop_duration={max(0.0, self.duration)}")
         # 延长到至少 duration 秒（克隆最后一帧）
         chain.append(f"tpad=stop_mode=clone:stop_duration={max(0.0, self.duration)}")
         # 最后裁切为精确时长
         chain.append(f"trim=duration={self.duration}")
-        return self._vf_chain(chain)
+        return chain
     
     def _pad_center(self):
         """返回居中填充到目标分辨率的 pad 滤镜。"""
@@ -311,9 +374,17 @@ class ImageToVideoEffects:
         print(f"每段时长: {self.duration}s, 输出分辨率: {self.output_size}")
         print("=" * 50)
         
-        # 为每个特效生成视频
-        for effect in self.effects:
-            self._generate_single_effect(effect)
+        # 为每个特效生成视频（并行生成时按特效顺序收集结果，合并顺序不变）
+        if self.encode_chunks > 1:
+            workers = min(self.encode_chunks, len(self.effects))
+            threads = chunk_threads(workers)
+            print(f"并行生成: {workers} 个特效同时编码，每个 {threads} 个编码线程")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda effect: self._generate_single_effect(effect, threads),
+                                            self.effects))
+        else:
+            results = [self._generate_single_effect(effect) for effect in self.effects]
+        self.generated_videos = [path for path in results if path]
         
         print("=" * 50)
         print(f"所有特效视频生成完成！")
@@ -325,24 +396,41 @@ class ImageToVideoEffects:
         else:
             print("警告: 没有成功生成任何视频文件，无法合并")
     
-    def _generate_single_effect(self, effect):
+    def _generate_single_effect(self, effect, threads=None):
         """生成单个特效视频
         
         Args:
             effect: 特效配置字典
+            threads: libx264编码线程数（None表示由ffmpeg决定）
+
+        Returns:
+            str: 成功时返回输出文件路径，失败返回None
         """
         print(f"正在生成 '{effect['description']}'...")
+        script_path = None
         try:
             output_file = self.output_dir / f"{effect['name']}.mp4"
-            # 构建ffmpeg命令
-            cmd = [
+            # 构建ffmpeg命令（滤镜图通过脚本文件传递）
+            script_path = self._effect_graph(effect["filter"]).write_script()
+            graph_args = [
                 "ffmpeg",
                 *self._build_input_args(),
-                "-vf", effect["filter"],
-                *self._build_output_args(output_file)
+                "-filter_complex_script", script_path,
+                "-map", "[out]"
             ]
+            encoder_args = None
+            if self.tuner:
+                # 以特效中间的采样窗口试编码（开头多为淡入或尚未运动的画面），按特效与输出规格缓存决策
+                start, end = sample_range(self.total_frames, self.output_fps)
+                sample_args = reference_args((end - start) / self.output_fps, start / self.output_fps)
+                with self._tune_lock:
+                    encoder_args = self.tuner.tune(
+                        f"effect|{effect['name']}|{self.output_size}|{self.output_fps}fps",
+                        lambda path: run_command(graph_args + ["-r", str(self.output_fps)] + sample_args + [path])[0],
+                        DEFAULT_ENCODER_ARGS)
+            cmd = graph_args + self._build_output_args(output_file, encoder_args, threads)
             # 执行ffmpeg命令
-            result = subprocess.run(
+            subprocess.run(
                 cmd,
                 check=True,
                 stdout=subprocess.PIPE,
@@ -352,7 +440,7 @@ class ImageToVideoEffects:
             # 简单校验输出文件确实存在且非空
             if output_file.exists() and os.path.getsize(output_file) > 0:
                 print(f"成功生成: {effect['description']}")
-                self.generated_videos.append(str(output_file))
+                return str(output_file)
             else:
                 print(f"生成 '{effect['description']}' 失败: 输出文件不存在或为空")
         except subprocess.CalledProcessError as e:
@@ -363,6 +451,9 @@ class ImageToVideoEffects:
             print(f"生成 '{effect['description']}' 时发生未知错误:")
             print(f"错误信息: {str(e)}")
             print(f"继续处理下一个特效...")
+        finally:
+            if script_path and os.path.exists(script_path):
+                os.unlink(script_path)
     
     def _merge_videos(self):
         """将所有生成的视频合并为一个最终的mp4文件"""
@@ -471,12 +562,22 @@ def main():
     parser.add_argument('--duration', type=float, default=6.0, help='每个特效视频时长（秒），默认6')
     parser.add_argument('--size', default='1280x720', help='输出分辨率，例如 1280x720')
     parser.add_argument('--create-test-images', type=int, help='创建测试图片的数量')
+    parser.add_argument('--static-input', action='store_true',
+                        help='单张图片输入时只解码缩放一次，再用tpad克隆到目标时长')
+    parser.add_argument('--encode-chunks', type=int, default=1,
+                        help='并行生成的特效视频数（默认：1，逐个生成）')
+    parser.add_argument('--auto-tune', action='store_true',
+                        help='为每个特效试编码几组preset/crf/tune组合，选择满足目标画质且最快的参数')
+    parser.add_argument('--tune-target', default='ssim:0.98', help='自动调优的目标画质，如 ssim:0.98 或 psnr:40')
+    parser.add_argument('--tune-budget', type=float, default=20.0, help='自动调优的试编码时间预算（秒），默认20')
     
     args = parser.parse_args()
     
     try:
         # 创建图片转视频特效工具实例
-        img_to_video = ImageToVideoEffects(args.input, args.output, args.fps, args.duration, args.size)
+        img_to_video = ImageToVideoEffects(args.input, args.output, args.fps, args.duration, args.size,
+                                           args.static_input, args.encode_chunks, args.auto_tune,
+                                           args.tune_target, args.tune_budget)
         
         # 如果需要创建测试图片
         if args.create_test_images:
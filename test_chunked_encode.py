@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试chunked_encode.py的分块编码：块边界按GOP对齐且覆盖全部帧，分块命令的改写，
+window_trim 只保留块内的帧；安装了ffmpeg时端到端验证分块编码的帧数与faststart"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from chunked_encode import (chunk_command, chunk_ranges, container_args, encode_command_chunked, gop_args,
+                            gop_frames, window_trim)
+
+FPS = 25
+WIDTH, HEIGHT = 64, 48
+
+
+def check_chunk_ranges(failures):
+    for start, end, chunks, gop in [(0, 1, 4, 50), (0, 50, 4, 50), (0, 51, 4, 50), (0, 500, 4, 50),
+                                    (0, 499, 3, 50), (10, 1000, 8, 60), (0, 200, 16, 50), (7, 8, 2, 1)]:
+        ranges = chunk_ranges(start, end, chunks, gop)
+        name = f"chunk_ranges({start}, {end}, {chunks}, {gop})"
+        if ranges[0][0] != start or ranges[-1][1] != end or any(
+                a[1] != b[0] for a, b in zip(ranges, ranges[1:])):
+            failures.append(f"{name}: 块没有首尾相接覆盖全部帧 {ranges}")
+        if any(s >= e for s, e in ranges) or len(ranges) > chunks:
+            failures.append(f"{name}: 出现空块或块数超过 {chunks}: {ranges}")
+        if any((s - start) % gop for s, _ in ranges):
+            failures.append(f"{name}: 块边界没有对齐GOP {ranges}")
+        # 帧数足够时块数取满，且各块的GOP数最多相差1
+        gops = [-(-(e - s) // gop) for s, e in ranges]
+        if len(ranges) != min(chunks, -(-(end - start) // gop)) or max(gops) - min(gops) > 1:
+            failures.append(f"{name}: 块划分不均匀 {ranges}")
+
+
+def check_commands(failures):
+    cmd = ['ffmpeg', '-i', 'in.png', '-c:v', 'libx264', '-movflags', '+faststart', '-r', '25', 'out.mp4']
+    chunk = chunk_command(cmd, FPS, 'chunk.mp4', 2)
+    if chunk != cmd[:-1] + gop_args(FPS, 2) + ['chunk.mp4'] or '-ss' in chunk:
+        failures.append(f"chunk_command 改写结果不正确: {chunk}")
+    if container_args(cmd) != ['-movflags', '+faststart'] or container_args(cmd[:4] + cmd[-3:]):
+        failures.append("container_args 没有正确提取 -movflags")
+
+
+def run_raw(filters):
+    """渲染测试源（每帧画面不同）为灰度原始帧，返回帧列表"""
+    cmd = ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', f'testsrc2=size={WIDTH}x{HEIGHT}:rate={FPS}:duration=4',
+           '-vf', ','.join(filters + ['format=gray']), '-f', 'rawvideo', '-']
+    data = subprocess.run(cmd, check=True, stdout=subprocess.PIPE).stdout
+    size = WIDTH * HEIGHT
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def check_window_trim(failures):
+    full = run_raw(['null'])
+    for start, end in [(0, 50), (50, 100), (37, 38), (99, 100)]:
+        frames = run_raw([window_trim(start, end), 'setpts=PTS-STARTPTS'])
+        if frames != full[start:end]:
+            failures.append(f"window_trim({start}, {end}): 得到 {len(frames)} 帧，与完整渲染的对应帧不一致")
+
+
+def check_encode_chunked(failures):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        output_path = os.path.join(temp_dir, 'out.mp4')
+
+        def build_command(start, end):
+            return ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi',
+                    '-i', f'testsrc2=size={WIDTH}x{HEIGHT}:rate={FPS}:duration=4',
+                    '-vf', f'{window_trim(start, end)},setpts=PTS-STARTPTS',
+                    '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-movflags', '+faststart', output_path]
+
+        returncode, stderr = encode_command_chunked(build_command, 100, FPS, output_path, 3, temp_dir)
+        if returncode != 0:
+            failures.append(f"分块编码失败: {stderr[:300]}")
+            return
+        frames = subprocess.run(['ffmpeg', '-v', 'error', '-i', output_path, '-f', 'rawvideo',
+                                 '-pix_fmt', 'gray', '-'], check=True, stdout=subprocess.PIPE).stdout
+        if len(frames) != 100 * WIDTH * HEIGHT:
+            failures.append(f"分块编码输出 {len(frames) // (WIDTH * HEIGHT)} 帧，应为100帧")
+        with open(output_path, 'rb') as f:
+            data = f.read()
+        if data.find(b'moov') > data.find(b'mdat'):
+            failures.append("拼接后的输出丢失了 -movflags +faststart（moov在mdat之后）")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    failures = []
+    if gop_frames(FPS) != 50:
+        failures.append(f"gop_frames({FPS}) = {gop_frames(FPS)}，应为50")
+    check_chunk_ranges(failures)
+    check_commands(failures)
+    if shutil.which('ffmpeg'):
+        check_window_trim(failures)
+        check_encode_chunked(failures)
+    else:
+        print("未找到ffmpeg，跳过window_trim与分块编码的端到端验证")
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！分块按GOP对齐覆盖全部帧，每块只渲染自己的帧范围")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
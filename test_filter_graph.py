@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试filter_graph.py中滤镜图构建器的简化规则：无效的scale/pad/trim/setpts被去掉，
+重复的幂等滤镜只保留一个，纯色居中叠加改为pad，输入过多的堆叠分层进行"""
+
+import sys
+from filter_graph import FilterGraph
+
+
+def check(name, actual, expected, failures):
+    """比较实际结果与期望结果，不一致时记录失败"""
+    if actual != expected:
+        failures.append(f"{name}: 期望 {expected!r}，实际 {actual!r}")
+
+
+def main():
+    failures = []
+
+    # 尺寸已知且相同时 scale/pad 被省略，没有滤镜时直接返回输入标签
+    graph = FilterGraph()
+    label = graph.chain(graph.input(0, (640, 360)),
+                        ['scale=640:360:force_original_aspect_ratio=decrease',
+                         'pad=640:360:(ow-iw)/2:(oh-ih)/2:black'])
+    check('同尺寸scale/pad', (label, graph.render()), ('0:v', ''), failures)
+
+    # 尺寸不同时保留，pad之后尺寸已知，后面同尺寸的scale被省略
+    graph = FilterGraph()
+    graph.chain(graph.input(0, (640, 360)), ['pad=w=800:h=600:(ow-iw)/2:(oh-ih)/2', 'scale=800:600'],
+                output='out')
+    check('pad后的scale', graph.render(), '[0:v]pad=w=800:h=600:(ow-iw)/2:(oh-ih)/2[out]', failures)
+
+    # force_original_aspect_ratio的输出尺寸未知，之后的pad必须保留
+    graph = FilterGraph()
+    graph.chain(graph.input(0, (1000, 500)),
+                ['scale=640:360:force_original_aspect_ratio=decrease', 'pad=640:360:(ow-iw)/2:(oh-ih)/2'],
+                output='out')
+    check('等比缩放后的pad', graph.render(),
+          '[0:v]scale=640:360:force_original_aspect_ratio=decrease,pad=640:360:(ow-iw)/2:(oh-ih)/2[out]',
+          failures)
+
+    # 时长已知且不超过trim时省略trim；输入时间戳从0开始时省略setpts
+    graph = FilterGraph()
+    graph.chain(graph.input(0, duration=3.0), ['trim=duration=5', 'setpts=PTS-STARTPTS', 'fps=25'],
+                output='out')
+    check('trim/setpts', graph.render(), '[0:v]fps=25[out]', failures)
+
+    # tpad之后时长未知，trim必须保留
+    graph = FilterGraph()
+    graph.chain(graph.input(0, duration=3.0), ['tpad=stop_mode=clone:stop_duration=5', 'trim=duration=5'],
+                output='out')
+    check('tpad后的trim', graph.render(), '[0:v]tpad=stop_mode=clone:stop_duration=5,trim=duration=5[out]',
+          failures)
+
+    # 相邻重复的幂等滤镜只保留一个
+    graph = FilterGraph()
+    graph.chain(graph.input(0), ['format=yuv420p', 'format=yuv420p', 'fps=25'], output='out')
+    check('重复幂等滤镜', graph.render(), '[0:v]format=yuv420p,fps=25[out]', failures)
+
+    # 无法推断的滤镜之后不再简化
+    graph = FilterGraph()
+    graph.chain(graph.input(0, (640, 360)), ['rotate=0.1', 'scale=640:360'], output='out')
+    check('无法推断的滤镜', graph.render(), '[0:v]rotate=0.1,scale=640:360[out]', failures)
+
+    # 纯色居中叠加：尺寸相同时省略，不同时改为pad
+    graph = FilterGraph()
+    same = graph.center_on_color('0:v', (640, 360), (640, 360))
+    padded = graph.center_on_color('0:v', (600, 300), (640, 360))
+    check('居中叠加', (same, graph.render()),
+          ('0:v', f'[0:v]pad=640:360:(ow-iw)/2:(oh-ih)/2:black[{padded}]'), failures)
+
+    # 输入过多的堆叠分层进行，每个滤镜的输入不超过上限
+    graph = FilterGraph(max_stack_inputs=4)
+    labels = [graph.input(i, (10, 10)) for i in range(10)]
+    graph.stack(labels, 'h')
+    counts = [len(chain.inputs) for chain in graph.chains]
+    check('分层堆叠', counts, [4, 4, 2, 3], failures)
+
+    if not failures:
+        print("测试成功！滤镜图简化规则全部符合预期")
+        return 0
+    print("测试失败！")
+    for failure in failures:
+        print(f"- {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试frame_renderer.py中GridFadeRenderer的时间线分析：
+区间首尾相接覆盖全部帧，静止区间内的帧完全相同，从任意帧开始渲染与从头渲染一致"""
+
+import sys
+
+from frame_renderer import NUMPY_AVAILABLE, GridFadeRenderer
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+
+def create_renderer(fps, fade_starts, fade_duration):
+    """创建 2x3 网格的渲染器，第5个单元格加载失败（None）"""
+    rng = np.random.default_rng(0)
+    cells = [rng.integers(1, 256, (20, 30, 3), dtype=np.uint8) for _ in fade_starts]
+    cells[4] = None
+    positions = [((i % 3) * 30, (i // 3) * 20) for i in range(len(fade_starts))]
+    return GridFadeRenderer(90, 40, cells, positions, fade_starts, fade_duration, fps)
+
+
+def check_timeline(name, renderer, frame_count, min_hold_frames, failures):
+    frames = list(renderer.frames(0, frame_count))
+    segments = renderer.timeline(frame_count, min_hold_frames)
+
+    # 区间首尾相接覆盖 [0, frame_count)，相邻区间不能都是动画区间
+    if segments[0][0] != 0 or segments[-1][1] != frame_count or any(
+            a[1] != b[0] for a, b in zip(segments, segments[1:])):
+        failures.append(f"{name}: 区间没有首尾相接覆盖全部帧 {segments}")
+    if any(not a[2] and not b[2] for a, b in zip(segments, segments[1:])):
+        failures.append(f"{name}: 相邻的动画区间没有合并 {segments}")
+
+    for start, end, is_static in segments:
+        if is_static:
+            if end - start < max(2, min_hold_frames):
+                failures.append(f"{name}: 静止区间过短 {(start, end)}")
+            if any(not np.array_equal(frames[k], frames[start]) for k in range(start + 1, end)):
+                failures.append(f"{name}: 静止区间 {(start, end)} 内画面发生变化")
+
+    # 画面发生变化的帧都不在静止区间内部（可以是静止区间的第一帧）
+    for k in range(1, frame_count):
+        if not np.array_equal(frames[k], frames[k - 1]):
+            if any(is_static and start < k < end for start, end, is_static in segments):
+                failures.append(f"{name}: 第{k}帧画面变化却位于静止区间内部")
+
+    # 分段渲染（编码静止区间或分块编码时）与从头渲染逐帧一致
+    for start, end, _ in segments:
+        if any(not np.array_equal(a, b) for a, b in zip(renderer.frames(start, end), frames[start:end])):
+            failures.append(f"{name}: 从第{start}帧开始渲染的结果与从头渲染不一致")
+
+
+def main():
+    if not NUMPY_AVAILABLE:
+        print("错误：未安装NumPy，无法测试原始帧渲染器！")
+        return 1
+
+    failures = []
+    # 淡入开始时间落在帧边界上、帧之间，以及多个单元格同时开始
+    check_timeline('25fps', create_renderer(25, [0.0, 0.5, 1.0, 1.0, 1.5, 3.3], 0.5), 150, 2, failures)
+    check_timeline('30fps', create_renderer(30, [0.1, 0.37, 0.9, 2.0, 2.0, 2.01], 0.5), 120, 5, failures)
+    check_timeline('无淡入', create_renderer(24, [0.0, 1.0, 2.0, 3.0, 4.0, 5.0], 0.0), 144, 2, failures)
+
+    if not failures:
+        print("测试成功！时间线区间划分与逐帧渲染结果一致")
+        return 0
+    print("测试失败！")
+    for failure in failures:
+        print(f"- {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
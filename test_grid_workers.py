@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试image_grid_creator.py中create_grid_image的并行工作池与NumPy合成后端，验证输出与串行PIL输出逐字节一致"""
+
+import os
+import shutil
+import sys
+import tempfile
+from image_grid_creator import ImageGridCreator, PIL_AVAILABLE, NUMPY_AVAILABLE
+
+
+def create_test_images(dir_path, count=30):
+    """生成不同尺寸、不同颜色的测试图片"""
+    from PIL import Image
+    image_files = []
+    for i in range(count):
+        # 交替使用横图和竖图，覆盖两种缩放分支
+        size = (640, 360) if i % 2 == 0 else (360, 640)
+        color = ((i * 37) % 256, (i * 73) % 256, (i * 151) % 256)
+        img_path = os.path.join(dir_path, f'output_{i + 1:03d}.jpg')
+        Image.new('RGB', size, color=color).save(img_path, quality=90)
+        image_files.append(img_path)
+    return image_files
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL库，无法测试并行工作池！")
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix='test_grid_workers_')
+    try:
+        image_files = create_test_images(work_dir)
+        print(f"生成 {len(image_files)} 张测试图片: {work_dir}")
+
+        variants = [('serial', 1, 'thread', 'pil'),
+                    ('thread', 4, 'thread', 'pil'),
+                    ('process', 4, 'process', 'pil')]
+        if NUMPY_AVAILABLE:
+            variants.append(('numpy', 4, 'thread', 'numpy'))
+        else:
+            print("警告：未安装NumPy，跳过numpy合成后端测试")
+
+        outputs = {}
+        for label, workers, pool_type, backend in variants:
+            output_path = os.path.join(work_dir, f'grid_{label}.jpg')
+            creator = ImageGridCreator(output_file=output_path, workers=workers,
+                                       pool_type=pool_type, backend=backend)
+            if not creator.create_grid_image(image_files, output_path):
+                print(f"\n测试失败！{label} 模式未能生成网格图片")
+                return 1
+            with open(output_path, 'rb') as f:
+                outputs[label] = f.read()
+
+        mismatched = [label for label in outputs if outputs[label] != outputs['serial']]
+        if not mismatched:
+            print("\n测试成功！所有输出与串行PIL输出逐字节一致")
+            return 0
+        else:
+            print(f"\n测试失败！以下模式的输出与串行PIL输出不一致: {', '.join(mismatched)}")
+            return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
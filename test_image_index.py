@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试image_index.py：索引文件写在索引目录中而不是图片目录中，增量扫描，
+以及索引文件被锁定或损坏时改用内存索引（scan不抛出数据库错误），单张图片的尺寸查询不扫描所在目录"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from image_index import ImageIndex, get_image_dimensions, index_path_for
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+SIZES = {'a.png': (31, 17), 'b.jpg': (64, 48), 'c.bmp': (5, 9), 'd.gif': (40, 2)}
+
+
+def create_images(dir_path):
+    for name, size in SIZES.items():
+        Image.new('RGB', size, (10, 200, 30)).save(os.path.join(dir_path, name))
+    with open(os.path.join(dir_path, 'notes.txt'), 'w') as f:
+        f.write('不是图片')
+
+
+def records(index):
+    return {os.path.basename(path): (width, height) for path, width, height, _ in index.images()}
+
+
+def scan(dir_path, index_dir):
+    index = ImageIndex(dir_path, index_dir)
+    try:
+        counts = index.scan()
+        return counts, records(index), index.in_memory
+    finally:
+        index.close()
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL，无法生成测试图片！")
+        return 1
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='test_image_index_')
+    try:
+        image_dir = os.path.join(work_dir, 'images')
+        index_dir = os.path.join(work_dir, 'index')
+        os.makedirs(image_dir)
+        create_images(image_dir)
+        before = sorted(os.listdir(image_dir))
+
+        # 单张图片的尺寸查询不为所在目录建立索引
+        if get_image_dimensions(os.path.join(image_dir, 'b.jpg')) != SIZES['b.jpg']:
+            failures.append("get_image_dimensions 返回的尺寸不正确")
+        if os.path.exists(index_path_for(image_dir)):
+            failures.append("get_image_dimensions 为所在目录建立了索引")
+
+        counts, found, in_memory = scan(image_dir, index_dir)
+        if found != SIZES or counts != (len(SIZES), 0) or in_memory:
+            failures.append(f"首次扫描结果不正确: {counts} {found} 内存索引={in_memory}")
+        if sorted(os.listdir(image_dir)) != before:
+            failures.append(f"扫描在图片目录中写入了文件: {sorted(os.listdir(image_dir))}")
+        if not os.path.exists(index_path_for(image_dir, index_dir)):
+            failures.append("索引目录中没有生成索引文件")
+
+        # 增量扫描：未变化的文件不重新读取，修改与删除的文件被更新
+        if scan(image_dir, index_dir)[0] != (0, 0):
+            failures.append("未变化的目录再次扫描时重新读取了文件")
+        Image.new('RGB', (7, 7)).save(os.path.join(image_dir, 'a.png'))
+        os.remove(os.path.join(image_dir, 'c.bmp'))
+        counts, found, _ = scan(image_dir, index_dir)
+        if counts != (1, 1) or found.get('a.png') != (7, 7) or 'c.bmp' in found:
+            failures.append(f"增量扫描结果不正确: {counts} {found}")
+
+        # 其他进程持有写锁：改用内存索引，已有记录被复制过来
+        Image.new('RGB', (3, 4)).save(os.path.join(image_dir, 'e.png'))
+        locker = sqlite3.connect(index_path_for(image_dir, index_dir))
+        locker.execute('BEGIN IMMEDIATE')
+        try:
+            counts, found, in_memory = scan(image_dir, index_dir)
+        except sqlite3.Error as e:
+            failures.append(f"索引被锁定时scan抛出了异常: {e}")
+        else:
+            if not in_memory or counts != (1, 0) or found.get('e.png') != (3, 4) or found.get('b.jpg') != (64, 48):
+                failures.append(f"索引被锁定时的结果不正确: {counts} {found} 内存索引={in_memory}")
+        finally:
+            locker.rollback()
+            locker.close()
+
+        # 索引文件损坏：改用内存索引重新扫描全部文件
+        with open(index_path_for(image_dir, index_dir), 'wb') as f:
+            f.write(b'not a database' * 100)
+        try:
+            counts, found, in_memory = scan(image_dir, index_dir)
+        except sqlite3.Error as e:
+            failures.append(f"索引文件损坏时scan抛出了异常: {e}")
+        else:
+            if not in_memory or len(found) != 4 or found.get('a.png') != (7, 7):
+                failures.append(f"索引文件损坏时的结果不正确: {counts} {found} 内存索引={in_memory}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！索引不写入图片目录，锁定或损坏时回退到内存索引")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
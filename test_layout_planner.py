@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试layout_planner.py：向量化网格规划与逐个候选的直接计算一致，
+网格/等高行布局的选择符合预期，等高行布局的矩形不越界、不重叠"""
+
+import math
+import random
+import sys
+
+from layout_planner import NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from layout_planner import plan_grid_layout, plan_layout, justified_cell_rects
+
+
+def brute_force_grid(aspects, canvas_width, canvas_height):
+    """逐个列数候选直接计算可见像素，返回 (可见像素, 列数)"""
+    best = (-1.0, 0)
+    for cols in range(1, len(aspects) + 1):
+        rows = math.ceil(len(aspects) / cols)
+        cell_width = (canvas_width // cols) // 2 * 2
+        cell_height = (canvas_height // rows) // 2 * 2
+        if cell_width <= 0 or cell_height <= 0:
+            continue
+        visible = 0.0
+        for aspect in aspects:
+            scale = min(cell_width / aspect, cell_height)
+            visible += scale * scale * aspect
+        if visible > best[0] * (1 + 1e-9):
+            best = (visible, cols)
+    return best
+
+
+def rects_overlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def main():
+    if not NUMPY_AVAILABLE:
+        print("错误：未安装NumPy，无法测试布局规划！")
+        return 1
+
+    failures = []
+    rng = random.Random(0)
+
+    # 向量化结果与直接计算一致
+    for trial in range(30):
+        count = rng.randint(1, 60)
+        aspects = np.array([rng.choice([16 / 9, 9 / 16, 4 / 3, 1.0, 3.0, 0.4]) for _ in range(count)])
+        plan = plan_grid_layout(aspects, 1920, 1080)
+        visible, cols = brute_force_grid(aspects, 1920, 1080)
+        if not math.isclose(plan['visible_pixels'], visible, rel_tol=1e-9):
+            failures.append(f"第{trial}组（{count}张）: 可见像素 {plan['visible_pixels']} != {visible}（{cols}列）")
+
+    # 4张16:9图片放在16:9画布上：2x2网格刚好铺满，不选择等高行布局
+    plan = plan_layout([1920] * 4, [1080] * 4, 1920, 1080, allow_justified=True)
+    if (plan['kind'], plan['rows'], plan['cols']) != ('grid', 2, 2):
+        failures.append(f"4张16:9图片应选择2x2网格，实际 {plan['kind']} {plan.get('rows')}x{plan.get('cols')}")
+
+    # 9:16竖图放在16:9画布上：按宽高比应选择单行，而不是 ceil(sqrt(n)) 列
+    plan = plan_layout([1080] * 6, [1920] * 6, 1920, 1080)
+    if (plan['rows'], plan['cols']) != (1, 6):
+        failures.append(f"6张竖图应选择1x6网格，实际 {plan['rows']}x{plan['cols']}")
+
+    # 全景图与竖图混合：等高行布局的可见像素更多
+    widths = [3000, 600, 3000, 600, 600, 3000, 600, 600]
+    heights = [1000, 1200, 1000, 1200, 1200, 1000, 1200, 1200]
+    plan = plan_layout(widths, heights, 1920, 1080, allow_justified=True)
+    if plan['kind'] != 'justified':
+        failures.append(f"全景图与竖图混合时应选择等高行布局，实际 {plan['kind']}")
+    else:
+        rects = justified_cell_rects(plan, plan['aspects'], 1920, 1080)
+        if len(rects) != len(widths):
+            failures.append(f"等高行矩形数量 {len(rects)} != {len(widths)}")
+        for index, (x, y, w, h) in enumerate(rects):
+            if x < 0 or y < 0 or x + w > 1920 or y + h > 1080:
+                failures.append(f"第{index}个矩形越界: {(x, y, w, h)}")
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if rects_overlap(rects[i], rects[j]):
+                    failures.append(f"矩形重叠: {rects[i]} {rects[j]}")
+
+    # 未知尺寸使用已知图片的中位宽高比
+    plan = plan_layout([1080, None, 1080], [1920, None, 1920], 1920, 1080)
+    if not np.allclose(plan['aspects'], 1080 / 1920):
+        failures.append(f"未知尺寸的宽高比应为中位数，实际 {plan['aspects']}")
+
+    if not failures:
+        print("测试成功！布局规划结果全部符合预期")
+        return 0
+    print("测试失败！")
+    for failure in failures:
+        print(f"- {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试reveal_scheduler.py的显示时间表，以及转场视频中每个单元格开始出现的帧与时间表一致：
+rawpipe渲染器总是验证，系统中有ffmpeg时同时验证ffmpeg滤镜图渲染与mask遮罩渲染（5列网格的时间图宽度为奇数），
+以及分块命令逐帧拼接后与整条时间线一致"""
+
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from chunked_encode import chunk_ranges
+from image_grid_creator import ImageGridCreator, PIL_AVAILABLE, NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from frame_renderer import GridFadeRenderer
+    from reveal_scheduler import REVEAL_FADE, REVEAL_INTERVAL, REVEAL_ORDERS, reveal_times
+
+ROWS, COLS, NUM_IMAGES = 4, 5, 16
+CELL_WIDTH, CELL_HEIGHT = 32, 24
+FPS = 30
+DURATION = 8.5
+
+
+def check_schedule(failures):
+    """时间表本身的性质：行优先与旧时间线一致，批次之间没有空档，对角线同时显示"""
+    times = reveal_times(ROWS, COLS, NUM_IMAGES, 'row').ravel()
+    if not np.allclose(times[:NUM_IMAGES], np.arange(NUM_IMAGES) * REVEAL_INTERVAL):
+        failures.append("row 顺序与 i*0.5 秒的时间线不一致")
+    for order in REVEAL_ORDERS:
+        times = reveal_times(ROWS, COLS, NUM_IMAGES, order).ravel()[:NUM_IMAGES]
+        batches = np.unique(np.rint(times / REVEAL_INTERVAL).astype(int))
+        if not np.array_equal(batches, np.arange(len(batches))):
+            failures.append(f"{order}: 批次之间有空档 {batches}")
+    times = reveal_times(ROWS, COLS, ROWS * COLS, 'diagonal')
+    for row in range(ROWS):
+        for col in range(COLS):
+            if times[row, col] != (row + col) * REVEAL_INTERVAL:
+                failures.append(f"diagonal: ({row},{col}) 的开始时间为 {times[row, col]}")
+
+
+def expected_onsets(starts):
+    """第一帧不透明度大于0的帧：帧时间严格晚于淡入开始时间"""
+    return [math.floor(start * FPS + 1e-9) + 1 for start in starts]
+
+
+def cell_onsets(frames, offset=(0, 0)):
+    """返回每个单元格第一次出现非黑像素的帧序号"""
+    onsets = [None] * NUM_IMAGES
+    for index, frame in enumerate(frames):
+        for i in range(NUM_IMAGES):
+            if onsets[i] is None:
+                x = offset[0] + (i % COLS) * CELL_WIDTH
+                y = offset[1] + (i // COLS) * CELL_HEIGHT
+                # 取单元格中心区域，避开色度子采样在边缘造成的渗色
+                if frame[y + 6:y + CELL_HEIGHT - 6, x + 8:x + CELL_WIDTH - 8].max() > 4:
+                    onsets[i] = index
+    return onsets
+
+
+def create_cells(dir_path):
+    from PIL import Image
+    paths = []
+    for i in range(NUM_IMAGES):
+        path = os.path.join(dir_path, f'cell_{i:02d}.png')
+        Image.new('RGB', (CELL_WIDTH, CELL_HEIGHT), (200, 120 + i * 8, 60)).save(path)
+        paths.append(path)
+    return paths
+
+
+def ffmpeg_frames(creator, image_files, frame_range=None, mask_inputs=None):
+    """用ffmpeg滤镜图（给出mask_inputs时用遮罩合成）渲染转场视频（或其中一块），以rgb24原始帧读回（不经过有损编码）"""
+    if mask_inputs:
+        cmd = creator._mask_reveal_command(*mask_inputs, 'unused.mp4', ROWS, COLS, CELL_WIDTH, CELL_HEIGHT,
+                                           frame_range=frame_range)
+    else:
+        cmd = creator._transition_video_command(image_files, 'unused.mp4', ROWS, COLS, CELL_WIDTH, CELL_HEIGHT,
+                                                frame_range=frame_range)
+    cmd = ['ffmpeg', '-v', 'error'] + cmd[1:cmd.index('-c:v')]
+    cmd += ['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    frame_size = creator.max_width * creator.max_height * 3
+    data = result.stdout
+    return [np.frombuffer(data[k:k + frame_size], dtype=np.uint8).reshape(creator.max_height, creator.max_width, 3)
+            for k in range(0, len(data) - frame_size + 1, frame_size)]
+
+
+def check_chunks(creator, image_files, frames, name, failures, mask_inputs=None):
+    """按块渲染（每块只渲染自己的帧范围）后逐帧拼接，应与整条时间线完全一致"""
+    chunked = []
+    for frame_range in chunk_ranges(0, len(frames), 3, 60):
+        chunked.extend(ffmpeg_frames(creator, image_files, frame_range, mask_inputs))
+    if len(chunked) != len(frames) or any(not np.array_equal(a, b) for a, b in zip(chunked, frames)):
+        failures.append(f"{name}: 分块渲染得到 {len(chunked)} 帧，与整条时间线的 {len(frames)} 帧不一致")
+
+
+def main():
+    if not (PIL_AVAILABLE and NUMPY_AVAILABLE):
+        print("错误：未安装PIL或NumPy，无法测试显示时间表！")
+        return 1
+
+    failures = []
+    check_schedule(failures)
+
+    work_dir = tempfile.mkdtemp(prefix='test_reveal_scheduler_')
+    try:
+        image_files = create_cells(work_dir)
+        has_ffmpeg = shutil.which('ffmpeg') is not None
+        if not has_ffmpeg:
+            print("警告：未找到ffmpeg，跳过ffmpeg滤镜图渲染的验证")
+        for order in REVEAL_ORDERS:
+            creator = ImageGridCreator(output_file=os.path.join(work_dir, 'grid.jpg'),
+                                       max_width=COLS * CELL_WIDTH, max_height=ROWS * CELL_HEIGHT,
+                                       video_duration=DURATION, fps=FPS, reveal_order=order, static_input=True)
+            starts = creator._reveal_starts(NUM_IMAGES, ROWS, COLS)
+            expected = expected_onsets(starts)
+            times = reveal_times(ROWS, COLS, NUM_IMAGES, order).ravel()
+            if not np.allclose(starts, times[:NUM_IMAGES]):
+                failures.append(f"{order}: 开始时间与 reveal_times 不一致")
+
+            cells = [np.asarray(next(creator._iter_cell_images([path], CELL_WIDTH, CELL_HEIGHT, fit='stretch'))[1]
+                                .convert('RGB')) for path in image_files]
+            positions = [((i % COLS) * CELL_WIDTH, (i // COLS) * CELL_HEIGHT) for i in range(NUM_IMAGES)]
+            renderer = GridFadeRenderer(creator.max_width, creator.max_height, cells, positions,
+                                        starts, REVEAL_FADE, FPS)
+            onsets = cell_onsets(renderer.frames(0, renderer.frame_count(DURATION)))
+            if onsets != expected:
+                failures.append(f"{order} rawpipe: 出现帧 {onsets}，期望 {expected}")
+
+            if has_ffmpeg:
+                frames = ffmpeg_frames(creator, image_files)
+                onsets = cell_onsets(frames)
+                if onsets != expected:
+                    failures.append(f"{order} ffmpeg: 出现帧 {onsets}，期望 {expected}")
+                check_chunks(creator, image_files, frames, order, failures)
+
+                mask_inputs = creator._prepare_mask_inputs(image_files, ROWS, COLS, CELL_WIDTH, CELL_HEIGHT)
+                frames = ffmpeg_frames(creator, image_files, mask_inputs=mask_inputs)
+                onsets = cell_onsets(frames)
+                if onsets != expected:
+                    failures.append(f"{order} mask: 出现帧 {onsets}，期望 {expected}")
+                check_chunks(creator, image_files, frames, f"{order} mask", failures, mask_inputs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if not failures:
+        print("测试成功！每个单元格的出现帧与显示时间表一致")
+        return 0
+    print("测试失败！")
+    for failure in failures:
+        print(f"- {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试strip_reader.py中的流式PNG读取器：按条带读出的像素与PIL整张解码逐字节一致"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from strip_reader import open_strip_reader
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+def create_test_pngs(dir_path, width, height):
+    """生成各种颜色类型的PNG；内容带渐变，使PIL编码时用到Sub/Up/Paeth等滤波，并分成多个IDAT块"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    rgb = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    images = {
+        'rgb': rgb,
+        'rgba': Image.merge('RGBA', rgb.split() + (noise,)),
+        'gray': gradient,
+        'gray_alpha': Image.merge('LA', (gradient, noise)),
+        'palette': rgb.quantize(64),
+    }
+    paths = {}
+    for name, img in images.items():
+        path = os.path.join(dir_path, f'{name}.png')
+        img.save(path, compress_level=9)
+        paths[name] = path
+    return paths
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL库，无法测试流式读取！")
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix='test_strip_reader_')
+    try:
+        width, height = 203, 517
+        failures = []
+        for name, path in create_test_pngs(work_dir, width, height).items():
+            with Image.open(path) as img:
+                expected = img.convert('RGBA').tobytes()
+            for band_height in (1, 37, height):
+                reader = open_strip_reader(path)
+                if reader is None:
+                    failures.append(f"{name}: 无法流式打开")
+                    break
+                with reader:
+                    bands = [band.convert('RGBA').tobytes() for band in reader.bands(band_height)]
+                if b''.join(bands) != expected:
+                    failures.append(f"{name} 条带高度 {band_height}")
+
+        # 16位深度的PNG与非PNG文件不支持流式读取，应返回None由调用方回退到整张解码
+        deep = os.path.join(work_dir, 'deep.png')
+        Image.new('I;16', (32, 32), 1000).save(deep)
+        jpeg = os.path.join(work_dir, 'photo.jpg')
+        Image.new('RGB', (32, 32), 'red').save(jpeg)
+        for path in (deep, jpeg):
+            if open_strip_reader(path) is not None:
+                failures.append(f"{os.path.basename(path)} 没有回退")
+
+        if not failures:
+            print("测试成功！所有条带与PIL整张解码结果逐字节一致")
+            return 0
+        print(f"测试失败！{', '.join(failures)}")
+        return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
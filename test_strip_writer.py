@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试strip_writer.py中的流式PNG/TIFF写出器：按条带写出的文件由PIL读回后与原始像素逐字节一致"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from strip_writer import open_strip_writer
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+def write_in_strips(path, pixels, width, height, strip_rows):
+    """按strip_rows行一个条带写出RGB原始数据（最后一个条带可能更矮）"""
+    stride = width * 3
+    writer = open_strip_writer(path, width, height)
+    try:
+        for start in range(0, height, strip_rows):
+            rows = min(strip_rows, height - start)
+            writer.write_strip(pixels[start * stride:(start + rows) * stride], rows)
+    finally:
+        writer.close()
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL库，无法读回验证！")
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix='test_strip_writer_')
+    try:
+        width, height = 257, 131
+        # 非2的幂的尺寸与不能整除的条带行数，覆盖最后一个较矮的条带
+        pixels = os.urandom(width * height * 3)
+        failures = []
+        for ext in ('.png', '.tif'):
+            for strip_rows in (1, 16, height):
+                path = os.path.join(work_dir, f'strip_{strip_rows}{ext}')
+                write_in_strips(path, pixels, width, height, strip_rows)
+                with Image.open(path) as img:
+                    if img.size != (width, height) or img.convert('RGB').tobytes() != pixels:
+                        failures.append(f"{ext} 条带行数 {strip_rows}")
+
+        # 写入行数与声明的高度不一致时必须报错
+        writer = open_strip_writer(os.path.join(work_dir, 'short.png'), width, height)
+        writer.write_strip(pixels[:width * 3 * 10], 10)
+        try:
+            writer.close()
+            failures.append("写入行数不足时没有报错")
+        except ValueError:
+            pass
+
+        if not failures:
+            print("测试成功！PNG/TIFF条带写出结果与原始像素逐字节一致")
+            return 0
+        print(f"测试失败！{', '.join(failures)}")
+        return 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
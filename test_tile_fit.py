@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试image_spliter_and_video_creator.py中PIL切割块（_fit_tile）与ffmpeg scale/pad 切割块的一致性：
+尺寸与填充偏移相同（PNG与JPEG原图的色度子采样不同），缩放核不同带来的像素差异在容差范围内"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    from PIL import Image
+    import numpy as np
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from image_spliter_and_video_creator import ImageSpliterAndVideoCreator
+
+# 230x190的原图按100x70切割：包含完整切割块、只需填充的边缘切割块和需要放大的角落切割块
+SOURCE_SIZE = (230, 190)
+CROP_SIZE = (100, 70)
+
+# 平均绝对误差与99%分位误差的上限（色阶）：两边的JPEG编码在黑边处的色度误差也计算在内，
+# 填充偏移错位一个像素时边缘误差超过100
+MEAN_TOLERANCE = 2.0
+P99_TOLERANCE = 64
+
+
+def create_source(path):
+    """生成平滑渐变的原图，缩放核的差异在平滑内容上很小，填充偏移错位则会在边缘产生大误差"""
+    width, height = SOURCE_SIZE
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // (width - 1), y * 255 // (height - 1),
+                       (x + y) * 255 // (width + height - 2)], axis=-1).astype(np.uint8)
+    Image.fromarray(pixels).save(path, quality=98)
+
+
+def load(path):
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGB')).astype(np.int16)
+
+
+def check_source(failures, work_dir, ext):
+    source = os.path.join(work_dir, f'source.{ext}')
+    create_source(source)
+    pil_dir = os.path.join(work_dir, f'pil_{ext}')
+    ffmpeg_dir = os.path.join(work_dir, f'ffmpeg_{ext}')
+    tool = ImageSpliterAndVideoCreator(source, *CROP_SIZE, output_video=os.path.join(work_dir, 'out.mp4'),
+                                       pipeline='files', tiles_dir=pil_dir, memory_budget_mb=0)
+    try:
+        specs = tool._tile_specs()
+        tool.split_image()
+        tool.tiles_dir = ffmpeg_dir
+        os.makedirs(ffmpeg_dir)
+        tool._split_with_ffmpeg(specs)
+    finally:
+        tool.clean_up()
+
+    for spec in specs:
+        name = f'cropped_{spec[0]}_{spec[1]}.jpg'
+        pil_tile, ffmpeg_tile = load(os.path.join(pil_dir, name)), load(os.path.join(ffmpeg_dir, name))
+        if pil_tile.shape != ffmpeg_tile.shape:
+            failures.append(f"{ext} {name}: 尺寸不一致 {pil_tile.shape} != {ffmpeg_tile.shape}")
+            continue
+        diff = np.abs(pil_tile - ffmpeg_tile)
+        mean, p99 = float(diff.mean()), float(np.percentile(diff, 99))
+        if mean > MEAN_TOLERANCE or p99 > P99_TOLERANCE:
+            failures.append(f"{ext} {name}: 与ffmpeg输出差异过大（平均 {mean:.2f}，99%分位 {p99:.0f}）")
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL或NumPy，无法比较切割块！")
+        return 1
+    if not shutil.which('ffmpeg'):
+        print("未找到ffmpeg，跳过与ffmpeg切割块的比较")
+        return 0
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='test_tile_fit_')
+    try:
+        for ext in ('png', 'jpg'):
+            check_source(failures, work_dir, ext)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！PIL切割块与ffmpeg scale/pad 切割块尺寸、填充偏移一致，像素差异在容差范围内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试tile_pyramid.py的 DeepZoomWriter：每个层级内每个单元格只加载一次，瓦片内容正确，
+重新生成时未变化的瓦片被跳过、瓦片质量变化时全部重写；以及网格工具生成瓦片时原尺寸单元格不写入缩略图缓存"""
+
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from tile_pyramid import DeepZoomWriter
+
+# 3x4网格，单元格 300x200，瓦片 128：最高层级每个单元格跨越多个瓦片
+ROWS, COLS = 3, 4
+CELL_WIDTH, CELL_HEIGHT = 300, 200
+TILE_SIZE = 128
+
+
+def cell_color(index):
+    return (20 + index * 19, 250 - index * 17, (index * 53) % 256)
+
+
+def write_pyramid(output_path, quality, calls):
+    writer = DeepZoomWriter(output_path, ROWS, COLS, CELL_WIDTH, CELL_HEIGHT, TILE_SIZE, quality)
+
+    def load_cell(index, width, height):
+        calls[(width, height, index)] += 1
+        return Image.new('RGB', (width, height), cell_color(index))
+
+    identities = [f"cell{i}" for i in range(ROWS * COLS)]
+    return writer, writer.write(identities, load_cell)
+
+
+def check_writer(failures, work_dir):
+    output_path = os.path.join(work_dir, 'grid.dzi')
+    calls = Counter()
+    writer, (written, skipped) = write_pyramid(output_path, 90, calls)
+    repeated = {key: count for key, count in calls.items() if count > 1}
+    if repeated:
+        failures.append(f"同一层级的单元格被重复加载: {sorted(repeated.items())[:5]}")
+    if skipped or not written:
+        failures.append(f"首次生成应重写全部瓦片: 重写 {written}，跳过 {skipped}")
+
+    # 最高层级：每个单元格中心处的颜色来自该单元格
+    for index in range(ROWS * COLS):
+        x = (index % COLS) * CELL_WIDTH + CELL_WIDTH // 2
+        y = (index // COLS) * CELL_HEIGHT + CELL_HEIGHT // 2
+        tile_path = writer._tile_path(writer.max_level, x // TILE_SIZE, y // TILE_SIZE)
+        with Image.open(tile_path) as tile:
+            pixel = tile.convert('RGB').getpixel((x % TILE_SIZE, y % TILE_SIZE))
+        if max(abs(a - b) for a, b in zip(pixel, cell_color(index))) > 8:
+            failures.append(f"单元格 {index} 中心的颜色为 {pixel}，期望 {cell_color(index)}")
+
+    _, (rewritten, reskipped) = write_pyramid(output_path, 90, Counter())
+    if rewritten or reskipped != written:
+        failures.append(f"未变化时重新生成应全部跳过: 重写 {rewritten}，跳过 {reskipped}")
+    _, (rewritten, reskipped) = write_pyramid(output_path, 60, Counter())
+    if reskipped or rewritten != written:
+        failures.append(f"瓦片质量变化后应全部重写: 重写 {rewritten}，跳过 {reskipped}")
+
+
+def check_cache(failures, work_dir):
+    from image_grid_creator import ImageGridCreator
+    image_files = []
+    for i in range(4):
+        path = os.path.join(work_dir, f'image_{i}.png')
+        Image.new('RGB', (CELL_WIDTH, CELL_HEIGHT), cell_color(i)).save(path)
+        image_files.append(path)
+    cache_dir = os.path.join(work_dir, 'cache')
+    creator = ImageGridCreator(output_file=os.path.join(work_dir, 'tiles.dzi'), cache_dir=cache_dir, tiles=True)
+    if not creator.create_tile_pyramid(image_files, os.path.join(work_dir, 'tiles.dzi'), tile_size=TILE_SIZE):
+        failures.append("网格工具生成瓦片金字塔失败")
+        return
+    sizes = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            if name.endswith('.png'):
+                with Image.open(os.path.join(root, name)) as img:
+                    sizes.append(img.size)
+    if (CELL_WIDTH, CELL_HEIGHT) in sizes:
+        failures.append(f"原尺寸单元格被写入了缩略图缓存: {sizes}")
+    if not sizes:
+        failures.append("缩小后的单元格没有写入缩略图缓存")
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL，无法测试瓦片金字塔！")
+        return 1
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='test_tile_pyramid_')
+    try:
+        check_writer(failures, work_dir)
+        check_cache(failures, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！每个层级内单元格只加载一次，增量生成与瓦片质量签名正确")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试video_backend.py的 decode_frames：PNG图片解码结果与PIL逐字节一致，
+编码后的视频解码出的帧数正确，安装了PyAV时两个后端解码同一个视频的结果一致"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from video_backend import PYAV_AVAILABLE, PyAVBackend, SubprocessBackend
+
+try:
+    from PIL import Image
+    import numpy as np
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+WIDTH, HEIGHT = 48, 32
+FPS = 25
+FRAME_COUNT = 10
+
+
+def create_frames():
+    """每帧画面不同的测试帧"""
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    return [np.stack([(x * 5 + i * 20) % 256, (y * 7) % 256, np.full_like(x, i * 25)], axis=-1).astype(np.uint8)
+            for i in range(FRAME_COUNT)]
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("错误：未安装PIL或NumPy，无法测试视频后端！")
+        return 1
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        print("未找到ffmpeg/ffprobe，跳过视频后端解码测试")
+        return 0
+
+    backends = [SubprocessBackend()] + ([PyAVBackend()] if PYAV_AVAILABLE else [])
+    if not PYAV_AVAILABLE:
+        print("警告：未安装PyAV，只测试ffmpeg命令行后端")
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='test_video_backend_')
+    try:
+        frames = create_frames()
+        image_path = os.path.join(work_dir, 'frame.png')
+        Image.fromarray(frames[3]).save(image_path)
+        video_path = os.path.join(work_dir, 'video.mp4')
+        returncode, stderr = SubprocessBackend().encode_frames(
+            frames, WIDTH, HEIGHT, FPS, video_path, ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p'])
+        if returncode != 0:
+            failures.append(f"编码测试视频失败: {stderr[:300]}")
+
+        decoded = {}
+        for backend in backends:
+            image_frames = list(backend.decode_frames(image_path))
+            if len(image_frames) != 1 or not np.array_equal(image_frames[0], frames[3]):
+                failures.append(f"{backend.name}: PNG解码结果与原始像素不一致")
+            if returncode == 0:
+                decoded[backend.name] = list(backend.decode_frames(video_path))
+                shapes = {frame.shape for frame in decoded[backend.name]}
+                if len(decoded[backend.name]) != FRAME_COUNT or shapes != {(HEIGHT, WIDTH, 3)}:
+                    failures.append(f"{backend.name}: 视频解码出 {len(decoded[backend.name])} 帧 {shapes}，"
+                                    f"应为 {FRAME_COUNT} 帧 {(HEIGHT, WIDTH, 3)}")
+        if len(decoded) == 2:
+            # 两个后端都由libavcodec解码，色彩转换可能有取整差异
+            diffs = [np.abs(a.astype(np.int16) - b).max() for a, b in zip(decoded['ffmpeg'], decoded['pyav'])]
+            if max(diffs, default=0) > 2:
+                failures.append(f"两个后端解码同一视频的结果差异过大: 最大 {max(diffs)}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！两个后端的 decode_frames 解码结果正确")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
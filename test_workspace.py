@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""测试workspace.py：创建工作目录不修改SIGTERM处理，sigterm_as_exit 退出时恢复；
+遗留目录只在带有标记文件、足够旧且进程已结束时才被清理"""
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from workspace import WORKSPACE_MARKER, Workspace, clean_stale, sigterm_as_exit
+
+PREFIX = 'test_ws_'
+
+
+def dead_pid():
+    """返回一个已结束进程的进程号"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def make_dir(parent, pid, marker_age=None):
+    """创建名称形如遗留工作目录的目录；marker_age 不为None时写入指定年龄（秒）的标记文件"""
+    path = tempfile.mkdtemp(prefix=f'{PREFIX}pid{pid}_', dir=parent)
+    if marker_age is not None:
+        marker = os.path.join(path, WORKSPACE_MARKER)
+        with open(marker, 'w') as f:
+            f.write(str(pid))
+        mtime = time.time() - marker_age
+        os.utime(marker, (mtime, mtime))
+    return path
+
+
+def check_clean_stale(failures, parent):
+    pid = dead_pid()
+    old = make_dir(parent, pid, marker_age=7200)
+    young = make_dir(parent, pid, marker_age=10)
+    unmarked = make_dir(parent, pid)
+    alive = make_dir(parent, os.getppid(), marker_age=7200)
+    clean_stale(parent, PREFIX, min_age=3600)
+    if os.path.exists(old):
+        failures.append("带标记、足够旧且进程已结束的目录没有被清理")
+    for path, reason in [(young, '刚创建的'), (unmarked, '没有标记文件的'), (alive, '进程仍在运行的')]:
+        if not os.path.exists(path):
+            failures.append(f"{reason}目录被误删: {os.path.basename(path)}")
+
+
+def check_sigterm(failures):
+    before = signal.getsignal(signal.SIGTERM)
+    workspace = Workspace(memory_budget_mb=0, prefix=PREFIX)
+    try:
+        if signal.getsignal(signal.SIGTERM) is not before:
+            failures.append("创建工作目录时修改了SIGTERM处理")
+        if not os.path.exists(os.path.join(workspace.path, WORKSPACE_MARKER)):
+            failures.append("工作目录中没有写入标记文件")
+    finally:
+        workspace.cleanup()
+
+    with sigterm_as_exit():
+        if signal.getsignal(signal.SIGTERM) is before:
+            failures.append("sigterm_as_exit 期间没有安装SIGTERM处理")
+    if signal.getsignal(signal.SIGTERM) is not before:
+        failures.append("sigterm_as_exit 退出后没有恢复原来的SIGTERM处理")
+
+
+def main():
+    failures = []
+    parent = tempfile.mkdtemp(prefix='test_workspace_')
+    try:
+        check_clean_stale(failures, parent)
+        check_sigterm(failures)
+    finally:
+        shutil.rmtree(parent, ignore_errors=True)
+
+    if failures:
+        print("测试失败！")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("测试成功！工作目录不修改信号处理，只清理带标记的过期遗留目录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""缩略图磁盘缓存
+
+按 (绝对路径, 文件大小, 修改时间, 目标宽高, 缩放滤镜) 缓存已缩放的单元格图片，
+网格图片、转场视频等多次运行时可直接读取缓存，跳过原图解码与缩放。
+缓存以无损PNG保存，命中与未命中的输出像素完全一致；超过容量上限时按最近最少使用（LRU）淘汰。
+"""
+
+import os
+import hashlib
+import tempfile
+from typing import Optional
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'p-video-ffmpeg-capture', 'thumbnails')
+
+# PNG可以无损保存的图片模式，其余模式（如CMYK）先转换为RGB
+PNG_MODES = {'1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'}
+
+
+class ThumbnailCache:
+    """缩略图缓存，每个缓存项是缓存目录下的一个PNG文件（可被多进程安全共享）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 1024 * 1024 * 1024):
+        """初始化缩略图缓存
+
+        Args:
+            cache_dir: 缓存目录，默认 ~/.cache/p-video-ffmpeg-capture/thumbnails
+            max_bytes: 缓存容量上限（字节），超出后按LRU淘汰
+        """
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, image_path: str, cell_width: int, cell_height: int, resample: str) -> str:
+        """计算缓存键
+
+        Args:
+            image_path: 原图路径
+            cell_width: 目标单元格宽度
+            cell_height: 目标单元格高度
+            resample: 缩放滤镜与适配方式的描述，如 'lanczos-draft-contain'
+
+        Returns:
+            str: 缓存键（十六进制摘要）
+        """
+        abs_path = os.path.abspath(image_path)
+        stat = os.stat(abs_path)
+        identity = f"{abs_path}|{stat.st_size}|{stat.st_mtime_ns}|{cell_width}x{cell_height}|{resample}"
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """返回缓存键对应的文件路径（按前两位分子目录，避免单目录文件过多）"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def load(self, key: str):
+        """读取缓存项
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[Image.Image]: 命中时返回已加载的图片，否则返回None
+        """
+        path = self.path_for(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+        except (FileNotFoundError, OSError):
+            return None
+        # 更新修改时间作为LRU的访问时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return img
+
+    def store(self, key: str, img):
+        """写入缓存项（先写临时文件再原子替换，多个工作进程并发写入也安全）
+
+        Args:
+            key: 缓存键
+            img: 缩放后的图片
+
+        Returns:
+            Image.Image: 实际缓存的图片（不支持PNG的模式会转换为RGB）
+        """
+        if img.mode not in PNG_MODES:
+            img = img.convert('RGB')
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.png', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, format='PNG', compress_level=1)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return img
+
+    def evict(self) -> int:
+        """按LRU淘汰缓存项，直到总大小不超过容量上限
+
+        Returns:
+            int: 删除的缓存项数量
+        """
+        entries = []
+        total_bytes = 0
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if not entry.name.endswith('.png'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        removed = 0
+        if total_bytes <= self.max_bytes:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
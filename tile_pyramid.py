@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Deep Zoom 瓦片金字塔输出
+
+直接根据网格布局生成 Deep Zoom（.dzi + 每级一个目录的瓦片）金字塔，供浏览器按需加载超大拼图。
+单元格足够大的层级直接用缓存的单元格缩略图拼出瓦片，不需要反复缩小整张画布；
+单元格过小的低层级由上一级的2x2个瓦片缩小得到。
+每个层级内每个单元格只加载一次，粘贴到它覆盖的所有瓦片后，在下方的瓦片行用不到时释放。
+每个瓦片记录一个由参与单元格与瓦片质量计算出的签名，重新生成时只重写签名变化的瓦片。
+"""
+
+import os
+import json
+import math
+import bisect
+import hashlib
+from typing import Callable, List, Optional
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 单元格在某一层级小于该像素数时，改为由下一级瓦片缩小生成
+MIN_CELL_SIZE = 16
+
+MANIFEST_NAME = 'manifest.json'
+
+# 瓦片默认JPEG质量
+DEFAULT_TILE_QUALITY = 90
+
+
+class DeepZoomWriter:
+    """按网格布局写出 Deep Zoom 瓦片金字塔"""
+
+    def __init__(self, output_path: str, rows: int, cols: int, cell_width: int, cell_height: int,
+                 tile_size: int = 256, quality: int = DEFAULT_TILE_QUALITY):
+        """初始化瓦片金字塔写出器
+
+        Args:
+            output_path: .dzi 描述文件路径，瓦片写入同名的 _files 目录
+            rows: 网格行数
+            cols: 网格列数
+            cell_width: 最高层级的单元格宽度
+            cell_height: 最高层级的单元格高度
+            tile_size: 瓦片边长（像素）
+            quality: 瓦片JPEG质量
+        """
+        self.output_path = output_path
+        self.tiles_dir = os.path.splitext(output_path)[0] + '_files'
+        self.rows = rows
+        self.cols = cols
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.tile_size = tile_size
+        self.quality = quality
+        self.width = cols * cell_width
+        self.height = rows * cell_height
+        self.max_level = max(0, math.ceil(math.log2(max(self.width, self.height))))
+
+    def level_size(self, level: int):
+        """返回某一层级的画布尺寸"""
+        scale = 2 ** (self.max_level - level)
+        return max(1, math.ceil(self.width / scale)), max(1, math.ceil(self.height / scale))
+
+    def _cell_edges(self, level: int):
+        """返回某一层级各列、各行单元格的边界坐标"""
+        scale = 2 ** (self.max_level - level)
+        x_edges = [round(col * self.cell_width / scale) for col in range(self.cols + 1)]
+        y_edges = [round(row * self.cell_height / scale) for row in range(self.rows + 1)]
+        return x_edges, y_edges
+
+    def _tile_path(self, level: int, tile_x: int, tile_y: int) -> str:
+        return os.path.join(self.tiles_dir, str(level), f"{tile_x}_{tile_y}.jpg")
+
+    def _load_manifest(self) -> dict:
+        """读取上一次生成记录的瓦片签名"""
+        manifest_path = os.path.join(self.tiles_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('tiles', {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self, tiles: dict):
+        manifest_path = os.path.join(self.tiles_dir, MANIFEST_NAME)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'width': self.width, 'height': self.height,
+                       'tile_size': self.tile_size, 'tiles': tiles}, f)
+
+    def _write_descriptor(self):
+        """写出 .dzi 描述文件"""
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="jpg" '
+                    f'Overlap="0" TileSize="{self.tile_size}">\n')
+            f.write(f'  <Size Width="{self.width}" Height="{self.height}"/>\n')
+            f.write('</Image>\n')
+
+    def write(self, cell_identities: List[str],
+              load_cell: Callable[[int, int, int], Optional['Image.Image']]):
+        """生成（或增量更新）瓦片金字塔
+
+        Args:
+            cell_identities: 每个单元格的身份字符串（路径、大小、修改时间），用于计算瓦片签名
+            load_cell: load_cell(序号, 宽, 高) 返回等比缩放到该尺寸内的单元格图片，失败返回None；
+                       每个层级内每个单元格最多调用一次
+
+        Returns:
+            Tuple[int, int]: (重写的瓦片数, 跳过的瓦片数)
+        """
+        old_tiles = self._load_manifest()
+        new_tiles = {}
+        written = skipped = 0
+
+        for level in range(self.max_level, -1, -1):
+            level_width, level_height = self.level_size(level)
+            tiles_x = math.ceil(level_width / self.tile_size)
+            tiles_y = math.ceil(level_height / self.tile_size)
+            scale = 2 ** (self.max_level - level)
+            from_cells = (self.cell_width / scale >= MIN_CELL_SIZE and self.cell_height / scale >= MIN_CELL_SIZE)
+            if from_cells:
+                x_edges, y_edges = self._cell_edges(level)
+            os.makedirs(os.path.join(self.tiles_dir, str(level)), exist_ok=True)
+            # 本层级已加载的单元格：一个单元格可能跨越多个瓦片，只加载一次
+            loaded = {}
+
+            for tile_y in range(tiles_y):
+                # 释放不会再出现在本行及以下瓦片中的单元格
+                row_top = tile_y * self.tile_size
+                for index in [index for index, (rect, _) in loaded.items() if rect[3] <= row_top]:
+                    del loaded[index]
+                for tile_x in range(tiles_x):
+                    x0 = tile_x * self.tile_size
+                    y0 = tile_y * self.tile_size
+                    x1 = min(x0 + self.tile_size, level_width)
+                    y1 = min(y0 + self.tile_size, level_height)
+                    name = f"{level}/{tile_x}_{tile_y}"
+
+                    if from_cells:
+                        cells = self._cells_in_rect(x_edges, y_edges, x0, y0, x1, y1, len(cell_identities))
+                        signature_parts = [f"cells|{x0},{y0},{x1},{y1}|{scale}|q{self.quality}"]
+                        signature_parts += [f"{index}|{rect}|{cell_identities[index]}" for index, rect in cells]
+                    else:
+                        children = [f"{level + 1}/{tile_x * 2 + dx}_{tile_y * 2 + dy}"
+                                    for dy in (0, 1) for dx in (0, 1)]
+                        signature_parts = [f"children|{x0},{y0},{x1},{y1}|q{self.quality}"]
+                        signature_parts += [f"{child}|{new_tiles.get(child, '')}" for child in children]
+                    signature = hashlib.sha1('\n'.join(signature_parts).encode('utf-8')).hexdigest()
+                    new_tiles[name] = signature
+
+                    tile_path = self._tile_path(level, tile_x, tile_y)
+                    if old_tiles.get(name) == signature and os.path.exists(tile_path):
+                        skipped += 1
+                        continue
+
+                    tile = Image.new('RGB', (x1 - x0, y1 - y0), color='black')
+                    if from_cells:
+                        for index, rect in cells:
+                            if index not in loaded:
+                                loaded[index] = (rect, load_cell(index, rect[2] - rect[0], rect[3] - rect[1]))
+                            img = loaded[index][1]
+                            cx0, cy0, cx1, cy1 = rect
+                            if img is None:
+                                continue
+                            paste_x = cx0 + (cx1 - cx0 - img.width) // 2 - x0
+                            paste_y = cy0 + (cy1 - cy0 - img.height) // 2 - y0
+                            tile.paste(img, (paste_x, paste_y))
+                    else:
+                        self._paste_children(tile, level, tile_x, tile_y)
+                    tile.save(tile_path, quality=self.quality)
+                    written += 1
+
+        # 删除布局变化后不再属于金字塔的旧瓦片
+        for name in set(old_tiles) - set(new_tiles):
+            level, tile_name = name.split('/')
+            stale_path = os.path.join(self.tiles_dir, level, f"{tile_name}.jpg")
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+        self._save_manifest(new_tiles)
+        self._write_descriptor()
+        return written, skipped
+
+    def _cells_in_rect(self, x_edges, y_edges, x0, y0, x1, y1, num_cells):
+        """返回与瓦片区域相交的单元格 (序号, 单元格矩形)"""
+        col_start = max(0, bisect.bisect_right(x_edges, x0) - 1)
+        col_end = min(self.cols, bisect.bisect_left(x_edges, x1))
+        row_start = max(0, bisect.bisect_right(y_edges, y0) - 1)
+        row_end = min(self.rows, bisect.bisect_left(y_edges, y1))
+        cells = []
+        for row in range(row_start, row_end):
+            for col in range(col_start, col_end):
+                index = row * self.cols + col
+                if index >= num_cells:
+                    continue
+                rect = (x_edges[col], y_edges[row], x_edges[col + 1], y_edges[row + 1])
+                if rect[2] > rect[0] and rect[3] > rect[1]:
+                    cells.append((index, rect))
+        return cells
+
+    def _paste_children(self, tile, level: int, tile_x: int, tile_y: int):
+        """把下一级的2x2个瓦片拼接后缩小一半，作为当前瓦片"""
+        child_width, child_height = self.level_size(level + 1)
+        x0 = tile_x * 2 * self.tile_size
+        y0 = tile_y * 2 * self.tile_size
+        region = Image.new('RGB', (min(2 * self.tile_size, child_width - x0),
+                                   min(2 * self.tile_size, child_height - y0)), color='black')
+        for dy in (0, 1):
+            for dx in (0, 1):
+                child_path = self._tile_path(level + 1, tile_x * 2 + dx, tile_y * 2 + dy)
+                if os.path.exists(child_path):
+                    with Image.open(child_path) as child:
+                        region.paste(child, (dx * self.tile_size, dy * self.tile_size))
+        tile.paste(region.resize(tile.size, Image.LANCZOS), (0, 0))
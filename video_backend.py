@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""视频编解码后端
+
+两个后端提供相同的接口：encode_frames/encode_hold 编码NumPy原始帧（网格转场视频、
+图片分割视频的原始帧管道），decode_frames 把视频（或图片）解码为rgb24数组（图片分割视频读取切割块），
+probe_duration 读取媒体文件的时长。
+1. PyAVBackend：安装了PyAV时在进程内编解码，不需要为每个小任务启动ffmpeg进程
+2. SubprocessBackend：通过stdin/stdout与ffmpeg命令行进程交换rgb24原始帧
+
+编码参数沿用ffmpeg命令行的写法（例如 ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23']），
+两个后端可以直接互换。编码方法都返回 (返回码, 错误输出)，与 subprocess 的结果保持一致。
+"""
+
+import math
+import subprocess
+from fractions import Fraction
+from typing import Dict, Iterator, List, Tuple
+
+from frame_renderer import encode_frames, encode_hold
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import av
+    PYAV_AVAILABLE = True
+except ImportError:
+    PYAV_AVAILABLE = False
+
+# 直接作为编码器选项传给PyAV的ffmpeg参数
+CODEC_OPTION_ARGS = ('-preset', '-crf', '-tune', '-profile:v', '-g', '-keyint_min', '-sc_threshold',
+                     '-threads', '-x264-params', '-b:v', '-maxrate', '-bufsize')
+
+# 作为封装格式选项传给PyAV的ffmpeg参数
+FORMAT_OPTION_ARGS = ('-movflags', '-video_track_timescale')
+
+
+def probe_video_size(path: str, ffprobe: str = 'ffprobe') -> Tuple[int, int]:
+    """用ffprobe获取视频（或图片）第一路视频流的尺寸"""
+    result = subprocess.run([ffprobe, '-v', 'error', '-select_streams', 'v:0',
+                             '-show_entries', 'stream=width,height', '-of', 'csv=p=0', path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    dimensions = result.stdout.strip().split(',')
+    if result.returncode != 0 or len(dimensions) != 2:
+        raise RuntimeError(f"无法获取视频尺寸: {path} {result.stderr.strip()}")
+    return int(dimensions[0]), int(dimensions[1])
+
+
+class SubprocessBackend:
+    """ffmpeg命令行后端：原始帧通过管道与ffmpeg进程交换"""
+
+    name = 'ffmpeg'
+    in_process = False
+
+    def __init__(self, ffmpeg: str = 'ffmpeg', ffprobe: str = 'ffprobe'):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+
+    def encode_frames(self, frames, width: int, height: int, fps: float, output_path: str,
+                      output_args: List[str]) -> Tuple[int, str]:
+        """编码帧序列，参数与 frame_renderer.encode_frames 相同"""
+        return encode_frames(frames, width, height, fps, output_path, output_args, self.ffmpeg)
+
+    def encode_hold(self, frame, frame_count: int, width: int, height: int, fps: float,
+                    output_path: str, output_args: List[str]) -> Tuple[int, str]:
+        """把一帧编码为持续frame_count帧时长的片段，参数与 frame_renderer.encode_hold 相同"""
+        return encode_hold(frame, frame_count, width, height, fps, output_path, output_args, self.ffmpeg)
+
+    def decode_frames(self, path: str) -> Iterator['np.ndarray']:
+        """把视频（或图片）的第一路视频流解码为 高x宽x3 的rgb24数组序列"""
+        width, height = probe_video_size(path, self.ffprobe)
+        frame_size = width * height * 3
+        cmd = [self.ffmpeg, '-v', 'error', '-i', path, '-map', '0:v:0',
+               '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+    def probe_duration(self, path: str) -> float:
+        """返回媒体文件的时长（秒）"""
+        result = subprocess.run([self.ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+                                 '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return float(result.stdout.strip())
+
+
+class PyAVBackend:
+    """PyAV进程内后端：帧在进程内直接送入libavcodec编码，不启动ffmpeg进程"""
+
+    name = 'pyav'
+    in_process = True
+
+    @staticmethod
+    def _parse_output_args(output_args: List[str]) -> Dict:
+        """把ffmpeg命令行风格的输出参数转换为PyAV的编码设置"""
+        settings = {'codec': 'libx264', 'pix_fmt': 'yuv420p', 'duration': None,
+                    'codec_options': {}, 'format_options': {}}
+        for index in range(0, len(output_args), 2):
+            key = output_args[index]
+            if index + 1 >= len(output_args):
+                raise ValueError(f"PyAV后端: 参数缺少取值: {key}")
+            value = str(output_args[index + 1])
+            if key in ('-c:v', '-vcodec'):
+                settings['codec'] = value
+            elif key == '-pix_fmt':
+                settings['pix_fmt'] = value
+            elif key == '-t':
+                settings['duration'] = float(value)
+            elif key in CODEC_OPTION_ARGS:
+                settings['codec_options'][key.lstrip('-').split(':')[0]] = value
+            elif key in FORMAT_OPTION_ARGS:
+                settings['format_options'][key.lstrip('-')] = value
+            else:
+                raise ValueError(f"PyAV后端不支持的编码参数: {key} {value}")
+        return settings
+
+    def _encode(self, timed_frames, width: int, height: int, fps: float, output_path: str,
+                output_args: List[str]) -> Tuple[int, str]:
+        """编码 (帧序号, 帧) 序列，帧序号即以 1/fps 为时间基的显示时间戳"""
+        try:
+            settings = self._parse_output_args(output_args)
+            rate = Fraction(fps).limit_denominator(1001)
+            max_frames = None
+            if settings['duration'] is not None:
+                max_frames = max(1, math.ceil(settings['duration'] * fps - 1e-9))
+            with av.open(output_path, 'w', options=settings['format_options']) as container:
+                stream = container.add_stream(settings['codec'], rate=rate)
+                stream.width = width
+                stream.height = height
+                stream.pix_fmt = settings['pix_fmt']
+                stream.codec_context.time_base = 1 / rate
+                stream.options = settings['codec_options']
+                for pts, frame in timed_frames:
+                    if max_frames is not None and pts >= max_frames:
+                        break
+                    video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format='rgb24')
+                    video_frame.pts = pts
+                    video_frame.time_base = stream.codec_context.time_base
+                    container.mux(stream.encode(video_frame))
+                container.mux(stream.encode(None))
+            return 0, ''
+        except Exception as e:
+            return 1, f"PyAV编码失败: {str(e)}"
+
+    def encode_frames(self, frames, width: int, height: int, fps: float, output_path: str,
+                      output_args: List[str]) -> Tuple[int, str]:
+        """在进程内编码帧序列"""
+        return self._encode(enumerate(frames), width, height, fps, output_path, output_args)
+
+    def encode_hold(self, frame, frame_count: int, width: int, height: int, fps: float,
+                    output_path: str, output_args: List[str]) -> Tuple[int, str]:
+        """把一帧编码为持续frame_count帧时长的片段：只编码两帧，第二帧的时间戳直接设为最后一帧的时刻"""
+        timed_frames = [(0, frame)] if frame_count <= 1 else [(0, frame), (frame_count - 1, frame)]
+        return self._encode(timed_frames, width, height, fps, output_path, output_args)
+
+    def decode_frames(self, path: str) -> Iterator['np.ndarray']:
+        """在进程内把第一路视频流解码为 高x宽x3 的rgb24数组序列"""
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            for frame in container.decode(stream):
+                yield frame.to_ndarray(format='rgb24')
+
+    def probe_duration(self, path: str) -> float:
+        """返回媒体文件的时长（秒），只读取封装信息"""
+        with av.open(path) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = container.streams.video[0]
+            return float(stream.duration * stream.time_base)
+
+
+def open_video_backend(name: str = 'auto'):
+    """按名称创建编解码后端
+
+    Args:
+        name: 'pyav'、'ffmpeg' 或 'auto'（安装了PyAV与NumPy时使用pyav，否则使用ffmpeg）
+
+    Returns:
+        PyAVBackend 或 SubprocessBackend
+    """
+    if name not in ('auto', 'pyav', 'ffmpeg'):
+        raise ValueError(f"未知的视频后端: {name}")
+    available = PYAV_AVAILABLE and NUMPY_AVAILABLE
+    if name == 'pyav' and not available:
+        print("警告：pyav后端需要PyAV与NumPy，回退到ffmpeg命令行后端")
+    if name != 'ffmpeg' and available:
+        return PyAVBackend()
+    return SubprocessBackend()
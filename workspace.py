@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""中间文件工作目录
+
+切割块图片、网格图片、中间MP4等中间文件在预估大小不超过内存预算时放在内存文件系统
+（/dev/shm 或指定的tmpfs）上，避免磁盘读写；超出预算或可用空间不足时放到磁盘临时目录。
+
+清理总是递归删除整个目录：
+1. 显式调用 cleanup()、对象被回收或解释器退出时删除（weakref.finalize）
+2. 命令行入口在 sigterm_as_exit() 中运行时，SIGTERM转换为正常退出，同样会执行清理
+   （作为库导入时不修改信号处理）
+3. 进程被强制结束（SIGKILL、断电）时留下的目录中有本工具写入的标记文件，目录名中带有进程号；
+   下次创建同类工作目录时，只删除带标记、超过 STALE_MIN_AGE_SECONDS 且进程已不存在的目录
+"""
+
+import contextlib
+import os
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import weakref
+from typing import Optional
+
+# 默认内存预算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# 默认的内存文件系统目录
+RAM_DIR_CANDIDATES = ('/dev/shm',)
+
+# 最多占用内存文件系统可用空间的比例，给其他进程留出余量
+RAM_FREE_FRACTION = 0.5
+
+# 工作目录中的标记文件，只有带标记的目录才会被当作遗留目录清理
+WORKSPACE_MARKER = '.p_video_workspace'
+
+# 遗留目录至少存在多久（秒）才会被清理
+STALE_MIN_AGE_SECONDS = 3600
+
+_STALE_RE = re.compile(r'^(?P<prefix>.+?)pid(?P<pid>\d+)_')
+
+
+def _pid_alive(pid: int) -> bool:
+    """判断进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _free_bytes(path: str) -> int:
+    """返回目录所在文件系统的可用字节数"""
+    stat = os.statvfs(path)
+    return stat.f_bavail * stat.f_frsize
+
+
+def default_ram_dir() -> Optional[str]:
+    """返回可写的内存文件系统目录，没有时返回None"""
+    for path in RAM_DIR_CANDIDATES:
+        if os.path.isdir(path) and os.access(path, os.W_OK):
+            return path
+    return None
+
+
+def _write_marker(path: str):
+    """在工作目录中写入标记文件（记录创建进程号）"""
+    with open(os.path.join(path, WORKSPACE_MARKER), 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def clean_stale(directory: str, prefix: str, min_age: float = STALE_MIN_AGE_SECONDS):
+    """删除directory中由已结束进程留下的同类工作目录
+
+    只处理带有本工具标记文件、标记写入时间早于min_age秒、且创建进程已不存在的目录，
+    其他程序的同名目录与刚创建的目录不会被删除。
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    now = time.time()
+    for name in names:
+        match = _STALE_RE.match(name)
+        if not match or match.group('prefix') != prefix or int(match.group('pid')) == os.getpid():
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.islink(path) or now - os.path.getmtime(os.path.join(path, WORKSPACE_MARKER)) < min_age:
+                continue
+        except OSError:
+            continue
+        if not _pid_alive(int(match.group('pid'))):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+@contextlib.contextmanager
+def sigterm_as_exit():
+    """命令行入口使用：期间把SIGTERM转换为SystemExit，使finalize/atexit清理在被终止时也能执行
+
+    只在主线程、且SIGTERM仍为默认处理时安装，退出时恢复默认处理。
+    """
+    installed = (threading.current_thread() is threading.main_thread() and
+                 signal.getsignal(signal.SIGTERM) is signal.SIG_DFL)
+    if installed:
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    try:
+        yield
+    finally:
+        if installed:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+class Workspace:
+    """中间文件工作目录：预估大小符合内存预算时放在内存文件系统，否则放到磁盘"""
+
+    def __init__(self, estimated_bytes: int = 0, memory_budget_mb: Optional[float] = DEFAULT_MEMORY_BUDGET_MB,
+                 ram_dir: Optional[str] = None, prefix: str = 'workspace_'):
+        """创建工作目录
+
+        Args:
+            estimated_bytes: 预估的中间文件总大小（字节）
+            memory_budget_mb: 内存预算（MB），0或None表示不使用内存文件系统
+            ram_dir: 内存文件系统目录（None表示自动选择 /dev/shm）
+            prefix: 目录名前缀
+        """
+        self.prefix = prefix
+        self.memory_budget = int((memory_budget_mb or 0) * 1024 * 1024)
+        self.ram_dir = ram_dir or default_ram_dir()
+        self.in_memory = bool(self.ram_dir and self.memory_budget > 0 and
+                              self._fits_in_memory(estimated_bytes))
+        parent = self.ram_dir if self.in_memory else None
+        for directory in {parent, tempfile.gettempdir()}:
+            if directory:
+                clean_stale(directory, prefix)
+        self.path = tempfile.mkdtemp(prefix=f'{prefix}pid{os.getpid()}_', dir=parent)
+        self._spill_path = None
+        self._finalizer = weakref.finalize(self, Workspace._remove, [self.path])
+        _write_marker(self.path)
+
+    def _fits_in_memory(self, nbytes: int) -> bool:
+        """判断nbytes是否同时满足内存预算与内存文件系统的可用空间"""
+        try:
+            available = _free_bytes(self.ram_dir) * RAM_FREE_FRACTION
+        except OSError:
+            return False
+        return nbytes <= min(self.memory_budget, available)
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @property
+    def spill_path(self) -> str:
+        """磁盘上的溢出目录（首次使用时创建，与工作目录一起清理）"""
+        if self._spill_path is None:
+            self._spill_path = tempfile.mkdtemp(prefix=f'{self.prefix}pid{os.getpid()}_spill_')
+            _write_marker(self._spill_path)
+            self._finalizer.detach()
+            self._finalizer = weakref.finalize(self, Workspace._remove, [self.path, self._spill_path])
+        return self._spill_path
+
+    def dir_for(self, estimated_bytes: int) -> str:
+        """返回存放预估大小为estimated_bytes的中间文件的目录
+
+        工作目录在内存中且剩余空间足够时返回工作目录，否则返回磁盘上的溢出目录。
+        """
+        if not self.in_memory:
+            return self.path
+        if self._fits_in_memory(estimated_bytes + self.used_bytes()):
+            return self.path
+        return self.spill_path
+
+    def used_bytes(self) -> int:
+        """返回工作目录中已有文件的总大小"""
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def describe(self) -> str:
+        """返回工作目录的位置说明"""
+        return f"{self.path}（{'内存' if self.in_memory else '磁盘'}）"
+
+    def cleanup(self):
+        """递归删除工作目录与溢出目录"""
+        self._finalizer()
+
+    def __enter__(self) -> 'Workspace':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()